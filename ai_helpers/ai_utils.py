@@ -1,43 +1,163 @@
 # ai_utils.py
 
-import json
 import pathlib
+from collections.abc import Iterator
 from pathlib import Path
 
-from ai_helpers.master_ai_config import openai
+import model_selector
+from ai_helpers.chat_store import open_history
+from ai_helpers.chunking import get_tokenizer
+from ai_helpers.llm_client import default_client
+from ai_helpers.memory import (
+    SUMMARY_TOKENS,
+    WINDOW_TOKENS,
+    ConversationMemory,
+    fit_window,
+    message_tokens,
+)
+from ai_helpers.vector_index import get_index, sync_in_background
 
 
 def chat_log_path(project: str) -> pathlib.Path:
-    """Return ~/automation/projects/<project>/chat_history.json."""
+    """Return ~/automation/projects/<project>/chat_history.json (legacy; see open_history)."""
     return pathlib.Path.home() / "automation" / "projects" / project / "chat_history.json"
 
 
 def last_msgs(project, n=10):
-    f = chat_log_path(project)
-    if f.exists():
-        try:
-            data = json.loads(f.read_text())
-            return data[-n:] if isinstance(data, list) else []
-        except Exception as e:
-            print(f"🔧 last_msgs error: {e}")
+    """Newest `n` messages; reads only the tail of the project's history store."""
+    try:
+        return open_history(chat_log_path(project)).last(n)
+    except Exception as e:
+        print(f"🔧 last_msgs error: {e}")
     return []
 
 
+def memory_for(project) -> ConversationMemory:
+    """Rolling summary + recent window over the project's history store."""
+    return ConversationMemory(open_history(chat_log_path(project)))
+
+
+FAILOVER = 3  # models tried per request
+HISTORY_TOKENS = WINDOW_TOKENS + SUMMARY_TOKENS  # cap for a history passed as a list
+RECALL_K = 4  # notes retrieved per prompt...
+RECALL_MIN_SCORE = 0.2  # ...at least this similar...
+RECALL_TOKENS = 600  # ...and this long in total
+
 SYSTEM_PROMPT = """You are Master-AI: Secure, precise, self-healing.
 If you see any error, explain, log, and auto-repair.
 Proactively research and suggest tools if asked."""
 
 
-def gpt(prompt: str, history=None) -> str:
-    msgs = [{"role": "system", "content": SYSTEM_PROMPT}]
-    if history:
-        msgs += history[-10:] if isinstance(history, list) else last_msgs(history)
-    msgs.append({"role": "user", "content": prompt})
+def recall(prompt: str, exclude=()) -> list[str]:
+    """
+    Lessons, plan steps and past chat messages most similar to `prompt`
+    (vector index; refreshed in the background), within RECALL_TOKENS.
+    """
     try:
-        r = openai.chat.completions.create(model="gpt-4o", messages=msgs)
-        return r.choices[0].message.content.strip()
+        index = get_index()
+        if index is None:
+            return []
+        sync_in_background(index)
+        hits = index.search(prompt, RECALL_K, min_score=RECALL_MIN_SCORE)
     except Exception as e:
-        return f"❌ GPT error: {e}"
+        print(f"🔧 recall error: {e}")
+        return []
+    notes, used = [], 0
+    for h in hits:
+        # chat rows are "role: content"; skip messages already in the window
+        if h.source == "chat" and h.text.partition(": ")[2] in exclude:
+            continue
+        used += message_tokens({"content": h.text}, get_tokenizer())
+        if used > RECALL_TOKENS:
+            break
+        notes.append(f"[{h.source}] {h.text}")
+    return notes
+
+
+def build_messages(prompt: str, history=None, recall_notes: bool | None = None) -> list[dict]:
+    """
+    System prompt + history + prompt. `history` is a project name or a
+    ConversationMemory (summary of older turns + recent ones within the
+    memory's token window), or a list of messages (its newest messages
+    within HISTORY_TOKENS). With `recall_notes` (default: when there is a
+    history) relevant notes from the vector index are added as well.
+    """
+    msgs = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if isinstance(history, ConversationMemory):
+        msgs += history.context()
+    elif isinstance(history, list):
+        msgs += fit_window(history, HISTORY_TOKENS)
+    elif history:
+        try:
+            msgs += memory_for(history).context()
+        except Exception as e:
+            print(f"🔧 memory error: {e}")
+    if recall_notes if recall_notes is not None else bool(history):
+        notes = recall(prompt, exclude={m["content"] for m in msgs})
+        if notes:
+            text = "Possibly relevant notes from earlier work:\n" + "\n".join(notes)
+            msgs.insert(1, {"role": "system", "content": text})
+    msgs.append({"role": "user", "content": prompt})
+    return msgs
+
+
+def _route(client, max_latency_s=None, max_ttft_s=None, budget_per_1k=None) -> list[str]:
+    """Models to try, best first (see model_selector.route); degraded ones come last."""
+    models = model_selector.route(
+        max_latency_s=max_latency_s,
+        max_ttft_s=max_ttft_s,
+        budget_per_1k=budget_per_1k,
+        prefer=client.model,
+    )
+    return [m for m in models if client.serves(m)][:FAILOVER] or [client.model]
+
+
+def gpt(
+    prompt: str, history=None, *, cache: bool = True, recall_notes: bool | None = None, **slo
+) -> str:
+    """
+    One chat completion through the shared LLM client (rate limited,
+    retried on 429). Identical requests are answered from the LLM cache;
+    pass cache=False where a fresh (non-deterministic) answer is wanted.
+    `max_latency_s`, `max_ttft_s` and `budget_per_1k` steer model routing;
+    a failing model fails over to the next candidate. Errors are returned
+    as "❌ GPT error: ..." and never cached. See build_messages() for
+    `history` and `recall_notes`.
+    """
+    client = default_client()
+    msgs = build_messages(prompt, history, recall_notes)
+    err: Exception | None = None
+    for model in _route(client, **slo):
+        try:
+            return client.complete(msgs, cache=cache, model=model)
+        except Exception as e:
+            err = e
+    return f"❌ GPT error: {err}"
+
+
+def gpt_stream(
+    prompt: str, history=None, *, cache: bool = True, recall_notes: bool | None = None, **slo
+) -> Iterator[str]:
+    """
+    gpt() as a stream of text deltas. Failover happens only before the
+    first delta; an error arrives as a final "❌ GPT error" delta.
+    """
+    client = default_client()
+    msgs = build_messages(prompt, history, recall_notes)
+    err: Exception | None = None
+    for model in _route(client, **slo):
+        started = False
+        try:
+            for delta in client.stream(msgs, cache=cache, model=model):
+                started = True
+                yield delta
+            return
+        except Exception as e:
+            if started:
+                yield f"❌ GPT error: {e}"
+                return
+            err = e
+    yield f"❌ GPT error: {err}"
 
 
 # === STATUS HOOK ===
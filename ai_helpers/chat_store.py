@@ -0,0 +1,246 @@
+"""
+Append-only chat history
+A history is a directory of JSONL segments (seg-000001.jsonl, ...), each
+with an .idx sidecar of native uint64 line offsets. Appending a message
+is one write to the segment plus 8 bytes to its index; last(n) reads n
+offsets from the index tail and then only those lines. Old segments can
+be merged or trimmed with compact(); the number of messages it has
+dropped is kept in <root>/base, so base() + i is a position that stays
+with message i across compactions. Legacy single-file JSON histories
+(a list, or project_manager's {"dialog": [...]}) are migrated on open.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+from array import array
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+SEGMENT_BYTES = 4 << 20  # roll to a new segment past this size
+BASE_FILE = "base"
+_ITEM = array("Q").itemsize
+
+
+def _seg_name(n: int) -> str:
+    return f"seg-{n:06d}.jsonl"
+
+
+def _idx_path(seg: Path) -> Path:
+    return seg.with_suffix(".idx")
+
+
+def _encode(msg: dict) -> bytes:
+    return (json.dumps(msg, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+
+def _scan_offsets(seg: Path) -> array:
+    offsets, pos = array("Q"), 0
+    with seg.open("rb") as f:
+        for line in f:
+            if line.endswith(b"\n"):
+                offsets.append(pos)
+            pos += len(line)
+    return offsets
+
+
+def _tail(fd: int, start: int, size: int) -> bytes:
+    return os.pread(fd, size - start, start)
+
+
+def _index_ok(fd: int, last: int | None, size: int) -> bool:
+    """True if the index's last offset starts the segment's final line, ending at EOF."""
+    if last is None:
+        return size == 0
+    if last >= size:
+        return False
+    rest = _tail(fd, last, size)
+    return rest.find(b"\n") == len(rest) - 1
+
+
+class ChatStore:
+    """One chat history. Safe for concurrent appenders (flock on the segment)."""
+
+    def __init__(self, root: Path | str, segment_bytes: int = SEGMENT_BYTES) -> None:
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes
+
+    # ---- segments -------------------------------------------------------------
+
+    def segments(self) -> list[Path]:
+        return sorted(self.root.glob("seg-*.jsonl"))
+
+    def _index(self, seg: Path, k: int) -> tuple[int, array]:
+        """
+        (number of lines, offsets of the last `k`) for a segment, reading
+        only the tail of its index. Rebuilds the index if a crash left it
+        behind the data.
+        """
+        idx = _idx_path(seg)
+        try:
+            count = idx.stat().st_size // _ITEM
+        except OSError:
+            count = 0
+        offsets = array("Q")
+        if count:
+            take = min(max(k, 1), count)
+            with idx.open("rb") as f:
+                f.seek((count - take) * _ITEM)
+                offsets.frombytes(f.read(take * _ITEM))
+        with seg.open("rb") as f:
+            fd = f.fileno()
+            ok = _index_ok(fd, offsets[-1] if offsets else None, os.fstat(fd).st_size)
+        if not ok:
+            offsets = _scan_offsets(seg)
+            idx.write_bytes(offsets.tobytes())
+            count = len(offsets)
+        return count, offsets[len(offsets) - min(k, len(offsets)) :]
+
+    # ---- writes ---------------------------------------------------------------
+
+    def append(self, msg: dict) -> None:
+        self.extend([msg])
+
+    def extend(self, msgs: Iterable[dict]) -> None:
+        """Append messages with one write to the current segment and its index."""
+        lines = [_encode(m) for m in msgs]
+        if not lines:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        segs = self.segments()
+        seg = segs[-1] if segs else self.root / _seg_name(1)
+        if segs and seg.stat().st_size >= self.segment_bytes:
+            seg = self.root / _seg_name(int(seg.stem.split("-")[1]) + 1)
+        with seg.open("a+b") as f, _idx_path(seg).open("a+b") as fi:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                fd = f.fileno()
+                pos = os.fstat(fd).st_size
+                n = os.fstat(fi.fileno()).st_size // _ITEM
+                last = array("Q", os.pread(fi.fileno(), _ITEM, (n - 1) * _ITEM)) if n else None
+                if pos and not _index_ok(fd, last[0] if last else None, pos):
+                    # A torn earlier append: rebuild the index, drop a partial last line.
+                    _, tail = self._index(seg, 1)
+                    start = tail[0] if tail else 0
+                    end = start + _tail(fd, start, pos).rfind(b"\n") + 1
+                    if end != pos:
+                        os.ftruncate(fd, end)
+                        pos = end
+                offsets = array("Q")
+                for line in lines:
+                    offsets.append(pos)
+                    pos += len(line)
+                f.write(b"".join(lines))
+                f.flush()
+                fi.write(offsets.tobytes())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---- reads ----------------------------------------------------------------
+
+    def last(self, n: int = 10) -> list[dict]:
+        """The newest `n` messages, reading only the tail of the newest segments."""
+        out: list[dict] = []
+        for seg in reversed(self.segments()):
+            if len(out) >= n:
+                break
+            _, offsets = self._index(seg, n - len(out))
+            if not offsets:
+                continue
+            start = offsets[0]
+            with seg.open("rb") as f:
+                f.seek(start)
+                chunk = f.read()
+            out[:0] = [json.loads(line) for line in chunk.split(b"\n")[:-1]]
+        return out[-n:] if n else []
+
+    def __iter__(self) -> Iterator[dict]:
+        for seg in self.segments():
+            with seg.open("rb") as f:
+                for line in f:
+                    if line.endswith(b"\n"):
+                        yield json.loads(line)
+
+    def __len__(self) -> int:
+        return sum(self._index(seg, 0)[0] for seg in self.segments())
+
+    def base(self) -> int:
+        """Messages compact() has dropped so far: the store starts at message base()."""
+        try:
+            return int((self.root / BASE_FILE).read_text())
+        except (OSError, ValueError):
+            return 0
+
+    # ---- maintenance ----------------------------------------------------------
+
+    def compact(self, keep_segments: int = 1, max_messages: int | None = None) -> int:
+        """
+        Merge all but the newest `keep_segments` segments into one, keeping
+        only the newest `max_messages` messages overall when given. Returns
+        the number of messages dropped.
+        """
+        segs = self.segments()
+        cut = max(0, len(segs) - keep_segments)
+        old, live = segs[:cut], segs[cut:]
+        if max_messages is not None:
+            budget = max(0, max_messages - sum(self._index(s, 0)[0] for s in live))
+        else:
+            budget = None
+        if not old or (len(old) == 1 and budget is None):
+            return 0
+        lines: list[bytes] = []
+        for seg in old:
+            with seg.open("rb") as f:
+                lines.extend(line for line in f if line.endswith(b"\n"))
+        dropped = 0
+        if budget is not None and len(lines) > budget:
+            dropped = len(lines) - budget
+            lines = lines[dropped:]
+        target = old[0]
+        tmp = target.with_name(f".{target.name}.tmp")
+        offsets, pos = array("Q"), 0
+        for line in lines:
+            offsets.append(pos)
+            pos += len(line)
+        tmp.write_bytes(b"".join(lines))
+        _idx_path(tmp).write_bytes(offsets.tobytes())
+        os.replace(_idx_path(tmp), _idx_path(target))
+        os.replace(tmp, target)
+        for seg in old[1:]:
+            seg.unlink()
+            _idx_path(seg).unlink(missing_ok=True)
+        if dropped:
+            # after the segments: meanwhile readers see too few messages, never shifted ones
+            tmp = self.root / f".{BASE_FILE}.tmp"
+            tmp.write_text(str(self.base() + dropped))
+            os.replace(tmp, self.root / BASE_FILE)
+        return dropped
+
+
+def migrate(legacy: Path | str, store: ChatStore) -> int:
+    """Copy a legacy JSON history into an empty store, then retire the JSON file."""
+    legacy = Path(legacy)
+    try:
+        data = json.loads(legacy.read_text() or "[]")
+    except (OSError, ValueError):
+        return 0
+    msgs = data.get("dialog", []) if isinstance(data, dict) else data
+    msgs = [m for m in msgs if isinstance(m, dict)] if isinstance(msgs, list) else []
+    if not store.segments():
+        store.extend(msgs)
+    legacy.rename(legacy.with_name(legacy.name + ".migrated"))
+    return len(msgs)
+
+
+def open_history(path: Path | str) -> ChatStore:
+    """
+    The store for a history formerly kept at `path` (e.g. chat_history/<sid>.json
+    -> chat_history/<sid>/), migrating the old file on first use.
+    """
+    path = Path(path)
+    store = ChatStore(path.with_suffix("") if path.suffix == ".json" else path)
+    if path.suffix == ".json" and path.is_file():
+        migrate(path, store)
+    return store
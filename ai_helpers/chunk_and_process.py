@@ -1,20 +1,24 @@
-import time
-
-from ai_helpers.ai_utils import gpt, last_msgs
+from ai_helpers.ai_utils import build_messages, memory_for
+from ai_helpers.chunking import CHUNK_TOKENS, get_tokenizer, map_reduce
+from ai_helpers.llm_client import MODEL, default_client
 from ai_helpers.master_ai_config import PROJECT
 
 
-def process_large_task(prompt, project=PROJECT):
-    chunk_size = 25000
-    responses = []
+def process_large_task(prompt, project=PROJECT, max_tokens=CHUNK_TOKENS):
+    """
+    Map-reduce over a large prompt: token-budgeted chunks are sent
+    concurrently with the same project context (rolling summary + recent
+    turns, read once), then the replies are merged hierarchically. Pacing
+    is left to the client's rate limiter.
+    """
+    history = memory_for(project).context()
+    tok = get_tokenizer(MODEL)
+    framing = build_messages("", history, recall_notes=False)
+    budget = max_tokens - sum(tok.count(str(m["content"])) for m in framing)
+    client = default_client()
 
-    for i in range(0, len(prompt), chunk_size):
-        chunk = prompt[i : i + chunk_size]
-        try:
-            response = gpt(chunk, last_msgs(project))
-            responses.append(response)
-            time.sleep(2)
-        except Exception as e:
-            responses.append(f"❌ Error processing chunk: {e}")
+    def ask(prompts):
+        msgs = [build_messages(p, history, recall_notes=False) for p in prompts]
+        return client.map(msgs, return_exceptions=True)
 
-    return "\n".join(responses)
+    return map_reduce(prompt, ask, max(budget, 256), tokenizer=tok)
@@ -0,0 +1,233 @@
+"""
+Token-aware chunking
+Splits a large text into chunks of at most `max_tokens` tokens, packing
+whole paragraphs and fenced code blocks where they fit and falling back
+to lines, sentences, words and finally raw characters for oversized
+pieces. Consecutive chunks can share `overlap` tokens of trailing
+context. map_reduce() sends the chunks out and merges the partial
+answers hierarchically (groups that fit the budget, level by level).
+
+Tokens are counted with tiktoken when it is installed, otherwise with a
+regex estimate that tends to count slightly high.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable, Sequence
+from typing import Protocol
+
+# Optional dependency: exact counts for OpenAI models.
+try:
+    import tiktoken
+except Exception:  # pragma: no cover
+    tiktoken = None  # type: ignore[assignment]
+
+CHUNK_TOKENS = 8000
+OVERLAP_TOKENS = 200
+MERGE_PROMPT = (
+    "Below are partial answers, each produced from a consecutive part of one large input. "
+    "Merge them into a single coherent answer: keep every distinct finding, drop repetition.\n\n"
+)
+PART_SEP = "\n\n---\n\n"
+
+
+class Tokenizer(Protocol):
+    def count(self, text: str) -> int: ...
+
+
+class RegexTokenizer:
+    """BPE-like estimate: short words/punctuation = 1 token, long words ~6 chars/token."""
+
+    _TOKEN = re.compile(r"\w+|[^\w\s]|\n")
+
+    def count(self, text: str) -> int:
+        n = 0
+        for tok in self._TOKEN.findall(text):
+            if tok.isascii():
+                n += 1 + (len(tok) - 1) // 6
+            else:
+                n += len(tok)  # CJK and friends: about a token per character
+        return n
+
+
+class TiktokenTokenizer:
+    def __init__(self, model: str) -> None:
+        if tiktoken is None:
+            raise RuntimeError("TiktokenTokenizer requires tiktoken (pip install tiktoken)")
+        try:
+            self._enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self._enc = tiktoken.get_encoding("o200k_base")
+
+    def count(self, text: str) -> int:
+        return len(self._enc.encode(text, disallowed_special=()))
+
+
+_tokenizers: dict[str, Tokenizer] = {}
+
+
+def get_tokenizer(model: str = "gpt-4o") -> Tokenizer:
+    """tiktoken's encoding for `model` when available, else the regex estimate."""
+    tok = _tokenizers.get(model)
+    if tok is None:
+        tok = _tokenizers[model] = TiktokenTokenizer(model) if tiktoken else RegexTokenizer()
+    return tok
+
+
+# ---- splitting ------------------------------------------------------------------
+
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+# (separator, text, tokens); the separator joins a unit to the one before it
+Unit = tuple[str, str, int]
+
+
+def _blocks(text: str) -> list[str]:
+    """Blank-line separated paragraphs; a fenced code block is always one block."""
+    blocks: list[str] = []
+    cur: list[str] = []
+    fence = None
+    for line in text.splitlines():
+        m = _FENCE.match(line)
+        if fence:
+            cur.append(line)
+            if m and m.group(1) == fence:
+                blocks.append("\n".join(cur))
+                cur, fence = [], None
+        elif m:
+            if cur:
+                blocks.append("\n".join(cur))
+            cur, fence = [line], m.group(1)
+        elif not line.strip():
+            if cur:
+                blocks.append("\n".join(cur))
+                cur = []
+        else:
+            cur.append(line)
+    if cur:
+        blocks.append("\n".join(cur))
+    return blocks
+
+
+# Finer and finer boundaries for a piece that does not fit on its own.
+_LEVELS: tuple[tuple[str, Callable[[str], list[str]]], ...] = (
+    ("\n", str.splitlines),
+    (" ", _SENTENCE.split),
+    (" ", str.split),
+)
+
+
+def _explode(
+    piece: str, sep: str, max_tokens: int, tok: Tokenizer, out: list[Unit], depth: int = 0
+) -> None:
+    n = tok.count(piece)
+    if n <= max_tokens:
+        out.append((sep, piece, n))
+        return
+    if depth == len(_LEVELS):
+        step = max(1, len(piece) * max_tokens // n)  # characters per full piece
+        for i in range(0, len(piece), step):
+            part = piece[i : i + step]
+            out.append((sep if i == 0 else "", part, tok.count(part)))
+        return
+    inner, split = _LEVELS[depth]
+    parts = [p for p in split(piece) if p.strip()]
+    for i, part in enumerate(parts):
+        _explode(part, sep if i == 0 else inner, max_tokens, tok, out, depth + 1)
+
+
+def _units(text: str, max_tokens: int, tok: Tokenizer) -> list[Unit]:
+    out: list[Unit] = []
+    for block in _blocks(text):
+        _explode(block, "\n\n", max_tokens, tok, out)
+    return out
+
+
+def _join(units: Sequence[Unit]) -> str:
+    return "".join(text if i == 0 else sep + text for i, (sep, text, _) in enumerate(units))
+
+
+def _pack(units: list[Unit], max_tokens: int, overlap: int) -> list[str]:
+    chunks: list[str] = []
+    cur: list[Unit] = []
+    total = 0
+    for unit in units:
+        if cur and total + unit[2] > max_tokens:
+            chunks.append(_join(cur))
+            carry: list[Unit] = []
+            kept = 0
+            for prev in reversed(cur):
+                if kept + prev[2] > overlap:
+                    break
+                carry.insert(0, prev)
+                kept += prev[2]
+            if kept + unit[2] > max_tokens:
+                carry, kept = [], 0
+            cur, total = carry, kept
+        cur.append(unit)
+        total += unit[2]
+    if cur:
+        chunks.append(_join(cur))
+    return chunks
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_TOKENS,
+    overlap: int = OVERLAP_TOKENS,
+    tokenizer: Tokenizer | None = None,
+) -> list[str]:
+    """
+    Chunks of about `max_tokens` tokens or fewer, cut at paragraph/code
+    boundaries where possible; each chunk repeats up to `overlap` tokens of
+    whole trailing units from the previous one.
+    """
+    tok = tokenizer or get_tokenizer()
+    return _pack(_units(text, max_tokens, tok), max_tokens, overlap)
+
+
+# ---- map / reduce -------------------------------------------------------------
+
+# ask(prompts) -> replies in the same order; a failed prompt yields its exception
+Ask = Callable[[list[str]], list]
+
+
+def merge_hierarchically(
+    parts: list[str],
+    ask: Ask,
+    max_tokens: int = CHUNK_TOKENS,
+    tokenizer: Tokenizer | None = None,
+) -> str:
+    """
+    Merge partial answers level by level: each level packs as many parts as
+    fit into one merge prompt and asks for all groups concurrently, until
+    one answer remains. A failed merge falls back to the joined group.
+    """
+    tok = tokenizer or get_tokenizer()
+    budget = max(1, max_tokens - tok.count(MERGE_PROMPT))
+    while len(parts) > 1:
+        units = [(PART_SEP, p, tok.count(p)) for p in parts]
+        groups = _pack(units, budget, 0)
+        if len(groups) == len(parts):  # nothing fits together: merge pairwise
+            groups = [PART_SEP.join(parts[i : i + 2]) for i in range(0, len(parts), 2)]
+        replies = ask([MERGE_PROMPT + g for g in groups])
+        parts = [g if isinstance(r, Exception) else r for g, r in zip(groups, replies, strict=True)]
+    return parts[0] if parts else ""
+
+
+def map_reduce(
+    text: str,
+    ask: Ask,
+    max_tokens: int = CHUNK_TOKENS,
+    overlap: int = OVERLAP_TOKENS,
+    tokenizer: Tokenizer | None = None,
+) -> str:
+    """Answer every chunk of `text` concurrently, then merge the answers hierarchically."""
+    tok = tokenizer or get_tokenizer()
+    replies = ask(chunk_text(text, max_tokens, overlap, tok))
+    ok = [r for r in replies if not isinstance(r, Exception)]
+    errors = [f"❌ Error processing chunk: {r}" for r in replies if isinstance(r, Exception)]
+    merged = [merge_hierarchically(ok, ask, max_tokens, tok)] if ok else []
+    return "\n".join(merged + errors)
@@ -0,0 +1,227 @@
+"""
+LLM path benchmark
+Drives the GPT-driven code paths (gpt, gpt_stream, planner.plan,
+executor.apply_plan, process_large_task) against the stand-in server
+(llm_stub) or any OpenAI-compatible URL, at several concurrency levels,
+and reports throughput and p50/p95/p99 latency (plus TTFT for streams).
+Everything goes through the real openai client and the shared LLM
+client (limiter, retries, routing), so it measures our overhead too.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import math
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import model_selector
+from ai_helpers import llm_cache, llm_client
+from ai_helpers.llm_stub import StubConfig, start_stub_server
+
+LARGE_INPUT_CHARS = 120_000  # process_large_task input: a handful of chunks
+
+
+class BenchError(Exception):
+    pass
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile (q in 0..1)."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def _checked(reply: str) -> str:
+    if reply.startswith(("❌", "⚠️")):
+        raise BenchError(reply)
+    return reply
+
+
+@contextlib.contextmanager
+def _gpt(workdir: Path) -> Iterator[Callable[[int], float | None]]:
+    from ai_helpers import ai_utils
+
+    yield lambda i: _checked(ai_utils.gpt(f"bench request {i}: summarise the plan")) and None
+
+
+@contextlib.contextmanager
+def _gpt_stream(workdir: Path) -> Iterator[Callable[[int], float | None]]:
+    from ai_helpers import ai_utils
+
+    def stream(i: int) -> float:
+        t0 = time.perf_counter()
+        ttft = None
+        for delta in ai_utils.gpt_stream(f"bench request {i}: describe the run"):
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+            _checked(delta)
+        if ttft is None:
+            raise BenchError("empty stream")
+        return ttft
+
+    yield stream
+
+
+@contextlib.contextmanager
+def _planner(workdir: Path) -> Iterator[Callable[[int], float | None]]:
+    import planner
+
+    def plan(i: int) -> None:
+        goal = f"bench goal {i}: build a greeter"
+        if planner.plan(goal) == [goal]:  # plan() swallows errors
+            raise BenchError("planner fell back to the goal")
+
+    yield plan
+
+
+@contextlib.contextmanager
+def _executor(workdir: Path) -> Iterator[Callable[[int], float | None]]:
+    import executor
+
+    # patched once for all workers: files land in workdir, no pytest run
+    with (
+        mock.patch.object(executor, "PROJECT_ROOT", workdir),
+        mock.patch.object(executor, "_run_tests", lambda *a: None),
+        contextlib.redirect_stdout(io.StringIO()),
+    ):
+        yield lambda i: executor.apply_plan([f"Create hello_{i}.py with a greet()"]) and None
+
+
+@contextlib.contextmanager
+def _chunks(workdir: Path) -> Iterator[Callable[[int], float | None]]:
+    from ai_helpers.chunk_and_process import process_large_task
+
+    text = "\n\n".join(f"Paragraph {n}: " + "lorem ipsum dolor " * 40 for n in range(200))
+    text = text[:LARGE_INPUT_CHARS]
+    yield lambda i: _checked(process_large_task(f"[{i}] {text}", project="bench")) and None
+
+
+_SCENARIOS = {
+    "gpt": _gpt,
+    "gpt_stream": _gpt_stream,
+    "planner": _planner,
+    "executor": _executor,
+    "chunks": _chunks,
+}
+SCENARIOS = tuple(_SCENARIOS)
+
+
+def _scenario(name: str, workdir: Path) -> contextlib.AbstractContextManager:
+    """A context yielding a call for request i; it returns its TTFT when the path streams."""
+    if name not in _SCENARIOS:
+        raise ValueError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+    return _SCENARIOS[name](workdir)
+
+
+def run_level(call: Callable[[int], float | None], concurrency: int, requests: int) -> dict:
+    latencies: list[float] = []
+    ttfts: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            ttft = call(i)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - t0)
+            if ttft is not None:
+                ttfts.append(ttft)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - t0
+    row = {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(wall, 3),
+        "throughput": round(len(latencies) / wall, 2) if wall else 0.0,
+    }
+    for q in (50, 95, 99):
+        row[f"p{q}"] = percentile(latencies, q / 100)
+        if ttfts:
+            row[f"ttft_p{q}"] = percentile(ttfts, q / 100)
+    return row
+
+
+@contextlib.contextmanager
+def _llm_env(base_url: str, concurrency: int, cache: bool) -> Iterator[None]:
+    """Point the shared client at `base_url` for the duration of the bench."""
+    with tempfile.TemporaryDirectory(prefix="llm-bench-") as tmp:
+        env = {
+            "OPENAI_BASE_URL": base_url,
+            "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "stub",
+            llm_client.BACKEND_ENV: "openai",
+            llm_client.CONCURRENCY_ENV: str(concurrency),
+            "MASTER_AI_LLM_CACHE": str(Path(tmp) / "llm.sqlite3") if cache else "off",
+            "MASTER_AI_MODEL_STATS": str(Path(tmp) / "stats.sqlite3"),
+        }
+        with mock.patch.dict(os.environ, env):
+            llm_client.reset()
+            try:
+                yield
+            finally:
+                llm_client.reset()
+                # the stores hold files in `tmp`: close them before it goes
+                llm_cache.close_cache()
+                model_selector.close_stats_store()
+
+
+def bench(
+    scenarios: list[str],
+    levels: list[int],
+    requests: int = 50,
+    *,
+    url: str | None = None,
+    config: StubConfig | None = None,
+    cache: bool = False,
+) -> list[dict]:
+    """Run every scenario at every concurrency level; one result row each."""
+    server = None if url else start_stub_server(config=config)
+    rows = []
+    try:
+        with _llm_env(url or server.url, max(levels), cache), tempfile.TemporaryDirectory() as wd:
+            for name in scenarios:
+                with _scenario(name, Path(wd)) as call:
+                    call(-1)  # warm-up: imports, connection pool
+                    for level in levels:
+                        rows.append({"scenario": name, **run_level(call, level, requests)})
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return rows
+
+
+def format_rows(rows: list[dict]) -> str:
+    def ms(v: float | None) -> str:
+        return f"{v * 1000:8.1f}" if v is not None else "       -"
+
+    out = [
+        f"{'scenario':<11}{'conc':>5}{'reqs':>6}{'err':>5}{'req/s':>8}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttft50':>9}{'ttft95':>9}{'ttft99':>9}"
+    ]
+    for r in rows:
+        out.append(
+            f"{r['scenario']:<11}{r['concurrency']:>5}{r['requests']:>6}{r['errors']:>5}"
+            f"{r['throughput']:>8.1f} {ms(r['p50'])} {ms(r['p95'])} {ms(r['p99'])}"
+            f" {ms(r.get('ttft_p50'))} {ms(r.get('ttft_p95'))} {ms(r.get('ttft_p99'))}"
+        )
+    return "\n".join(out)
@@ -0,0 +1,191 @@
+"""
+LLM response cache
+Completions keyed by a canonical hash of (model, messages, parameters),
+held in an in-memory LRU in front of a SQLite table. Entries expire after
+a TTL; the memory tier is capped by entry count and the disk tier by
+bytes (least recently used rows go first). MASTER_AI_LLM_CACHE=off turns
+it off process-wide; gpt(..., cache=False) bypasses it per call.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from master_ai.runtime import metrics
+
+# "off"/"0" disables the cache; any other value is the SQLite file to use.
+ENV = "MASTER_AI_LLM_CACHE"
+DEFAULT_PATH = Path.home() / "automation" / "cache" / "llm.sqlite3"
+DEFAULT_TTL_S = 7 * 24 * 3600.0
+MEMORY_ENTRIES = 256
+DISK_BYTES = 64 << 20
+
+LOOKUPS = metrics.counter(
+    "master_ai_llm_cache_total", "LLM cache lookups by result (memory/disk/miss/bypass)", ["result"]
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed);
+"""
+
+
+def cache_key(model: str, messages: list[dict], **params) -> str:
+    """sha256 of the request in canonical JSON (sorted keys, no whitespace)."""
+    doc = {"model": model, "messages": messages, "params": params}
+    blob = json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class LLMCache:
+    """Two-tier (memory LRU + SQLite) completion cache; thread-safe."""
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_PATH,
+        *,
+        ttl: float = DEFAULT_TTL_S,
+        memory_entries: int = MEMORY_ENTRIES,
+        disk_bytes: int = DISK_BYTES,
+    ) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+        self._mem: OrderedDict[str, tuple[str, float]] = OrderedDict()  # key -> (value, expires)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(_SCHEMA)
+        self._bytes = self._total_bytes()
+
+    def close(self) -> None:
+        self._con.close()
+
+    def _total_bytes(self) -> int:
+        return self._con.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _remember(self, key: str, value: str, expires: float) -> None:
+        self._mem[key] = (value, expires)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str, now: float | None = None) -> str | None:
+        now = time.time() if now is None else now
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None and hit[1] > now:
+                self._mem.move_to_end(key)
+                LOOKUPS.labels("memory").inc()
+                return hit[0]
+            row = self._con.execute(
+                "SELECT value, expires FROM responses WHERE key=?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self._mem.pop(key, None)
+                LOOKUPS.labels("miss").inc()
+                return None
+            self._con.execute("UPDATE responses SET accessed=? WHERE key=?", (now, key))
+            self._remember(key, row[0], row[1])
+            LOOKUPS.labels("disk").inc()
+            return row[0]
+
+    def put(
+        self,
+        key: str,
+        value: str,
+        *,
+        model: str = "",
+        ttl: float | None = None,
+        now: float | None = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        expires = now + (self.ttl if ttl is None else ttl)
+        size = len(value.encode())
+        with self._lock:
+            self._remember(key, value, expires)
+            old = self._con.execute("SELECT size FROM responses WHERE key=?", (key,)).fetchone()
+            self._con.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, model, value, size, created, expires, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, value, size, now, expires, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            if self._bytes > self.disk_bytes:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired rows, then least recently used ones down to 90% of the cap."""
+        self._con.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        target = int(self.disk_bytes * 0.9)
+        total = self._total_bytes()
+        if total > target:
+            cur = self._con.execute("SELECT key, size FROM responses ORDER BY accessed")
+            doomed = []
+            for key, size in cur:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            self._con.executemany("DELETE FROM responses WHERE key=?", doomed)
+        self._bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._con.execute("DELETE FROM responses")
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return self._con.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+_cache: LLMCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache | None:
+    """The process-wide cache configured by MASTER_AI_LLM_CACHE (None when off)."""
+    global _cache
+    setting = os.environ.get(ENV, "")
+    if setting.lower() in {"0", "off", "false", "no"}:
+        return None
+    path = Path(setting) if setting else DEFAULT_PATH
+    with _cache_lock:
+        if _cache is None or _cache.path != path:
+            _cache = LLMCache(path)
+        return _cache
+
+
+def close_cache() -> None:
+    """Close the process-wide cache; the next get_cache() opens it again."""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = None
+
+
+def bypassed() -> None:
+    """Count a lookup skipped on purpose (non-deterministic call)."""
+    LOOKUPS.labels("bypass").inc()
@@ -0,0 +1,422 @@
+"""
+Concurrent LLM client
+One shared API client (one HTTP connection pool) behind a limiter that
+bounds in-flight requests, spends a tokens-per-minute budget and backs
+off together when the API answers 429 (honouring Retry-After). The
+concurrency limit adapts AIMD-style: halved on a rate limit, raised by
+one after a run of successes. `map()` fans requests out over a thread
+pool and returns results in input order; `stream()` yields a reply as
+it is generated. Responses go through the llm_cache like gpt() does.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from collections.abc import Callable, Generator, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+import model_selector
+from ai_helpers import llm_cache
+from ai_helpers.master_ai_config import OPENAI_API_KEY, openai
+from master_ai.runtime import metrics
+
+MODEL = "gpt-4o"
+# "stub" answers locally and instantly (tests, offline runs); default "openai".
+BACKEND_ENV = "MASTER_AI_LLM_BACKEND"
+CONCURRENCY_ENV = "MASTER_AI_LLM_CONCURRENCY"
+TPM_ENV = "MASTER_AI_LLM_TPM"
+MAX_CONCURRENCY = 8
+OUTPUT_RESERVE = 512  # tokens budgeted for a reply before its usage is known
+MAX_BACKOFF_S = 60.0
+
+REQUESTS = metrics.counter("master_ai_llm_requests_total", "LLM API calls by outcome", ["outcome"])
+THROTTLES = metrics.counter("master_ai_llm_throttles_total", "Rate-limit (429) answers")
+LATENCY = metrics.histogram("master_ai_llm_seconds", "LLM API call wall time")
+TTFT = metrics.histogram("master_ai_llm_ttft_seconds", "Time to first streamed token")
+
+# transport(model, messages) -> (reply text, total tokens used or None)
+Transport = Callable[[str, list[dict]], tuple[str, int | None]]
+# stream_transport(model, messages) -> text deltas
+StreamTransport = Callable[[str, list[dict]], Iterator[str]]
+
+
+class RateLimited(Exception):
+    """Raised by a transport for HTTP 429; `retry_after` in seconds if the server said."""
+
+    def __init__(self, message: str = "rate limited", retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(msgs: list[dict]) -> int:
+    """Rough prompt size (~4 characters per token) plus the reply reserve."""
+    return sum(len(str(m.get("content", ""))) for m in msgs) // 4 + 4 * len(msgs) + OUTPUT_RESERVE
+
+
+class RateLimiter:
+    """
+    Shared admission control for API calls: at most `limit` in flight
+    (adaptive, between 1 and `max_concurrency`), a token bucket refilled
+    at `tpm` tokens per minute, and a common pause after a 429.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, tpm: int | None = None) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.tpm = tpm
+        self.active = 0
+        self._cond = threading.Condition()
+        self._tokens = float(tpm or 0)
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._streak = 0
+
+    def _refill(self, now: float) -> None:
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + (now - self._stamp) * self.tpm / 60)
+        self._stamp = now
+
+    def acquire(self, tokens: int) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait: float | None = self._paused_until - now
+                elif self.active >= self.limit:
+                    wait = None  # until a release
+                elif self.tpm and self._tokens < min(tokens, self.tpm):
+                    wait = (min(tokens, self.tpm) - self._tokens) * 60 / self.tpm
+                else:
+                    self.active += 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+                self._cond.wait(wait)
+
+    def release(self, ok: bool, correction: int = 0) -> None:
+        """End a call; `correction` = actual tokens used minus the estimate."""
+        with self._cond:
+            self.active -= 1
+            if self.tpm:
+                self._tokens -= correction
+            if ok:
+                self._streak += 1
+                if self._streak >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._streak = 0
+            self._cond.notify_all()
+
+    def throttle(self, delay: float) -> None:
+        """A 429: everyone waits `delay` seconds and the concurrency limit halves."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self.limit = max(1, self.limit // 2)
+            self._streak = 0
+            self._cond.notify_all()
+
+
+def _stub_reply(msgs: list[dict]) -> str:
+    return f"[stub] {msgs[-1]['content'][:200]}"
+
+
+def _stub_transport(model: str, msgs: list[dict]) -> tuple[str, int | None]:
+    return _stub_reply(msgs), None
+
+
+def _stub_stream(model: str, msgs: list[dict]) -> Iterator[str]:
+    words = _stub_reply(msgs).split(" ")
+    for i, word in enumerate(words):
+        yield word if i == 0 else " " + word
+
+
+_api = None
+_api_lock = threading.Lock()
+
+
+def _retry_after(exc: Exception) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def _openai_api():
+    global _api
+    if openai is None:
+        raise RuntimeError("the openai backend requires openai (pip install openai)")
+    with _api_lock:
+        if _api is None:
+            # One client = one connection pool for every thread; retries are ours.
+            _api = openai.OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        return _api
+
+
+def _openai_transport(model: str, msgs: list[dict]) -> tuple[str, int | None]:
+    try:
+        r = _openai_api().chat.completions.create(model=model, messages=msgs)
+    except openai.RateLimitError as e:
+        raise RateLimited(str(e), _retry_after(e)) from e
+    usage = getattr(r, "usage", None)
+    return r.choices[0].message.content.strip(), getattr(usage, "total_tokens", None)
+
+
+def _openai_stream(model: str, msgs: list[dict]) -> Iterator[str]:
+    try:
+        chunks = _openai_api().chat.completions.create(model=model, messages=msgs, stream=True)
+    except openai.RateLimitError as e:
+        raise RateLimited(str(e), _retry_after(e)) from e
+    for chunk in chunks:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _backoff(attempt: int) -> float:
+    return min(MAX_BACKOFF_S, 2**attempt) * random.uniform(0.5, 1.0)
+
+
+def _transient(exc: Exception) -> bool:
+    if openai is not None and isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return (getattr(exc, "status_code", None) or 0) >= 500
+
+
+class LLMClient:
+    """Thread-safe chat-completion client; share one per process (see default_client)."""
+
+    def __init__(
+        self,
+        *,
+        model: str = MODEL,
+        max_concurrency: int = MAX_CONCURRENCY,
+        tpm: int | None = None,
+        max_retries: int = 5,
+        transport: Transport | None = None,
+        stream_transport: StreamTransport | None = None,
+        backend: str | None = None,
+    ) -> None:
+        self.model = model
+        self.backend = backend or os.environ.get(BACKEND_ENV, "openai")
+        stub = self.backend == "stub"
+        self.transport = transport or (_stub_transport if stub else _openai_transport)
+        self.stream_transport = stream_transport or (_stub_stream if stub else _openai_stream)
+        self.limiter = RateLimiter(max_concurrency, tpm)
+        self.max_retries = max_retries
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+
+    def serves(self, model: str) -> bool:
+        """Whether this client's backend can answer for `model`."""
+        return self.backend != "openai" or not model.startswith("claude")
+
+    def _cached(
+        self, msgs: list[dict], cache: bool, model: str
+    ) -> tuple[llm_cache.LLMCache | None, str, str | None]:
+        store = llm_cache.get_cache() if cache else None
+        if not cache:
+            llm_cache.bypassed()
+        key = llm_cache.cache_key(model, msgs, backend=self.backend)
+        return store, key, store.get(key) if store is not None else None
+
+    def complete(self, msgs: list[dict], *, cache: bool = True, model: str | None = None) -> str:
+        """One completion (cached unless cache=False); raises after the last retry."""
+        model = model or self.model
+        store, key, hit = self._cached(msgs, cache, model)
+        if hit is not None:
+            return hit
+        reply = self._call(msgs, model)
+        if store is not None:
+            store.put(key, reply, model=model)
+        return reply
+
+    def _call(self, msgs: list[dict], model: str) -> str:
+        estimate = estimate_tokens(msgs)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimate)
+            t0 = time.perf_counter()
+            try:
+                reply, used = self.transport(model, msgs)
+            except RateLimited as e:
+                # the limiter's backoff handles throttling; the model is not failing
+                self.limiter.release(ok=False)
+                THROTTLES.inc()
+                if attempt == self.max_retries:
+                    REQUESTS.labels("rate_limited").inc()
+                    raise
+                self.limiter.throttle(_backoff(attempt) if e.retry_after is None else e.retry_after)
+                continue
+            except Exception as e:
+                self.limiter.release(ok=False)
+                model_selector.record(model, ok=False)
+                if attempt == self.max_retries or not _transient(e):
+                    REQUESTS.labels("error").inc()
+                    raise
+                time.sleep(_backoff(attempt))
+                continue
+            elapsed = time.perf_counter() - t0
+            LATENCY.observe(elapsed)
+            REQUESTS.labels("ok").inc()
+            self.limiter.release(ok=True, correction=(used - estimate) if used else 0)
+            model_selector.record(
+                model, ok=True, latency=elapsed, tokens=used or estimate, out_tokens=len(reply) // 4
+            )
+            return reply
+        raise AssertionError("unreachable")
+
+    def stream(
+        self, msgs: list[dict], *, cache: bool = True, model: str | None = None
+    ) -> Iterator[str]:
+        """
+        Yield the reply as text deltas while it is generated. A cache hit
+        comes back as one delta; the full text is cached at the end.
+        Retries (429 / transient errors) only happen before the first delta.
+        """
+        model = model or self.model
+        store, key, hit = self._cached(msgs, cache, model)
+        if hit is not None:
+            yield hit
+            return
+        estimate = estimate_tokens(msgs)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimate)
+            t0 = time.perf_counter()
+            parts: list[str] = []
+            ok = False
+            try:
+                ttft = yield from self._deltas(model, msgs, t0, parts)
+                ok = True
+            except Exception as e:
+                if not isinstance(e, RateLimited):  # as in _call: a 429 is not a model error
+                    model_selector.record(model, ok=False)
+                delay, throttled = self._stream_retry(e, attempt, started=bool(parts))
+            finally:
+                self.limiter.release(ok=ok)  # also on early close
+            if ok:
+                self._stream_done(model, "".join(parts), t0, ttft, estimate, store, key)
+                return
+            if throttled:
+                self.limiter.throttle(delay)
+            else:
+                time.sleep(delay)
+
+    def _deltas(
+        self, model: str, msgs: list[dict], t0: float, parts: list[str]
+    ) -> Generator[str, None, float | None]:
+        """Pass the transport's deltas through, collecting them; returns the TTFT."""
+        ttft = None
+        for delta in self.stream_transport(model, msgs):
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+                TTFT.observe(ttft)
+            parts.append(delta)
+            yield delta
+        return ttft
+
+    def _stream_retry(self, e: Exception, attempt: int, started: bool) -> tuple[float, bool]:
+        """
+        (delay, rate_limited) before retrying a failed stream; re-raises `e`
+        once a delta went out, after the last attempt or for a permanent error.
+        """
+        if isinstance(e, RateLimited):
+            THROTTLES.inc()
+            if started or attempt == self.max_retries:
+                REQUESTS.labels("rate_limited").inc()
+                raise e
+            return (_backoff(attempt) if e.retry_after is None else e.retry_after), True
+        if started or attempt == self.max_retries or not _transient(e):
+            REQUESTS.labels("error").inc()
+            raise e
+        return _backoff(attempt), False
+
+    def _stream_done(
+        self,
+        model: str,
+        reply: str,
+        t0: float,
+        ttft: float | None,
+        estimate: int,
+        store: llm_cache.LLMCache | None,
+        key: str,
+    ) -> None:
+        elapsed = time.perf_counter() - t0
+        LATENCY.observe(elapsed)
+        REQUESTS.labels("ok").inc()
+        out_tokens = len(reply) // 4
+        model_selector.record(
+            model,
+            ok=True,
+            latency=elapsed,
+            ttft=ttft,
+            tokens=estimate - OUTPUT_RESERVE + out_tokens,
+            out_tokens=out_tokens,
+        )
+        if store is not None:
+            store.put(key, reply, model=model)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    self.limiter.max_concurrency, thread_name_prefix="llm"
+                )
+            return self._pool
+
+    def map(
+        self,
+        requests: Sequence[list[dict]],
+        *,
+        cache: bool = True,
+        return_exceptions: bool = False,
+    ) -> list:
+        """
+        Complete every message list concurrently; results come back in input
+        order. With return_exceptions=True a failed request yields its
+        exception instead of raising.
+        """
+        futures = [self._executor().submit(self.complete, m, cache=cache) for m in requests]
+        out = []
+        for f in futures:
+            try:
+                out.append(f.result())
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                out.append(e)
+        return out
+
+
+_default: LLMClient | None = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> LLMClient:
+    """
+    The process-wide client; MASTER_AI_LLM_CONCURRENCY and MASTER_AI_LLM_TPM
+    size its limiter. Rebuilt if MASTER_AI_LLM_BACKEND changes.
+    """
+    global _default
+    backend = os.environ.get(BACKEND_ENV, "openai")
+    with _default_lock:
+        if _default is None or _default.backend != backend:
+            tpm = os.environ.get(TPM_ENV)
+            _default = LLMClient(
+                max_concurrency=int(os.environ.get(CONCURRENCY_ENV, MAX_CONCURRENCY)),
+                tpm=int(tpm) if tpm else None,
+                backend=backend,
+            )
+        return _default
+
+
+def reset() -> None:
+    """Forget the shared client and API connection (after changing backend env vars)."""
+    global _default, _api
+    with _default_lock, _api_lock:
+        _default, _api = None, None
@@ -0,0 +1,225 @@
+"""
+LLM stand-in server
+A local server speaking enough of the OpenAI chat-completions API
+(POST /v1/chat/completions, plain and stream=True; GET /v1/models) for
+the real openai client to talk to it via OPENAI_BASE_URL. Time to first
+token is drawn from a configurable distribution and tokens then arrive
+at `tokens_per_s`; 429s (with Retry-After) can be injected at random or
+above a concurrency cap. Replies come from canned (regex -> text) rules,
+falling back to filler text, so the GPT-driven paths can be load-tested
+offline (see llm_bench).
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Replies shaped like what planner.plan / executor.apply_plan /
+# chunking's merge step parse, so those paths run end to end.
+CANNED: tuple[tuple[str, str], ...] = (
+    (
+        r"high-level steps",
+        "1. Create hello.py with a greet() function\n"
+        "2. Add tests/test_hello.py covering greet()\n"
+        "3. Document usage in README.md",
+    ),
+    (r"Generate the \*complete\* content", 'def greet(name="world"):\n    return f"hi {name}"\n'),
+    (r"Merge them into a single coherent answer", "Merged summary of all parts."),
+)
+FILLER = (
+    "the quick brown fox jumps over the lazy dog while the agent plans builds tests and "
+    "reports every step of the run in order"
+).split()
+
+
+def sample(spec: str, rng: random.Random) -> float:
+    """
+    Seconds drawn from a distribution spec: "fixed:x", "uniform:a,b",
+    "normal:mean,sd", "lognormal:median,sigma" or "exp:mean" (never < 0).
+    """
+    kind, _, args = spec.partition(":")
+    a = [float(x) for x in args.split(",") if x]
+    if kind == "fixed":
+        v = a[0]
+    elif kind == "uniform":
+        v = rng.uniform(a[0], a[1])
+    elif kind == "normal":
+        v = rng.gauss(a[0], a[1])
+    elif kind == "lognormal":
+        v = rng.lognormvariate(0.0, a[1]) * a[0]
+    elif kind == "exp":
+        v = rng.expovariate(1 / a[0])
+    else:
+        raise ValueError(f"unknown latency distribution {spec!r}")
+    return max(0.0, v)
+
+
+@dataclass
+class StubConfig:
+    ttft: str = "lognormal:0.25,0.4"  # seconds before the first token
+    tokens_per_s: float = 80.0  # 0 = all at once
+    reply_tokens: int = 60  # filler length when no canned rule matches
+    rate_429: float = 0.0  # probability of answering 429
+    retry_after: float = 1.0
+    max_concurrency: int = 0  # > 0: 429 beyond this many requests in flight
+    canned: list[tuple[str, str]] = field(default_factory=lambda: list(CANNED))
+    seed: int | None = None
+
+    def reply_for(self, messages: list[dict], rng: random.Random) -> str:
+        prompt = str(messages[-1].get("content", "")) if messages else ""
+        for pattern, reply in self.canned:
+            if re.search(pattern, prompt):
+                return reply
+        return " ".join(rng.choice(FILLER) for _ in range(self.reply_tokens))
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"\s*\S+|\s+", text)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MasterAIStubLLM/0.1"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a) -> None:
+        pass
+
+    def _json(self, status: int, doc: dict, headers: dict | None = None) -> None:
+        body = json.dumps(doc).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        else:
+            self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self) -> None:  # noqa: N802
+        srv: StubServer = self.server  # type: ignore[assignment]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        req = json.loads(body or b"{}")
+        cfg = srv.config
+        with srv.lock:
+            rng = random.Random(srv.rng.random())
+            srv.stats["requests"] += 1
+            over = cfg.max_concurrency and srv.inflight >= cfg.max_concurrency
+            if over or rng.random() < cfg.rate_429:
+                srv.stats["throttled"] += 1
+                limited = True
+            else:
+                srv.inflight += 1
+                limited = False
+        if limited:
+            self._json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                {"Retry-After": f"{cfg.retry_after:g}"},
+            )
+            return
+        try:
+            self._complete(req, cfg, rng)
+        finally:
+            with srv.lock:
+                srv.inflight -= 1
+
+    def _complete(self, req: dict, cfg: StubConfig, rng: random.Random) -> None:
+        messages = req.get("messages") or []
+        model = req.get("model", "stub")
+        reply = cfg.reply_for(messages, rng)
+        tokens = _tokens(reply)
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        gap = 1 / cfg.tokens_per_s if cfg.tokens_per_s else 0.0
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        time.sleep(sample(cfg.ttft, rng))
+        if not req.get("stream"):
+            time.sleep(gap * max(0, len(tokens) - 1))
+            self._json(
+                200,
+                {
+                    "id": cid,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": reply},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": prompt_tokens + len(tokens),
+                    },
+                },
+            )
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: dict, finish: str | None = None) -> bytes:
+            doc = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(doc)}\n\n".encode()
+
+        self.wfile.write(chunk({"role": "assistant", "content": ""}))
+        for i, tok in enumerate(tokens):
+            if i:
+                time.sleep(gap)
+            self.wfile.write(chunk({"content": tok}))
+            self.wfile.flush()
+        self.wfile.write(chunk({}, "stop"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: tuple[str, int], config: StubConfig) -> None:
+        super().__init__(addr, _Handler)
+        self.config = config
+        self.lock = threading.Lock()
+        self.rng = random.Random(config.seed)
+        self.inflight = 0
+        self.stats = {"requests": 0, "throttled": 0}
+
+    @property
+    def url(self) -> str:
+        """Base URL for OPENAI_BASE_URL / openai.OpenAI(base_url=...)."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_stub_server(addr: str = "127.0.0.1:0", config: StubConfig | None = None) -> StubServer:
+    """Serve from a daemon thread; port 0 picks a free port (see .url)."""
+    host, _, port = addr.rpartition(":")
+    server = StubServer((host or "127.0.0.1", int(port)), config or StubConfig())
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
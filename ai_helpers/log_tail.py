@@ -0,0 +1,182 @@
+"""
+Incremental log tail
+Keeps a byte offset into a growing log and a bounded deque of its last
+lines, so each refresh costs O(new bytes). The first read (and any
+rotation / symlink swap, see run_goal._update_symlink) seeks backwards
+from the end instead of reading the whole file. `wait()` blocks on
+inotify (Linux) or falls back to stat polling.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import time
+from collections import deque
+from pathlib import Path
+
+BLOCK = 8192
+
+
+def read_last_lines(path: Path, n: int, block: int = BLOCK) -> tuple[list[str], int]:
+    """Last `n` complete lines of `path`, reading backwards from the end.
+
+    Returns (lines, offset just past the last complete line).
+    """
+    with path.open("rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        buf = b""
+        while pos > 0 and buf.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+        # Stop at the last newline: a trailing partial line is read once completed.
+        nl = buf.rfind(b"\n")
+        if nl < 0:
+            return [], pos  # no complete line yet
+        end = pos + nl + 1
+        lines = buf[: nl + 1].decode(errors="replace").splitlines()
+    return lines[-n:], end
+
+
+class LogTail:
+    """Last `max_lines` lines of a log that may grow, rotate or be re-pointed."""
+
+    def __init__(self, path: Path | str, max_lines: int = 20) -> None:
+        self.path = Path(path)
+        self.lines: deque[str] = deque(maxlen=max_lines)
+        self.offset = 0
+        self._ident: tuple[int, int] | None = None
+        self._partial = b""
+
+    def poll(self) -> bool:
+        """Pick up appended bytes (or re-seed after rotation); True if lines changed."""
+        try:
+            st = self.path.stat()  # follows the current_run.log symlink
+        except OSError:
+            changed = bool(self.lines)
+            self.lines.clear()
+            self._ident, self.offset, self._partial = None, 0, b""
+            return changed
+        ident = (st.st_dev, st.st_ino)
+        if ident != self._ident or st.st_size < self.offset:
+            # New target (symlink swap / rotation) or truncation: seek from the end.
+            lines, self.offset = read_last_lines(self.path, self.lines.maxlen or 20)
+            self.lines.clear()
+            self.lines.extend(lines)
+            self._ident, self._partial = ident, b""
+            return True
+        if st.st_size == self.offset:
+            return False
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+        self.offset += len(chunk)
+        *done, self._partial = (self._partial + chunk).split(b"\n")
+        self.lines.extend(line.decode(errors="replace") for line in done)
+        return bool(done)
+
+    def text(self, empty: str = "(idle)") -> str:
+        return "\n".join(self.lines) if self.lines else empty
+
+    def wait(self, timeout: float, watcher: DirWatcher | None = None) -> bool:
+        """Block until the log changes (True) or `timeout` passes (False)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.poll():
+                return True
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            if watcher is not None and watcher.ok:
+                watcher.wait(left)
+            else:
+                time.sleep(min(left, 0.25))
+
+
+# ---- inotify (Linux) ----------------------------------------------------------
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+
+
+def _libc():
+    name = ctypes.util.find_library("c")
+    if not name:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        libc.inotify_init1  # noqa: B018 - probe
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class DirWatcher:
+    """
+    inotify watch on the directories holding a log and its symlink target.
+    `ok` is False where inotify is unavailable (non-Linux, limits reached);
+    callers then poll.
+    """
+
+    def __init__(self, *paths: Path | str) -> None:
+        self.fd = -1
+        libc = _libc()
+        if libc is None:
+            return
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return
+        dirs = set()
+        for p in paths:
+            p = Path(p)
+            dirs.add(p.parent)
+            try:
+                dirs.add(p.resolve().parent)
+            except OSError:
+                pass
+        for d in dirs:
+            if d.is_dir() and libc.inotify_add_watch(fd, os.fsencode(d), _MASK) < 0:
+                os.close(fd)
+                return
+        self.fd = fd
+
+    @property
+    def ok(self) -> bool:
+        return self.fd >= 0
+
+    def wait(self, timeout: float) -> bool:
+        """Block until any watched directory changes or `timeout`; drains the queue."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
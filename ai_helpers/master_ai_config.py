@@ -1,11 +1,19 @@
 import os
 import pathlib
 
-import openai
-from dotenv import load_dotenv
+# Optional dependencies: offline runs (MASTER_AI_LLM_BACKEND=stub) need neither.
+try:
+    import openai
+except Exception:  # pragma: no cover
+    openai = None  # type: ignore[assignment]
+try:
+    from dotenv import load_dotenv
+except Exception:  # pragma: no cover
+    load_dotenv = None  # type: ignore[assignment]
 
 ENV_PATH = pathlib.Path.home() / "automation" / ".env"
-load_dotenv(ENV_PATH)
+if load_dotenv is not None:
+    load_dotenv(ENV_PATH)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GMAIL = os.getenv("GMAIL_ADDRESS")
@@ -27,4 +35,5 @@ missing = [
 if missing:
     print(f"[config] ⚠️ missing env vars: {', '.join(missing)} – continuing in offline mode")
 
-openai.api_key = OPENAI_API_KEY
+if openai is not None:
+    openai.api_key = OPENAI_API_KEY
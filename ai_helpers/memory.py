@@ -0,0 +1,157 @@
+"""
+Conversation memory
+What a chat history contributes to a prompt: a rolling summary of the
+older turns plus the newest turns verbatim, within `window_tokens`.
+The summary is refreshed only when the verbatim window overflows; each
+refresh folds the oldest turns into it until the window is back down to
+`refill` of its budget, so one summarisation call covers many turns.
+
+State lives next to the history segments (<history>/memory.json):
+{"summary": str, "covered": int}, where the first `covered` messages
+ever appended to the store are represented by the summary; it counts
+from before any compaction (ChatStore.base()). A failed refresh changes
+nothing and the window simply drops its oldest turns for that call.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+from collections.abc import Callable
+
+from ai_helpers.chat_store import ChatStore
+from ai_helpers.chunking import Tokenizer, get_tokenizer
+from master_ai.runtime import metrics
+
+WINDOW_TOKENS = 2000  # verbatim recent turns
+SUMMARY_TOKENS = 400  # target summary length
+REFILL = 0.5  # a refresh shrinks the window to this fraction of its budget
+SCAN_MESSAGES = 400  # how far back an unsummarised history is read
+MESSAGE_CHARS = 4000  # per-message clip inside the summary prompt
+STATE_FILE = "memory.json"
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and Master-AI. "
+    "Keep decisions, facts, file names, open tasks and preferences; drop chit-chat "
+    "and code bodies. Answer with the new summary only, at most {words} words.\n\n"
+    "=== CURRENT SUMMARY ===\n{summary}\n\n=== NEW TURNS ===\n{turns}"
+)
+
+REFRESHES = metrics.counter(
+    "master_ai_memory_refresh_total", "Rolling summary refreshes by result", ["result"]
+)
+
+# summarize(previous_summary, messages, max_tokens) -> new summary
+Summarize = Callable[[str, list[dict], int], str]
+
+
+def message_tokens(msg: dict, tok: Tokenizer) -> int:
+    return tok.count(str(msg.get("content", ""))) + 4  # role/framing overhead
+
+
+def fit_window(history: list[dict], budget: int, tok: Tokenizer | None = None) -> list[dict]:
+    """
+    The newest messages of `history` that fit in `budget` tokens; leading
+    system messages (e.g. a summary) are always kept and count against it.
+    """
+    tok = tok or get_tokenizer()
+    head = 0
+    while head < len(history) and history[head].get("role") == "system":
+        head += 1
+    used = sum(message_tokens(m, tok) for m in history[:head])
+    cut = len(history)
+    while cut > head:
+        used += message_tokens(history[cut - 1], tok)
+        if used > budget:
+            break
+        cut -= 1
+    return history[:head] + history[cut:]
+
+
+def gpt_summarize(summary: str, messages: list[dict], max_tokens: int) -> str:
+    """Default summariser: one (cached) completion through the shared LLM client."""
+    from ai_helpers.llm_client import default_client
+
+    turns = "\n".join(
+        f"{m.get('role', 'user')}: {str(m.get('content', ''))[:MESSAGE_CHARS]}" for m in messages
+    )
+    words = max_tokens * 3 // 4
+    prompt = SUMMARY_PROMPT.format(words=words, summary=summary or "(none)", turns=turns)
+    return default_client().complete([{"role": "user", "content": prompt}]).strip()
+
+
+class ConversationMemory:
+    """Summary + token-budgeted window over one ChatStore."""
+
+    def __init__(
+        self,
+        store: ChatStore,
+        summarize: Summarize | None = None,
+        window_tokens: int = WINDOW_TOKENS,
+        summary_tokens: int = SUMMARY_TOKENS,
+        tokenizer: Tokenizer | None = None,
+    ) -> None:
+        self.store = store
+        self.summarize = summarize or gpt_summarize
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self.tok = tokenizer or get_tokenizer()
+        self.path = store.root / STATE_FILE
+
+    def state(self) -> dict:
+        try:
+            state = json.loads(self.path.read_text())
+            return {"summary": str(state["summary"]), "covered": int(state["covered"])}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {"summary": "", "covered": 0}
+
+    def _save(self, state: dict) -> None:
+        tmp = self.path.with_name(f".{STATE_FILE}.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False))
+        os.replace(tmp, self.path)
+
+    def _pending(self, covered: int) -> tuple[int, list[dict]]:
+        """(position of the first unsummarised message read, those messages)."""
+        base = self.store.base()
+        total = base + len(self.store)
+        # compact() may have dropped unsummarised messages too: start at base
+        first = max(covered, base, total - SCAN_MESSAGES)
+        return first, self.store.last(total - first) if total > first else []
+
+    def context(self) -> list[dict]:
+        """Messages to put before a new prompt: the summary (as system) + recent turns."""
+        state = self.state()
+        _, pending = self._pending(state["covered"])
+        if sum(message_tokens(m, self.tok) for m in pending) > self.window_tokens:
+            state, pending = self._refresh()
+        recent = [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in pending]
+        head = []
+        if state["summary"]:
+            head = [{"role": "system", "content": "Conversation so far: " + state["summary"]}]
+        return fit_window(head + recent, self.window_tokens + self.summary_tokens, self.tok)
+
+    def _refresh(self) -> tuple[dict, list[dict]]:
+        """Fold the oldest pending turns into the summary (one process at a time)."""
+        self.store.root.mkdir(parents=True, exist_ok=True)
+        with (self.store.root / f".{STATE_FILE}.lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self.state()  # another process may have refreshed meanwhile
+            first, pending = self._pending(state["covered"])
+            counts = [message_tokens(m, self.tok) for m in pending]
+            if sum(counts) <= self.window_tokens:
+                return state, pending
+            cut, kept = len(pending), 0
+            while cut and kept + counts[cut - 1] <= self.window_tokens * REFILL:
+                cut -= 1
+                kept += counts[cut]
+            try:
+                summary = self.summarize(state["summary"], pending[:cut], self.summary_tokens)
+                if not summary or summary.startswith("❌"):
+                    raise RuntimeError(summary or "empty summary")
+            except Exception:
+                REFRESHES.labels("error").inc()
+                return state, pending
+            REFRESHES.labels("ok").inc()
+            state = {"summary": summary, "covered": first + cut}
+            self._save(state)
+            return state, pending[cut:]
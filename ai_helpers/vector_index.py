@@ -0,0 +1,481 @@
+"""
+Vector index
+Embeddings of lessons (global_memory/skills.json), past plans (plans/)
+and chat histories in one contiguous float32 matrix, persisted as a raw
+file that readers memory-map. Rows are unit vectors, so top-k cosine is
+one matrix-vector product plus argpartition. Past IVF_MIN_ROWS rows an
+IVF partition (spherical k-means) narrows a lookup to the `nprobe`
+nearest lists plus the rows added since it was built.
+
+Layout of an index directory:
+  vectors.f32   rows x dim float32, appended
+  meta.jsonl    {"id", "source", "text"} per row, written after its vector
+  ivf.npz       centroids / row order / list offsets (optional)
+  info.json     embedder name and dim; a different embedder starts afresh
+  cursors.json  how far each chat history is indexed, counted like the
+                ids from before any compaction (ChatStore.base())
+
+Embedders are pluggable; HashingEmbedder (signed feature hashing of
+words and word pairs) is deterministic and needs no network. Writers
+serialise on a flock; readers pick up new rows on their next search.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Protocol
+
+from ai_helpers.chat_store import ChatStore
+
+# Optional dependency: the index is a NumPy matrix.
+try:
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+DIM = 256
+IVF_MIN_ROWS = 20_000  # brute force below this
+NPROBE = 8
+MAX_TEXT = 2000  # characters kept (and embedded) per entry
+MIN_TEXT = 16  # shorter chat messages are not worth indexing
+EMBED_BATCH = 256
+SYNC_INTERVAL_S = 30.0
+# "off" disables retrieval; any other value is the index directory.
+INDEX_ENV = "MASTER_AI_VECTOR_INDEX"
+INDEX_PATH = Path.home() / "automation" / "cache" / "vectors"
+# "hash" (default) or "openai[:model]"
+EMBEDDER_ENV = "MASTER_AI_EMBEDDER"
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+LESSONS_PATH = REPO_ROOT / "global_memory" / "skills.json"
+PLANS_DIR = REPO_ROOT / "plans"
+CHAT_ROOTS = (REPO_ROOT / "chat_history", Path.home() / "automation" / "projects")
+
+
+def _require_numpy(what: str) -> None:
+    if np is None:
+        raise RuntimeError(f"{what} requires numpy (pip install numpy)")
+
+
+def _normalize(m):
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.where(norms == 0, 1, norms)
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def embed(self, texts: list[str]): ...  # -> (len(texts), dim) float32, unit rows
+
+
+@lru_cache(maxsize=1 << 17)
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+
+
+class HashingEmbedder:
+    """Signed hashing of lower-cased words and word pairs, log-damped; no model needed."""
+
+    _WORD = re.compile(r"\w+")
+
+    def __init__(self, dim: int = DIM) -> None:
+        _require_numpy("HashingEmbedder")
+        self.dim = dim
+        self.name = f"hash-{dim}"
+
+    def embed(self, texts: list[str]):
+        out = np.zeros((len(texts), self.dim), np.float32)
+        for row, text in enumerate(texts):
+            words = self._WORD.findall(text.lower())
+            feats = words + [f"{a} {b}" for a, b in zip(words, words[1:], strict=False)]
+            if not feats:
+                continue
+            h = np.fromiter(map(_feature_hash, feats), np.uint64, len(feats))
+            sign = np.where(h >> np.uint64(63), np.float32(-1), np.float32(1))
+            np.add.at(out[row], (h % np.uint64(self.dim)).astype(np.intp), sign)
+        return _normalize(np.sign(out) * np.log1p(np.abs(out)))
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI API (through the shared client's connection)."""
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = 1536) -> None:
+        _require_numpy("OpenAIEmbedder")
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+
+    def embed(self, texts: list[str]):
+        from ai_helpers.llm_client import _openai_api
+
+        r = _openai_api().embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+        return _normalize(np.array([d.embedding for d in r.data], np.float32))
+
+
+def get_embedder(spec: str | None = None) -> Embedder:
+    """The embedder named by `spec` or MASTER_AI_EMBEDDER ("hash", "openai[:model]")."""
+    spec = spec or os.environ.get(EMBEDDER_ENV) or "hash"
+    kind, _, model = spec.partition(":")
+    if kind == "openai":
+        return OpenAIEmbedder(model or "text-embedding-3-small")
+    if kind == "hash":
+        return HashingEmbedder(int(model) if model else DIM)
+    raise ValueError(f"unknown embedder {spec!r}")
+
+
+@dataclass
+class Hit:
+    score: float
+    id: str
+    source: str
+    text: str
+
+
+@dataclass
+class _IVF:
+    centroids: object  # (nlist, dim)
+    order: object  # row numbers grouped by list
+    offsets: object  # list i = order[offsets[i]:offsets[i + 1]]
+    rows: int  # rows covered; later ones are always scanned
+    mtime: float
+
+
+class VectorIndex:
+    def __init__(self, root: Path | str, embedder: Embedder | None = None) -> None:
+        _require_numpy("VectorIndex")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or get_embedder()
+        self.dim = self.embedder.dim
+        self._vec = self.root / "vectors.f32"
+        self._meta = self.root / "meta.jsonl"
+        self._ivf_path = self.root / "ivf.npz"
+        self._lock = threading.Lock()
+        self._reset_view()
+        with self._write_lock():
+            info = {"embedder": self.embedder.name, "dim": self.dim}
+            path = self.root / "info.json"
+            try:
+                same = json.loads(path.read_text()) == info
+            except (OSError, ValueError):
+                same = False
+            if not same:
+                for p in (self._vec, self._meta, self._ivf_path, self.root / "cursors.json"):
+                    p.unlink(missing_ok=True)
+                path.write_text(json.dumps(info))
+
+    def _reset_view(self) -> None:
+        self._mat = np.empty((0, self.dim), np.float32)
+        self._ids: dict[str, int] = {}
+        self._offsets: list[int] = []  # meta.jsonl byte offset per row
+        self._source_names: list[str] = []
+        self._sources = np.empty(0, np.int32)
+        self._meta_pos = 0
+        self._ivf: _IVF | None = None
+
+    @contextlib.contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """Writers (any process) one at a time."""
+        with (self.root / ".lock").open("a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---- reading ---------------------------------------------------------------
+
+    def _refresh(self) -> None:
+        """Map rows appended (by any process) since the last look."""
+        try:
+            size = self._meta.stat().st_size
+        except OSError:
+            size = 0
+        if size < self._meta_pos:  # rebuilt underneath us
+            self._reset_view()
+        if size > self._meta_pos:
+            codes = []
+            with self._meta.open("rb") as f:
+                f.seek(self._meta_pos)
+                pos = self._meta_pos
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    row = json.loads(line)
+                    self._ids[row["id"]] = len(self._offsets)
+                    self._offsets.append(pos)
+                    if row["source"] not in self._source_names:
+                        self._source_names.append(row["source"])
+                    codes.append(self._source_names.index(row["source"]))
+                    pos += len(line)
+            self._meta_pos = pos
+            self._sources = np.concatenate([self._sources, np.array(codes, np.int32)])
+        n = len(self._offsets)
+        if len(self._mat) != n:
+            self._mat = (
+                np.memmap(self._vec, np.float32, "r", shape=(n, self.dim))
+                if n
+                else np.empty((0, self.dim), np.float32)
+            )
+        try:
+            mtime = self._ivf_path.stat().st_mtime
+        except OSError:
+            self._ivf = None
+            return
+        if self._ivf is None or self._ivf.mtime != mtime:
+            with np.load(self._ivf_path) as z:
+                self._ivf = _IVF(z["centroids"], z["order"], z["offsets"], int(z["rows"]), mtime)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._offsets)
+
+    def __contains__(self, id_: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return id_ in self._ids
+
+    def _row(self, i: int) -> dict:
+        with self._meta.open("rb") as f:
+            f.seek(self._offsets[i])
+            return json.loads(f.readline())
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        *,
+        sources: Iterable[str] | None = None,
+        min_score: float | None = None,
+        nprobe: int = NPROBE,
+    ) -> list[Hit]:
+        """Top-k rows by cosine similarity, best first."""
+        with self._lock:
+            self._refresh()
+            mat, ivf, codes = self._mat, self._ivf, self._sources
+            wanted = [self._source_names.index(s) for s in sources or () if s in self._source_names]
+        n = len(mat)
+        if not n or k <= 0 or (sources is not None and not wanted):
+            return []
+        q = self.embedder.embed([query])[0]
+        rows = None
+        if ivf is not None:
+            cs = ivf.centroids @ q
+            probe = np.argpartition(-cs, min(nprobe, len(cs)) - 1)[:nprobe]
+            parts = [ivf.order[ivf.offsets[i] : ivf.offsets[i + 1]] for i in probe]
+            rows = np.concatenate(parts + [np.arange(ivf.rows, n)])
+        if wanted:
+            mask = np.isin(codes if rows is None else codes[rows], wanted)
+            rows = np.flatnonzero(mask) if rows is None else rows[mask]
+        scores = (mat if rows is None else mat[rows]) @ q
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for i in top:
+            score = float(scores[i])
+            if min_score is not None and score < min_score:
+                break
+            row = self._row(int(i if rows is None else rows[i]))
+            hits.append(Hit(score, row["id"], row["source"], row["text"]))
+        return hits
+
+    # ---- writing ---------------------------------------------------------------
+
+    def add(self, items: Iterable[tuple[str, str, str]]) -> int:
+        """Index (id, source, text) items whose id is new; returns how many were added."""
+        with self._write_lock():
+            return self._add_locked(items)
+
+    def _add_locked(self, items: Iterable[tuple[str, str, str]]) -> int:
+        with self._lock:
+            self._refresh()
+            known = set(self._ids)
+            n = len(self._offsets)
+        batch: list[tuple[str, str, str]] = []
+        added = 0
+        # a crash between the two writes leaves vectors without meta rows
+        with self._vec.open("ab") as f:
+            f.truncate(n * self.dim * 4)
+        for id_, source, text in items:
+            if id_ in known or not text.strip():
+                continue
+            known.add(id_)
+            batch.append((id_, source, text[:MAX_TEXT]))
+            if len(batch) >= EMBED_BATCH:
+                added += self._write(batch)
+                batch = []
+        if batch:
+            added += self._write(batch)
+        if added:
+            total = n + added
+            with self._lock:
+                self._refresh()
+                ivf = self._ivf
+            if total >= IVF_MIN_ROWS and (ivf is None or total > ivf.rows * 1.5):
+                self._build_ivf_locked()
+        return added
+
+    def _write(self, batch: list[tuple[str, str, str]]) -> int:
+        vecs = np.ascontiguousarray(self.embedder.embed([t for _, _, t in batch]), np.float32)
+        lines = [
+            json.dumps({"id": i, "source": s, "text": t}, ensure_ascii=False) + "\n"
+            for i, s, t in batch
+        ]
+        with self._vec.open("ab") as f:
+            f.write(vecs.tobytes())
+        with self._meta.open("a", encoding="utf-8") as f:
+            f.write("".join(lines))
+        return len(batch)
+
+    def build_ivf(self, nlist: int | None = None, iters: int = 8) -> None:
+        """Partition the rows into `nlist` (default ~sqrt(rows)) lists by spherical k-means."""
+        with self._write_lock():
+            self._build_ivf_locked(nlist, iters)
+
+    def _build_ivf_locked(self, nlist: int | None = None, iters: int = 8) -> None:
+        with self._lock:
+            self._refresh()
+            mat = self._mat
+        n = len(mat)
+        if not n:
+            return
+        nlist = max(1, min(n, nlist or int(math.sqrt(n))))
+        rng = np.random.default_rng(0)
+        train = np.asarray(mat[np.sort(rng.choice(n, min(n, nlist * 64), replace=False))])
+        cent = train[rng.choice(len(train), nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(train @ cent.T, axis=1)
+            sums = np.zeros_like(cent)
+            np.add.at(sums, assign, train)
+            empty = ~sums.any(axis=1)
+            sums[empty] = cent[empty]
+            cent = _normalize(sums).astype(np.float32)
+        assign = np.concatenate(
+            [np.argmax(mat[i : i + 65536] @ cent.T, axis=1) for i in range(0, n, 65536)]
+        )
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+        tmp = self.root / ".ivf.tmp.npz"
+        np.savez(tmp, centroids=cent, order=order, offsets=offsets, rows=n)
+        os.replace(tmp, self._ivf_path)
+
+    # ---- sources -----------------------------------------------------------------
+
+    def sync(
+        self,
+        lessons: Path = LESSONS_PATH,
+        plans: Path = PLANS_DIR,
+        chat_roots: Iterable[Path] = CHAT_ROOTS,
+    ) -> int:
+        """Index new lessons, plans and chat messages; returns how many rows were added."""
+        with self._write_lock():
+            added = self._add_locked(_lessons(lessons))
+            added += self._add_locked(_plans(plans))
+            cursors_path = self.root / "cursors.json"
+            try:
+                cursors = json.loads(cursors_path.read_text())
+            except (OSError, ValueError):
+                cursors = {}
+            for store in _chat_stores(chat_roots):
+                key = str(store.root)
+                base = store.base()
+                total = base + len(store)
+                done = max(cursors.get(key, 0), base)  # compact() may have dropped some
+                if total > done:
+                    added += self._add_locked(_chat_items(store, done, total))
+                cursors[key] = max(done, total)
+            tmp = self.root / ".cursors.json.tmp"
+            tmp.write_text(json.dumps(cursors))
+            os.replace(tmp, cursors_path)
+        return added
+
+
+def _lessons(path: Path) -> Iterator[tuple[str, str, str]]:
+    try:
+        lessons = json.loads(path.read_text()).get("lessons", [])
+    except (OSError, ValueError, AttributeError):
+        return
+    for lesson in lessons:
+        text = lesson if isinstance(lesson, str) else json.dumps(lesson, ensure_ascii=False)
+        yield f"lesson:{hashlib.sha1(text.encode()).hexdigest()[:16]}", "lesson", text
+
+
+def _plans(plans: Path) -> Iterator[tuple[str, str, str]]:
+    """One entry per paragraph (plan step) of every plans/plan_*.txt."""
+    for path in sorted(plans.glob("plan_*.txt")):
+        try:
+            text = path.read_text(errors="replace")
+        except OSError:
+            continue
+        for i, para in enumerate(p for p in re.split(r"\n\s*\n", text) if p.strip()):
+            yield f"plan:{path.name}:{i}", "plan", para.strip()
+
+
+def _chat_stores(roots: Iterable[Path]) -> list[ChatStore]:
+    dirs: set[Path] = set()
+    for root in roots:
+        for pattern in ("*/seg-*.jsonl", "*/chat_history/seg-*.jsonl"):
+            dirs.update(p.parent for p in root.glob(pattern))
+    return [ChatStore(d) for d in sorted(dirs)]
+
+
+def _chat_items(store: ChatStore, done: int, total: int) -> Iterator[tuple[str, str, str]]:
+    """Messages `done`..`total` as positions from the store's base, so ids survive compact()."""
+    for i, msg in enumerate(store.last(total - done), start=done):
+        text = str(msg.get("content", ""))
+        if len(text) >= MIN_TEXT and not text.startswith("❌"):
+            yield f"chat:{store.root}:{i}", "chat", f"{msg.get('role', 'user')}: {text}"
+
+
+_index: VectorIndex | None = None
+_index_lock = threading.Lock()
+_synced = -math.inf
+_syncing = threading.Lock()
+
+
+def get_index() -> VectorIndex | None:
+    """The index configured by MASTER_AI_VECTOR_INDEX (None when off or numpy is missing)."""
+    global _index
+    setting = os.environ.get(INDEX_ENV, "")
+    if setting.lower() in {"0", "off", "false", "no"} or np is None:
+        return None
+    path = Path(setting) if setting else INDEX_PATH
+    with _index_lock:
+        if _index is None or _index.root != path:
+            _index = VectorIndex(path)
+        return _index
+
+
+def sync_in_background(index: VectorIndex) -> None:
+    """Start index.sync() on a daemon thread, at most every SYNC_INTERVAL_S seconds."""
+    global _synced
+    if time.monotonic() - _synced < SYNC_INTERVAL_S or not _syncing.acquire(blocking=False):
+        return
+    _synced = time.monotonic()
+
+    def run() -> None:
+        try:
+            index.sync()
+        except Exception as e:
+            print(f"🔧 vector index sync error: {e}")
+        finally:
+            _syncing.release()
+
+    threading.Thread(target=run, name="vector-sync", daemon=True).start()
@@ -2,6 +2,8 @@ import json
 import pathlib
 import time
 
+from ai_helpers.chat_store import open_history
+
 BASE = pathlib.Path.home() / "automation" / "projects"
 BASE.mkdir(parents=True, exist_ok=True)
 
@@ -9,7 +11,7 @@ BASE.mkdir(parents=True, exist_ok=True)
 def ensure(project):
     path = BASE / project
     path.mkdir(exist_ok=True)
-    for f in ("chat_history.json", "credentials.json"):
+    for f in ("credentials.json",):
         p = path / f
         if not p.exists():
             p.write_text("{}")
@@ -25,15 +27,9 @@ def _save(p, d):
 
 
 def log(project, role, content):
-    pj = ensure(project)
-    f = pj / "chat_history.json"
-    data = _load(f)
-    data.setdefault("dialog", []).append(
-        {"t": time.time(), "role": role, "content": content}
-    )
-    _save(f, data)
+    history = open_history(ensure(project) / "chat_history.json")
+    history.append({"t": time.time(), "role": role, "content": content})
 
 
 def last_msgs(project, n=10):
-    f = ensure(project) / "chat_history.json"
-    return _load(f).get("dialog", [])[-n:]
+    return open_history(ensure(project) / "chat_history.json").last(n)
@@ -1,28 +1,52 @@
+import os
 import pathlib
+import re
 import subprocess
-import sys
 import textwrap
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from ai_helpers.ai_utils import gpt
+from master_ai.runtime.testimpact import ImpactRun, run_impacted
 
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parent
+WORKERS = 4  # files generated at once (the LLM client's limiter still applies)
 
 
-def apply_plan(steps: list[str]) -> None:
+def apply_plan(steps: list[str], full_suite: bool = False) -> list[str]:
     """
     Very first-pass self-builder:
 
     • Looks for lines that mention a *.py file
-    • Asks GPT for the full file content (or improved version)
-    • Writes/overwrites the file, then runs pytest
+    • Asks GPT for the full file content (or improved version), for up to
+      WORKERS files at once; steps naming the same file run in order
+    • Writes each file atomically (a failed reply leaves it untouched)
+    • Runs the tests affected by the written files, then the full suite
+      if `full_suite` and they pass
+
+    Returns the targets written.
     """
+    by_target: dict[str, list[str]] = {}
     for step in steps:
         # Find the first token that ends in .py
         target = next((tok for tok in step.split() if tok.endswith(".py")), None)
-        if not target:
-            continue
+        if target:
+            by_target.setdefault(target, []).append(step)
+    if not by_target:
+        return []
+
+    with ThreadPoolExecutor(min(WORKERS, len(by_target))) as pool:
+        done = list(pool.map(_generate, by_target, [len(s) for s in by_target.values()]))
+    written = [t for t, ok in zip(by_target, done, strict=True) if ok]
+    _run_tests([PROJECT_ROOT / t for t in written], full_suite)
+    return written
 
-        path = PROJECT_ROOT / target
+
+def _generate(target: str, passes: int) -> bool:
+    """One GPT pass per step naming `target`, each improving the last."""
+    path = PROJECT_ROOT / target
+    ok = False
+    for _ in range(passes):
         context = path.read_text() if path.exists() else "[NEW FILE]"
 
         prompt = textwrap.dedent(f"""
@@ -35,13 +59,85 @@ def apply_plan(steps: list[str]) -> None:
         """)
 
         code = gpt(prompt)
-        path.write_text(code)
+        if code.startswith("❌"):
+            print(f"[executor] {target}: {code}")
+            break
+        _write_atomic(path, code)
         print(f"[executor] wrote {target}")
+        ok = True
+    return ok
+
+
+def _write_atomic(path: pathlib.Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def _import_pattern(path: pathlib.Path, root: pathlib.Path) -> tuple[str, re.Pattern] | None:
+    """(module name, regex for lines importing it) for a source file under `root`."""
+    try:
+        rel = path.relative_to(root).with_suffix("")
+    except ValueError:
+        return None
+    parts = rel.parts[:-1] if rel.name == "__init__" else rel.parts
+    if not parts:
+        return None
+    dotted = re.escape(".".join(parts))
+    imports = rf"^\s*(from|import)\s+{dotted}\b"
+    if len(parts) > 1:  # from pkg import mod
+        parent, name = re.escape(".".join(parts[:-1])), re.escape(parts[-1])
+        imports += rf"|^\s*from\s+{parent}\s+import\s+[^\n]*\b{name}\b"
+    return rel.name, re.compile(imports, re.M)
 
-    _run_tests()
+
+def related_tests(touched: list[pathlib.Path], root: pathlib.Path | None = None) -> list[str]:
+    """
+    Test files for the touched files: touched tests themselves, plus every
+    tests/**/test_*.py named after or importing a touched module.
+    """
+    root = root or PROJECT_ROOT
+    selected: set[pathlib.Path] = set()
+    patterns = []
+    for path in touched:
+        if path.name.startswith("test_"):
+            selected.add(path)
+        elif (pattern := _import_pattern(path, root)) is not None:
+            patterns.append(pattern)
+    if patterns:
+        for test in (root / "tests").rglob("test_*.py"):
+            text = None
+            for stem, imports in patterns:
+                if test.stem == f"test_{stem}":
+                    selected.add(test)
+                    break
+                text = text if text is not None else test.read_text(errors="replace")
+                if imports.search(text):
+                    selected.add(test)
+                    break
+    return sorted(str(p) for p in selected if p.exists())
+
+
+def _run_tests(touched: list[pathlib.Path] | None = None, full_suite: bool = False) -> None:
+    """
+    Run the tests affected by the changes (runtime.testimpact), then, with
+    `full_suite` and only if those pass, all of them. Until the impact map
+    exists, the tests related to `touched` stand in for the full run that
+    would build it.
+    """
+    hint = related_tests(touched) if touched else []
+    try:
+        r = _report(run_impacted(PROJECT_ROOT, hint=hint))
+        if full_suite and r.returncode in (0, 5) and r.mode not in ("full", "plain"):
+            _report(run_impacted(PROJECT_ROOT, full=True))  # 5: nothing was collected
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"[executor] tests not run: {e}")
 
 
-def _run_tests() -> None:
-    """Run pytest and show a one-line summary."""
-    print("[executor] running pytest …")
-    subprocess.call([sys.executable, "-m", "pytest", "-q"])
+def _report(r: ImpactRun) -> ImpactRun:
+    print(f"[executor] tests ({r.mode}): {r.reason}")
+    out = r.stdout.strip()
+    if out:
+        print(out if r.returncode else out.splitlines()[-1])
+    return r
@@ -72,12 +72,16 @@ def _call_planner(goal: str) -> list[Any]:
 
 
 def _run_pytest(cwd: Path) -> int:
-    """Run pytest -q in the given directory. Prefer our shell.run if present."""
+    """
+    Run the tests affected by changes in the given directory (all of them
+    the first time; see runtime.testimpact). Plain pytest -q if that fails.
+    """
     try:
-        from master_ai.tools.shell import run  # type: ignore
+        from master_ai.runtime.testimpact import run_impacted
 
-        cp = run(["pytest", "-q"], cwd=str(cwd))
-        return cp.returncode
+        r = run_impacted(cwd)
+        print(f"[tests] {r.mode}: {r.reason}")
+        return r.returncode
     except Exception:
         cp = subprocess.run(["pytest", "-q"], cwd=str(cwd))
         return cp.returncode
@@ -116,6 +120,153 @@ def cmd_run_goal(ns: argparse.Namespace) -> None:
         raise SystemExit(rc)
 
 
+def cmd_agent_run(ns: argparse.Namespace) -> None:
+    """Run a goal through the step Agent; events/logs land in artifacts/runs/<run_id>."""
+    from master_ai.runtime.agent import Agent
+    from master_ai.runtime.utils import RUNS_ROOT
+
+    agent = Agent(goal=ns.goal, root=RUNS_ROOT, safe_mode=not ns.unsafe, trace=ns.trace)
+    rc = agent.run()
+    if rc != 0:
+        raise SystemExit(rc)
+
+
+def cmd_summarize(ns: argparse.Namespace) -> None:
+    """Summarize files (globs) and URLs in parallel, streaming JSONL to stdout."""
+    import glob
+    import json
+    import sys
+
+    from master_ai.runtime.summarize import summarize_many
+
+    files: list[str] = []
+    for pattern in ns.glob or []:
+        files.extend(p for p in sorted(glob.glob(pattern, recursive=True)) if Path(p).is_file())
+    urls: list[str] = list(ns.url or [])
+    if ns.urls:
+        fh = sys.stdin if ns.urls == "-" else open(ns.urls, encoding="utf-8")
+        with fh:
+            urls.extend(ln.strip() for ln in fh if ln.strip() and not ln.lstrip().startswith("#"))
+    if not files and not urls:
+        raise SystemExit("summarize: no files matched and no URLs given")
+
+    failed = 0
+    for res in summarize_many(
+        files,
+        urls,
+        max_lines=ns.max_lines,
+        mode=ns.mode,
+        jobs=ns.jobs,
+        url_jobs=ns.url_jobs,
+        ordered=ns.ordered,
+    ):
+        failed += not res["ok"]
+        sys.stdout.write(json.dumps(res, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+    if failed:
+        raise SystemExit(1)
+
+
+def cmd_runs(ns: argparse.Namespace) -> None:
+    """List runs from the run catalog (or rebuild it from artifacts/runs)."""
+    import json
+    import time
+
+    from master_ai.runtime.catalog import RunCatalog
+
+    cat = RunCatalog(Path(ns.root))
+    if ns.rebuild:
+        print(f"[runs] indexed {cat.rebuild()} runs into {cat.path}")
+        return
+    rows = cat.query(status=ns.status, goal=ns.goal, limit=ns.limit, offset=ns.offset)
+    if ns.json:
+        for r in rows:
+            print(json.dumps(r))
+        return
+    total = cat.count(status=ns.status, goal=ns.goal)
+    print(f"[runs] {len(rows)} of {total} (offset {ns.offset})")
+    for r in rows:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r["started"] or 0))
+        dur = f"{r['duration']:.1f}s" if r["duration"] is not None else "-"
+        steps = f"{r['steps_done']}/{r['steps_total']}"
+        goal = r["goal"] or ""
+        print(f" {r['run_id']}  {r['status']:<8} {started}  {dur:>8}  {steps:>5}  {goal}")
+
+
+def cmd_gc(ns: argparse.Namespace) -> None:
+    """Apply run retention: delete expired runs, compact cold ones, prune blobs."""
+    from master_ai.runtime.retention import RetentionPolicy, collect
+
+    policy = RetentionPolicy(
+        keep_last=ns.keep_last,
+        max_age_days=ns.max_age_days,
+        statuses=tuple(ns.status) if ns.status else None,
+        compact_after_days=None if ns.no_compact else ns.compact_after_days,
+    )
+    r = collect(policy, root=Path(ns.root), dry_run=ns.dry_run)
+    tag = "[gc] (dry run)" if r.dry_run else "[gc]"
+    print(f"{tag} deleted {len(r.deleted)} runs, compacted {len(r.compacted)}")
+    print(
+        f"{tag} deduped {r.files_deduped} files, compressed {r.files_compressed} logs,"
+        f" pruned {r.blobs_removed} blobs, freed {r.bytes_freed / 1e6:.1f} MB"
+    )
+    for run_id in r.deleted:
+        print(f"  - {run_id}")
+
+
+def _stub_config(ns: argparse.Namespace):
+    from ai_helpers.llm_stub import StubConfig
+
+    return StubConfig(
+        ttft=ns.ttft,
+        tokens_per_s=ns.tps,
+        reply_tokens=ns.reply_tokens,
+        rate_429=ns.rate_429,
+        retry_after=ns.retry_after,
+        max_concurrency=ns.max_concurrency,
+        seed=ns.seed,
+    )
+
+
+def cmd_llm_stub(ns: argparse.Namespace) -> None:
+    """Serve the OpenAI-compatible stand-in until interrupted."""
+    import time
+
+    from ai_helpers.llm_stub import start_stub_server
+
+    srv = start_stub_server(ns.addr, _stub_config(ns))
+    print(f"[llm-stub] serving on {srv.url} (OPENAI_BASE_URL={srv.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"[llm-stub] {srv.stats['requests']} requests, {srv.stats['throttled']} throttled")
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+
+def cmd_bench_llm(ns: argparse.Namespace) -> None:
+    """Benchmark the GPT-driven paths against the stand-in (or --url)."""
+    import json
+
+    from ai_helpers.llm_bench import SCENARIOS, bench, format_rows
+
+    rows = bench(
+        ns.scenario or list(SCENARIOS),
+        ns.concurrency,
+        ns.requests,
+        url=ns.url,
+        config=_stub_config(ns),
+        cache=ns.cache,
+    )
+    if ns.json:
+        for r in rows:
+            print(json.dumps(r))
+    else:
+        print(format_rows(rows))
+
+
 def cmd_self_update(ns: argparse.Namespace) -> None:
     """
     Optional: only works if you provide a bundle+manifest.
@@ -160,10 +311,85 @@ def main() -> None:
     s.add_argument("--goal", required=True)
     s.set_defaults(func=cmd_run_goal)
 
-    # agent-run (alias to run-goal to keep older workflows working)
-    s = sp.add_parser("agent-run", help="Alias of run-goal")
+    # agent-run (step agent: planner -> exec/write/fetch/... with events per run)
+    s = sp.add_parser("agent-run", help="Run a goal through the step agent")
     s.add_argument("--goal", required=True)
-    s.set_defaults(func=cmd_run_goal)
+    s.add_argument("--unsafe", action="store_true", help="Disable safe mode")
+    s.add_argument(
+        "--trace", action="store_true", help="Write run_dir/trace.json (Chrome/Perfetto trace)"
+    )
+    s.set_defaults(func=cmd_agent_run)
+
+    # summarize (batch)
+    s = sp.add_parser("summarize", help="Summarize files/URLs in parallel; JSONL to stdout")
+    s.add_argument("--glob", action="append", help="File glob (repeatable, ** supported)")
+    s.add_argument("--url", action="append", help="URL to summarize (repeatable)")
+    s.add_argument("--urls", help="File with one URL per line ('-' for stdin)")
+    s.add_argument("--max-lines", type=int, default=5)
+    s.add_argument(
+        "--mode",
+        choices=["lead", "extractive"],
+        default="lead",
+        help="lead: first lines; extractive: most central sentences (needs numpy)",
+    )
+    s.add_argument("--jobs", type=int, default=None, help="File worker processes (default: cores)")
+    s.add_argument("--url-jobs", type=int, default=16, help="Concurrent URL fetches")
+    s.add_argument("--ordered", action="store_true", help="Emit results in input order")
+    s.set_defaults(func=cmd_summarize)
+
+    # runs (catalog)
+    s = sp.add_parser("runs", help="List/filter runs from the run catalog")
+    s.add_argument("--root", default="artifacts/runs")
+    s.add_argument("--status", help="OK / FAILED / ABORTED / RUNNING")
+    s.add_argument("--goal", help="Substring match on the goal")
+    s.add_argument("--limit", type=int, default=20)
+    s.add_argument("--offset", type=int, default=0)
+    s.add_argument("--json", action="store_true", help="One JSON row per line")
+    s.add_argument("--rebuild", action="store_true", help="Re-index all run dirs from disk")
+    s.set_defaults(func=cmd_runs)
+
+    # gc (retention)
+    s = sp.add_parser("gc", help="Delete old runs, compress cold logs, dedupe run files")
+    s.add_argument("--root", default="artifacts/runs")
+    s.add_argument("--keep-last", type=int, default=200, help="Keep at most the newest N runs")
+    s.add_argument("--max-age-days", type=float, default=30.0, help="Delete runs older than this")
+    s.add_argument(
+        "--status", action="append", help="Only delete runs with this status (repeatable)"
+    )
+    s.add_argument("--compact-after-days", type=float, default=1.0)
+    s.add_argument("--no-compact", action="store_true", help="Skip dedupe/compression")
+    s.add_argument("--dry-run", action="store_true", help="Report only; change nothing")
+    s.set_defaults(func=cmd_gc)
+
+    # local LLM stand-in + benchmark
+    def stub_args(s: argparse.ArgumentParser) -> None:
+        s.add_argument("--ttft", default="lognormal:0.25,0.4", help="TTFT distribution (seconds)")
+        s.add_argument("--tps", type=float, default=80.0, help="Streamed tokens per second")
+        s.add_argument("--reply-tokens", type=int, default=60)
+        s.add_argument("--rate-429", type=float, default=0.0, help="Probability of a 429")
+        s.add_argument("--retry-after", type=float, default=1.0)
+        s.add_argument("--max-concurrency", type=int, default=0, help="429 beyond this (0 = off)")
+        s.add_argument("--seed", type=int)
+
+    s = sp.add_parser("llm-stub", help="Serve a local OpenAI-compatible LLM stand-in")
+    s.add_argument("--addr", default="127.0.0.1:8099")
+    stub_args(s)
+    s.set_defaults(func=cmd_llm_stub)
+
+    s = sp.add_parser("bench-llm", help="Benchmark GPT-driven paths at several concurrencies")
+    s.add_argument(
+        "--scenario",
+        action="append",
+        choices=["gpt", "gpt_stream", "planner", "executor", "chunks"],
+        help="Scenario to run (repeatable; default: all)",
+    )
+    s.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    s.add_argument("--requests", type=int, default=50, help="Requests per concurrency level")
+    s.add_argument("--url", help="Use this OpenAI-compatible base URL instead of the stub")
+    s.add_argument("--cache", action="store_true", help="Let the LLM cache answer repeats")
+    s.add_argument("--json", action="store_true", help="One JSON object per result row")
+    stub_args(s)
+    s.set_defaults(func=cmd_bench_llm)
 
     # self-update (optional)
     s = sp.add_parser("self-update", help="Check/apply an update bundle")
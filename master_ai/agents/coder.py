@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from master_ai.tools.shell import run
+from master_ai.runtime.testimpact import run_impacted
 
 TEMPLATE_MAIN = """def run():
     return "hello"
@@ -49,9 +49,11 @@ sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
     (root / "tests" / "test_app.py").write_text(TEMPLATE_TEST.format(name=pkg))
 
 
-def run_tests(path: str) -> None:
-    cp = run(["pytest", "-q"], cwd=path)
-    print(cp.stdout.strip())
-    if cp.returncode != 0:
-        print(cp.stderr)
-        raise SystemExit(cp.returncode)
+def run_tests(path: str, full: bool = False) -> None:
+    """Run the tests affected by changes under `path` (see runtime.testimpact)."""
+    r = run_impacted(path, full=full)
+    print(f"[tests] {r.mode}: {r.reason}")
+    print(r.stdout.strip())
+    if r.returncode != 0:
+        print(r.stderr)
+        raise SystemExit(r.returncode)
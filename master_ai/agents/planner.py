@@ -7,6 +7,8 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
+from master_ai.runtime.trace import traced
+
 
 @dataclass
 class Step:
@@ -26,6 +28,9 @@ class Step:
     dest: str | None = None
     args: list[str] | None = None
     repo: str | None = None
+    items: list[dict] | None = None  # fetch_many: [{"url": ..., "dest": ...}, ...]
+    jobs: int | None = None
+    per_host: int | None = None
     # controls
     retries: int = 0
     allow_fail: bool = False
@@ -98,6 +103,60 @@ def _load_taskfile(path: Path) -> list[Any]:
     return items
 
 
+_PAIR_RE = re.compile(r"^(?P<url>\S+)\s*->\s*(?P<dest>\S+)$")
+
+
+def _fetch_dest(url: str, dest: str) -> str:
+    """A dest ending in '/' is a directory: keep the URL's file name."""
+    if dest.endswith("/"):
+        name = url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1] or "index.html"
+        return dest + name
+    return dest
+
+
+def _parse_fetch_pairs(text: str) -> list[dict]:
+    """
+    Parse 'URL -> DEST' (or 'URL DEST') pairs, one per line. Blank lines and
+    '#' comments are skipped. A JSON list of {"url", "dest"} objects also works.
+    """
+    data = _json_or_text(text)
+    if isinstance(data, list):
+        return [
+            {"url": d["url"], "dest": _fetch_dest(d["url"], d["dest"])}
+            for d in data
+            if isinstance(d, dict) and d.get("url") and d.get("dest")
+        ]
+    out: list[dict] = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        m = _PAIR_RE.match(line)
+        if m:
+            url, dest = m.group("url"), m.group("dest")
+        else:
+            parts = line.split()
+            if len(parts) != 2:
+                raise ValueError(f"fetch: bad pair line: {line!r}")
+            url, dest = parts
+        out.append({"url": url, "dest": _fetch_dest(url, dest)})
+    return out
+
+
+def _fetch_many_step(items: list[dict], kv: dict[str, str]) -> Step:
+    if not items:
+        raise ValueError("fetch: no url -> dest pairs found")
+    jobs = kv.get("jobs")
+    per_host = kv.get("per_host")
+    return Step(
+        op="fetch_many",
+        desc=f"download {len(items)} files",
+        items=items,
+        jobs=int(jobs) if jobs and jobs.isdigit() else None,
+        per_host=int(per_host) if per_host and per_host.isdigit() else None,
+    )
+
+
 def _apply_meta(steps: list[Step], meta: dict[str, Any]) -> list[Step]:
     r = int(meta.get("retries", 0) or 0)
     a = bool(meta.get("allow_fail", False))
@@ -160,8 +219,16 @@ def _steps_for_goal(goal: str) -> list[Step]:
         return [Step(op="scaffold", desc="scaffold project layout", layout=layout)]
 
     # fetch: url=...; dest=...  OR  fetch: URL -> DEST
+    # fetch: manifest=FILE[; jobs=N; per_host=N]  OR  one 'URL -> DEST' per line
     if g.startswith("fetch:"):
         payload = g[len("fetch:") :].strip()
+        # multi-line 'url=...;\ndest=...' is still a single key=value fetch
+        if "\n" in payload and not re.match(r"(url|dest|manifest)\s*=", payload):
+            return [_fetch_many_step(_parse_fetch_pairs(payload), {})]
+        if payload.startswith("manifest="):
+            kv = _parse_kv_blob(payload)
+            text = Path(kv["manifest"]).read_text(encoding="utf-8")
+            return [_fetch_many_step(_parse_fetch_pairs(text), kv)]
         m = re.match(r"^(?P<url>\S+)\s*->\s*(?P<dest>\S+)$", payload)
         if m:
             url = m.group("url")
@@ -201,6 +268,7 @@ def _steps_for_goal(goal: str) -> list[Step]:
     return [Step(op="exec", desc=f"run shell: {g}", cmd=g)]
 
 
+@traced("planner.make_plan")
 def make_plan(goal: str) -> list[Step]:
     g = goal.strip()
 
@@ -1,15 +1,154 @@
+"""
+Quality gates for a generated project
+ruff formats the tree first, because it rewrites files. Then mypy and the
+affected tests (runtime.testimpact), split into shards across the cores,
+run as concurrent processes, so the wall time is close to the slowest
+gate. With fail_fast the first failing gate stops the others. ruff and
+mypy keep their caches in the project: .ruff_cache, and either a dmypy
+daemon per project (when dmypy is installed) or .mypy_cache. Repeat runs
+then only redo what changed.
+"""
+
 from __future__ import annotations
 
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 
-from master_ai.tools.shell import run
+from master_ai.runtime.testimpact import finish_impacted, plan_impacted
+from master_ai.tools.shell import start, stop
+
+GATE_TIMEOUT_S = 1800
+
+
+@dataclass
+class Gate:
+    name: str
+    cmd: list[str]
+    env: dict[str, str] | None = None
+    ok: frozenset[int] = frozenset({0})  # exit codes that pass
+
+
+@dataclass
+class GateResult:
+    name: str
+    status: str  # "passed", "failed", "timeout", "cancelled" or "skipped"
+    returncode: int | None  # None: not run to the end
+    seconds: float
+    output: str = ""
+    cmd: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("passed", "skipped")
+
+
+def _ruff(root: Path) -> list[str]:
+    return ["ruff", "format", "--cache-dir", str(root / ".ruff_cache"), "."]
+
+
+def _mypy(root: Path) -> list[str]:
+    if shutil.which("dmypy"):
+        # the daemon logs to a file so that it does not keep our pipes open
+        status, log = str(root / ".dmypy.json"), str(root / ".dmypy.log")
+        return ["dmypy", "--status-file", status, "run", "--log-file", log, "--", "."]
+    return ["mypy", "--incremental", "--cache-dir", str(root / ".mypy_cache"), "."]
+
+
+def run_gates(
+    gates: list[Gate], root: Path, *, fail_fast: bool = True, timeout: int = GATE_TIMEOUT_S
+) -> list[GateResult]:
+    """Run `gates` as concurrent processes; results in the order given."""
+    results: dict[int, GateResult] = {}
+    procs: dict[int, subprocess.Popen] = {}
+    stopped: set[int] = set()
+    lock = threading.Lock()
+    t0 = time.perf_counter()
+    for i, gate in enumerate(gates):
+        if shutil.which(gate.cmd[0]) is None:
+            results[i] = GateResult(gate.name, "skipped", None, 0.0, f"{gate.cmd[0]} not found")
+        else:
+            procs[i] = start(gate.cmd, cwd=str(root), env=gate.env)
+
+    def wait(i: int) -> GateResult:
+        gate, proc = gates[i], procs[i]
+        try:
+            out, err = proc.communicate(timeout=timeout)
+            status = "passed" if proc.returncode in gate.ok else "failed"
+        except subprocess.TimeoutExpired:
+            stop(proc, signal.SIGKILL)
+            out, err = proc.communicate()
+            status = "timeout"
+        seconds = time.perf_counter() - t0
+        with lock:
+            if i in stopped and status != "passed":
+                status = "cancelled"
+            elif status != "passed" and fail_fast:
+                for j, other in procs.items():
+                    if j != i and other.poll() is None:
+                        stopped.add(j)
+                        stop(other)
+        rc = proc.returncode if status in ("passed", "failed") else None
+        return GateResult(gate.name, status, rc, seconds, (out + err).strip(), gate.cmd)
+
+    if procs:
+        with ThreadPoolExecutor(len(procs)) as pool:
+            results.update(zip(procs, pool.map(wait, procs), strict=True))
+    return [results[i] for i in range(len(gates))]
+
+
+def first_failure(results: list[GateResult]) -> GateResult | None:
+    """The gate to report: the first that failed or timed out, else the first cancelled."""
+    for statuses in (("failed", "timeout"), ("cancelled",)):
+        failed = next((r for r in results if r.status in statuses), None)
+        if failed is not None:
+            return failed
+    return None
 
 
-def run_quality_gates(project_path: Path) -> None:
-    # format + typecheck
-    run(["ruff", "format", "."], cwd=str(project_path))
-    run(["mypy", "."], cwd=str(project_path))
-    # tests
-    cp = run(["pytest", "-q"], cwd=str(project_path))
-    if cp.returncode != 0:
-        raise SystemExit(cp.returncode)
+def run_quality_gates(
+    project_path: Path,
+    *,
+    fail_fast: bool = True,
+    shards: int | None = None,
+    check: bool = True,
+) -> list[GateResult]:
+    """
+    Format, then type check and test concurrently (see the module
+    docstring). Prints one line per gate; with `check`, exits with the
+    code of the gate that failed (not one that it cancelled).
+    """
+    root = Path(project_path).resolve()
+    t0 = time.perf_counter()
+    results = run_gates([Gate("format", _ruff(root))], root)
+    if results[0].ok or not fail_fast:
+        plan = plan_impacted(root, shards=shards or os.cpu_count() or 1)
+        sharded = len(plan.commands) > 1
+        tests = [
+            Gate(
+                f"pytest[{i}/{len(plan.commands)}]" if sharded else "pytest",
+                cmd,
+                plan.env,
+                frozenset({0, 5}) if sharded else frozenset({0}),  # 5: a shard got no tests
+            )
+            for i, cmd in enumerate(plan.commands)
+        ]
+        gates = run_gates([Gate("mypy", _mypy(root)), *tests], root, fail_fast=fail_fast)
+        finish_impacted(plan, [r.returncode for r in gates[1:]])
+        results += gates
+        if not tests:
+            results.append(GateResult("pytest", "skipped", None, 0.0, plan.reason))
+    for r in results:
+        print(f"[gates] {r.name:<12} {r.status:<9} {r.seconds:7.2f}s")
+    print(f"[gates] total {time.perf_counter() - t0:.2f}s")
+    failed = first_failure(results)
+    if check and failed is not None:
+        print(failed.output)
+        raise SystemExit(failed.returncode or 1)
+    return results
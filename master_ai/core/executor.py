@@ -9,6 +9,14 @@ from collections.abc import Sequence
 from dataclasses import dataclass
 from pathlib import Path
 
+from master_ai.runtime import metrics
+
+EXEC_SECONDS = metrics.histogram("master_ai_exec_seconds", "Executor.run wall time", ["cmd"])
+EXEC_FAILURES = metrics.counter("master_ai_exec_failures_total", "Executor.run rc != 0", ["cmd"])
+EXEC_TIMEOUTS = metrics.counter(
+    "master_ai_exec_timeouts_total", "Executor.run commands killed at timeout", ["cmd"]
+)
+
 ALLOWED_CMDS = {
     "python",
     "pytest",
@@ -54,15 +62,24 @@ class Executor:
         penv = os.environ.copy()
         if env:
             penv.update(env)
-        p = subprocess.run(
-            list(cmd),
-            cwd=str(wdir),
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            check=False,
-            env=penv,
-        )
+        t0 = time.perf_counter()
+        try:
+            p = subprocess.run(
+                list(cmd),
+                cwd=str(wdir),
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                check=False,
+                env=penv,
+            )
+        except subprocess.TimeoutExpired:
+            EXEC_TIMEOUTS.labels(cmd[0]).inc()
+            raise
+        finally:
+            EXEC_SECONDS.labels(cmd[0] if cmd else "").observe(time.perf_counter() - t0)
+        if p.returncode != 0:
+            EXEC_FAILURES.labels(cmd[0]).inc()
         ts = time.strftime("%Y%m%d_%H%M%S")
         (self.logs / f"cmd_{ts}.log").write_text(
             json.dumps(
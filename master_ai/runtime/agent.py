@@ -5,22 +5,38 @@ from dataclasses import dataclass
 from pathlib import Path
 
 from master_ai.agents.planner import Step, make_plan
+from master_ai.runtime import metrics, trace
+from master_ai.runtime.catalog import RunCatalog
 from master_ai.runtime.events import EventBus, log
+from master_ai.runtime.eventstream import ensure_server_from_env
 from master_ai.runtime.fileops import (
     apply_structured_edits,
     patch_file,
     scaffold_layout,
     write_file,
 )
-from master_ai.runtime.net import fetch_file
+from master_ai.runtime.net import fetch_file, fetch_many
 from master_ai.runtime.utils import run_stream
 
+RUNS_ACTIVE = metrics.gauge("master_ai_runs_active", "Agent runs in progress")
+RUNS = metrics.counter("master_ai_runs_total", "Finished agent runs", ["result"])
+STEP_SECONDS = metrics.histogram("master_ai_step_seconds", "Step wall time incl. retries", ["op"])
+STEP_FAILURES = metrics.counter(
+    "master_ai_step_failures_total", "Steps ending with rc != 0", ["op"]
+)
+STEP_RETRIES = metrics.counter("master_ai_step_retries_total", "Step re-attempts", ["op"])
+TIMEOUT_KILLS = metrics.counter(
+    "master_ai_timeout_kills_total", "Step subprocesses killed at their timeout"
+)
+
 
 @dataclass
 class Agent:
     goal: str
     root: Path
     safe_mode: bool = True
+    # Write run_dir/trace.json (Chrome trace events); also via MASTER_AI_TRACE=1.
+    trace: bool = False
 
     def run(self) -> int:
         run_id = time.strftime("%Y%m%d_%H%M%S")
@@ -28,22 +44,57 @@ class Agent:
         logs_dir = run_dir / "logs"
         logs_dir.mkdir(parents=True, exist_ok=True)
 
+        tracing = self.trace or trace.env_enabled()
+        if tracing:
+            trace.start(run_dir / "trace.json")
+        try:
+            with trace.span("run", goal=self.goal, run_id=run_id):
+                return self._run(run_id, run_dir, logs_dir)
+        finally:
+            if tracing:
+                print(f"[agent] trace:  {trace.stop()}")
+
+    def _run(self, run_id: str, run_dir: Path, logs_dir: Path) -> int:
         bus = EventBus(run_dir)
+        try:
+            ensure_server_from_env(self.root)  # live SSE feed when MASTER_AI_EVENTS_ADDR is set
+            metrics.ensure_server_from_env()  # /metrics when MASTER_AI_METRICS_ADDR is set
+        except OSError as e:
+            print(f"[agent] event/metrics server disabled: {e}")
         log(
             "run_started",
             {"run_id": run_id, "goal": self.goal, "safe": self.safe_mode},
             bus=bus,
         )
+        catalog = self._catalog(run_id, bus)
+        RUNS_ACTIVE.inc()
+        stats = {"steps_total": 0, "steps_done": 0, "steps_failed": 0, "step_seconds": 0.0}
+
+        def _finish(result: str, code: int) -> int:
+            log("run_finished", {"result": result}, bus=bus)
+            RUNS_ACTIVE.dec()
+            RUNS.labels(result).inc()
+            try:
+                metrics.write_textfile_from_env()
+            except OSError as e:
+                log("log", {"step": 0, "line": f"metrics textfile error: {e}"}, bus=bus)
+            if catalog:
+                try:
+                    catalog.run_finished(run_id, result, **stats)
+                    catalog.close()
+                except Exception as e:  # noqa: BLE001
+                    log("log", {"step": 0, "line": f"catalog error: {e}"}, bus=bus)
+            print(f"[agent] run={run_id} result={result}")
+            print(f"[agent] events: {run_dir / 'events.jsonl'}")
+            print(f"[agent] logs:   {logs_dir}")
+            return code
 
         try:
             steps = make_plan(self.goal)
         except Exception as e:  # pragma: no cover
             log("log", {"step": 0, "line": f"planner error: {e}"}, bus=bus)
-            log("run_finished", {"result": "FAILED"}, bus=bus)
-            print(f"[agent] run={run_id} result=FAILED")
-            print(f"[agent] events: {run_dir / 'events.jsonl'}")
-            print(f"[agent] logs:   {logs_dir}")
-            return 1
+            return _finish("FAILED", 1)
+        stats["steps_total"] = len(steps)
 
         log("plan_ready", {"steps": [s.__dict__ for s in steps]}, bus=bus)
         log("progress", {"current": 0, "total": len(steps), "eta": None}, bus=bus)
@@ -64,22 +115,34 @@ class Agent:
                 rc = 0
                 t0_step = time.time()
 
-                for attempt in range(1, attempts + 1):
-                    if attempts > 1:
-                        if attempt > 1:
-                            log(
-                                "log",
-                                {
-                                    "step": idx,
-                                    "line": f"retry {attempt}/{attempts} after failure…",
-                                },
-                                bus=bus,
+                step_span = trace.span("step", idx=idx, op=step.op, desc=step.desc)
+                with step_span:
+                    for attempt in range(1, attempts + 1):
+                        if attempts > 1:
+                            if attempt > 1:
+                                STEP_RETRIES.labels(step.op).inc()
+                                log(
+                                    "log",
+                                    {
+                                        "step": idx,
+                                        "line": f"retry {attempt}/{attempts} after failure…",
+                                    },
+                                    bus=bus,
+                                )
+                        with trace.span("attempt", attempt=attempt):
+                            rc, logfile = self._run_one(
+                                step, idx, run_dir, logs_dir, timeout_s, bus
                             )
-                    rc, logfile = self._run_one(step, idx, run_dir, logs_dir, timeout_s, bus)
-                    if rc == 0:
-                        break
+                        if rc == 0:
+                            break
 
                 elapsed = round(time.time() - t0_step, 3)
+                STEP_SECONDS.labels(step.op).observe(elapsed)
+                if rc != 0:
+                    STEP_FAILURES.labels(step.op).inc()
+                stats["steps_done"] += 1
+                stats["steps_failed"] += int(rc != 0)
+                stats["step_seconds"] += elapsed
                 log(
                     "action_done",
                     {
@@ -97,29 +160,27 @@ class Agent:
                 )
 
                 if rc != 0 and not allow_fail:
-                    log("run_finished", {"result": "FAILED"}, bus=bus)
-                    print(f"[agent] run={run_id} result=FAILED")
-                    print(f"[agent] events: {run_dir / 'events.jsonl'}")
-                    print(f"[agent] logs:   {logs_dir}")
-                    return 1
+                    return _finish("FAILED", 1)
 
         except KeyboardInterrupt:
             # Graceful abort
             log("log", {"step": 0, "line": "KeyboardInterrupt: aborting run"}, bus=bus)
-            log("run_finished", {"result": "ABORTED"}, bus=bus)
-            print(f"[agent] run={run_id} result=ABORTED")
-            print(f"[agent] events: {run_dir / 'events.jsonl'}")
-            print(f"[agent] logs:   {logs_dir}")
-            return 130
+            return _finish("ABORTED", 130)
 
-        log("run_finished", {"result": "OK"}, bus=bus)
-        print(f"[agent] run={run_id} result=OK")
-        print(f"[agent] events: {run_dir / 'events.jsonl'}")
-        print(f"[agent] logs:   {logs_dir}")
-        return 0
+        return _finish("OK", 0)
 
     # ---- helpers -------------------------------------------------------------
 
+    def _catalog(self, run_id: str, bus: EventBus) -> RunCatalog | None:
+        """Open the run catalog and record the start; a broken catalog never fails the run."""
+        try:
+            catalog = RunCatalog(self.root)
+            catalog.run_started(run_id, self.goal, self.safe_mode)
+            return catalog
+        except Exception as e:  # noqa: BLE001
+            log("log", {"step": 0, "line": f"catalog unavailable: {e}"}, bus=bus)
+            return None
+
     def _run_one(
         self,
         step: Step,
@@ -138,71 +199,108 @@ class Agent:
         t_start = time.time()
 
         try:
-            if step.op == "exec" and step.cmd:
-                rc, logfile = self._run_streaming_cmd(
-                    idx, step.cmd, run_dir, logs_dir, timeout_s, bus
-                )
+            with trace.span(f"op:{step.op}"):
+                rc, logfile = self._dispatch(step, idx, run_dir, logs_dir, timeout_s, bus)
+        except KeyboardInterrupt:
+            raise  # handled by outer try/except
+        except Exception as e:  # noqa: BLE001
+            rc = 1
+            log("log", {"step": idx, "line": f"exception: {e}"}, bus=bus)
+
+        # Timeout bookkeeping (for non-streaming ops we just check elapsed)
+        if timeout_s and (time.time() - t_start) > timeout_s and rc == 0:
+            rc = 1
+            log("log", {"step": idx, "line": f"timeout exceeded: {timeout_s}s"}, bus=bus)
 
-            elif step.op == "git" and step.args:
-                cmd = " ".join(["git"] + step.args)
-                rc, logfile = self._run_streaming_cmd(idx, cmd, run_dir, logs_dir, timeout_s, bus)
+        return rc, logfile
 
-            elif step.op == "write" and step.path is not None and step.content is not None:
-                write_file(Path(step.path), step.content, cwd=run_dir)
+    def _dispatch(
+        self,
+        step: Step,
+        idx: int,
+        run_dir: Path,
+        logs_dir: Path,
+        timeout_s: float | None,
+        bus: EventBus,
+    ) -> tuple[int, Path | None]:
+        """Perform one step's op; exceptions propagate to _run_one."""
+        rc = 0
+        logfile: Path | None = None
+        if step.op == "exec" and step.cmd:
+            rc, logfile = self._run_streaming_cmd(idx, step.cmd, run_dir, logs_dir, timeout_s, bus)
 
-            elif (
-                step.op == "patch"
-                and step.path
-                and (step.before is not None)
-                and (step.after is not None)
-            ):
-                patch_file(Path(step.path), step.before, step.after, cwd=run_dir)
+        elif step.op == "git" and step.args:
+            cmd = " ".join(["git"] + step.args)
+            rc, logfile = self._run_streaming_cmd(idx, cmd, run_dir, logs_dir, timeout_s, bus)
 
-            elif step.op == "edit" and step.edits:
-                apply_structured_edits(step.edits, cwd=run_dir)
+        elif step.op == "write" and step.path is not None and step.content is not None:
+            write_file(Path(step.path), step.content, cwd=run_dir)
 
-            elif step.op == "scaffold" and step.layout:
-                scaffold_layout(step.layout, cwd=run_dir)
+        elif (
+            step.op == "patch"
+            and step.path
+            and (step.before is not None)
+            and (step.after is not None)
+        ):
+            patch_file(Path(step.path), step.before, step.after, cwd=run_dir)
 
-            elif step.op == "py" and step.code is not None:
-                locs: dict = {}
-                try:
-                    exec(step.code, {}, locs)  # noqa: S102
-                    log(
-                        "log",
-                        {
-                            "step": idx,
-                            "line": f"py: executed, locals={list(locs.keys())}",
-                        },
-                        bus=bus,
-                    )
-                except Exception as e:  # noqa: BLE001
-                    rc = 1
-                    log("log", {"step": idx, "line": f"py error: {e}"}, bus=bus)
+        elif step.op == "edit" and step.edits:
+            apply_structured_edits(step.edits, cwd=run_dir)
 
-            elif step.op == "fetch" and getattr(step, "url", None) and getattr(step, "dest", None):
-                dest = fetch_file(step.url, Path(step.dest))
-                log("log", {"step": idx, "line": f"fetched -> {dest}"}, bus=bus)
+        elif step.op == "scaffold" and step.layout:
+            scaffold_layout(step.layout, cwd=run_dir)
 
-            else:
+        elif step.op == "py" and step.code is not None:
+            locs: dict = {}
+            try:
+                exec(step.code, {}, locs)  # noqa: S102
+                log(
+                    "log",
+                    {
+                        "step": idx,
+                        "line": f"py: executed, locals={list(locs.keys())}",
+                    },
+                    bus=bus,
+                )
+            except Exception as e:  # noqa: BLE001
                 rc = 1
+                log("log", {"step": idx, "line": f"py error: {e}"}, bus=bus)
+
+        elif step.op == "fetch" and getattr(step, "url", None) and getattr(step, "dest", None):
+            dest = fetch_file(step.url, Path(step.dest))
+            log("log", {"step": idx, "line": f"fetched -> {dest}"}, bus=bus)
+
+        elif step.op == "fetch_many" and step.items:
+            results = fetch_many(
+                [(it["url"], Path(it["dest"])) for it in step.items],
+                max_workers=step.jobs or 8,
+                per_host=step.per_host or 4,
+                on_progress=lambda p: log("fetch_progress", {"step": idx, **p}, bus=bus),
+            )
+            failed = [r for r in results if not r.ok]
+            for r in failed:
                 log(
                     "log",
-                    {"step": idx, "line": f"unknown or malformed step: {step.op}"},
+                    {"step": idx, "line": f"fetch failed: {r.url} ({r.error})"},
                     bus=bus,
                 )
-
-        except KeyboardInterrupt:
-            raise  # handled by outer try/except
-        except Exception as e:  # noqa: BLE001
-            rc = 1
-            log("log", {"step": idx, "line": f"exception: {e}"}, bus=bus)
-
-        # Timeout bookkeeping (for non-streaming ops we just check elapsed)
-        if timeout_s and (time.time() - t_start) > timeout_s and rc == 0:
+            log(
+                "log",
+                {
+                    "step": idx,
+                    "line": f"fetched {len(results) - len(failed)}/{len(results)} files",
+                },
+                bus=bus,
+            )
+            rc = 1 if failed else 0
+
+        else:
             rc = 1
-            log("log", {"step": idx, "line": f"timeout exceeded: {timeout_s}s"}, bus=bus)
-
+            log(
+                "log",
+                {"step": idx, "line": f"unknown or malformed step: {step.op}"},
+                bus=bus,
+            )
         return rc, logfile
 
     def _run_streaming_cmd(
@@ -218,16 +316,21 @@ class Agent:
         Start a subprocess and stream lines to events and a log file.
         Enforces an optional timeout by killing the process if exceeded.
         """
-        proc = run_stream(cmd, cwd=run_dir, env_add={}, safe_mode=self.safe_mode)
+        with trace.span("spawn", cmd=cmd):
+            proc = run_stream(cmd, cwd=run_dir, env_add={}, safe_mode=self.safe_mode)
         logfile = logs_dir / f"step_{idx}.log"
         deadline = (time.time() + timeout_s) if timeout_s else None
+        first_line = True
 
         try:
-            with logfile.open("w", encoding="utf-8") as lf:
+            with logfile.open("w", encoding="utf-8") as lf, trace.span("stream", pid=proc.pid):
                 # Use readline loop so we can periodically check timeout
                 while True:
                     line = proc.stdout.readline() if proc.stdout else ""
                     if line:
+                        if first_line:
+                            trace.instant("first_output")
+                            first_line = False
                         line = line.rstrip("\n")
                         lf.write(line + "\n")
                         log("log", {"step": idx, "line": line}, bus=bus)
@@ -241,6 +344,7 @@ class Agent:
                                 proc.kill()
                             except Exception:
                                 pass
+                            TIMEOUT_KILLS.inc()
                             log(
                                 "log",
                                 {
@@ -265,5 +369,6 @@ class Agent:
             log("log", {"step": idx, "line": f"stream error: {e}"}, bus=bus)
             return 1, logfile
 
-        rc = proc.wait()
+        with trace.span("wait"):
+            rc = proc.wait()
         return rc, logfile
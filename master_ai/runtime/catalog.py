@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from .events import read_events
+from .utils import RUNS_ROOT
+
+CATALOG_NAME = ".catalog.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    goal TEXT,
+    status TEXT NOT NULL,
+    safe INTEGER,
+    started REAL,
+    finished REAL,
+    duration REAL,
+    steps_total INTEGER NOT NULL DEFAULT 0,
+    steps_done INTEGER NOT NULL DEFAULT 0,
+    steps_failed INTEGER NOT NULL DEFAULT 0,
+    step_seconds REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS runs_status ON runs(status, started);
+"""
+
+_COLUMNS = (
+    "run_id",
+    "goal",
+    "status",
+    "safe",
+    "started",
+    "finished",
+    "duration",
+    "steps_total",
+    "steps_done",
+    "steps_failed",
+    "step_seconds",
+)
+
+
+def _parse_ts(ts: str | None, run_id: str | None = None) -> float | None:
+    for value, fmt in ((ts, "%Y-%m-%dT%H:%M:%S%z"), (ts, "%Y-%m-%dT%H:%M:%S")):
+        if value:
+            try:
+                return datetime.strptime(value, fmt).timestamp()
+            except ValueError:
+                pass
+    if run_id:
+        try:
+            return datetime.strptime(run_id[:15], "%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            pass
+    return None
+
+
+class RunCatalog:
+    """
+    SQLite index of runs under a runs root (one row per run directory):
+    goal, status, start/end, step counts and durations.
+
+    The Agent writes a row at run start and completes it at run finish, so
+    UIs can list and filter runs without scanning directories or reading
+    events. `rebuild()` recreates the index from the run directories.
+    """
+
+    def __init__(self, root: Path | str = RUNS_ROOT) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.path = self.root / CATALOG_NAME
+        self._con = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._con.row_factory = sqlite3.Row
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._con.close()
+
+    # ---- writes (Agent) -------------------------------------------------------
+
+    def run_started(self, run_id: str, goal: str, safe: bool, started: float | None = None) -> None:
+        self._con.execute(
+            "INSERT OR REPLACE INTO runs (run_id, goal, status, safe, started)"
+            " VALUES (?, ?, 'RUNNING', ?, ?)",
+            (run_id, goal, int(safe), started or time.time()),
+        )
+
+    def run_finished(
+        self,
+        run_id: str,
+        result: str,
+        *,
+        steps_total: int = 0,
+        steps_done: int = 0,
+        steps_failed: int = 0,
+        step_seconds: float = 0.0,
+        finished: float | None = None,
+    ) -> None:
+        finished = finished or time.time()
+        self._con.execute(
+            "UPDATE runs SET status=?, finished=?, duration=? - started, steps_total=?,"
+            " steps_done=?, steps_failed=?, step_seconds=? WHERE run_id=?",
+            (
+                result,
+                finished,
+                finished,
+                steps_total,
+                steps_done,
+                steps_failed,
+                round(step_seconds, 3),
+                run_id,
+            ),
+        )
+
+    def forget(self, run_id: str) -> None:
+        self._con.execute("DELETE FROM runs WHERE run_id=?", (run_id,))
+
+    # ---- reads (UIs / CLI) ----------------------------------------------------
+
+    def _where(
+        self, status: str | None, goal: str | None, since: float | None
+    ) -> tuple[str, list[Any]]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        if status:
+            clauses.append("status = ?")
+            params.append(status.upper())
+        if goal:
+            clauses.append("goal LIKE ?")
+            params.append(f"%{goal}%")
+        if since is not None:
+            clauses.append("started >= ?")
+            params.append(since)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(
+        self,
+        *,
+        status: str | None = None,
+        goal: str | None = None,
+        since: float | None = None,
+        limit: int = 50,
+        offset: int = 0,
+        newest_first: bool = True,
+    ) -> list[dict[str, Any]]:
+        """Filtered, paginated rows ordered by start time."""
+        where, params = self._where(status, goal, since)
+        order = "DESC" if newest_first else "ASC"
+        rows = self._con.execute(
+            f"SELECT * FROM runs{where} ORDER BY started {order}, run_id {order} LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def count(
+        self, *, status: str | None = None, goal: str | None = None, since: float | None = None
+    ) -> int:
+        where, params = self._where(status, goal, since)
+        return self._con.execute(f"SELECT COUNT(*) FROM runs{where}", params).fetchone()[0]
+
+    def latest(self) -> dict[str, Any] | None:
+        rows = self.query(limit=1)
+        return rows[0] if rows else None
+
+    # ---- maintenance ------------------------------------------------------------
+
+    def index_run(self, run_dir: Path) -> dict[str, Any]:
+        """(Re)derive one run's row from its events.jsonl."""
+        row: dict[str, Any] = dict.fromkeys(_COLUMNS)
+        row.update(
+            run_id=run_dir.name,
+            status="RUNNING",
+            steps_total=0,
+            steps_done=0,
+            steps_failed=0,
+            step_seconds=0.0,
+        )
+        for e in read_events(run_dir):
+            k, d = e.get("kind"), e.get("data", {}) or {}
+            if k == "run_started":
+                row["goal"] = d.get("goal")
+                row["safe"] = int(bool(d.get("safe")))
+                row["started"] = _parse_ts(e.get("ts"), run_dir.name)
+            elif k == "plan_ready":
+                row["steps_total"] = len(d.get("steps") or [])
+            elif k == "action_done":
+                row["steps_done"] += 1
+                row["steps_failed"] += int(d.get("rc") not in (0, None))
+                row["step_seconds"] += float(d.get("seconds") or 0)
+            elif k == "run_finished":
+                row["status"] = d.get("result") or "UNKNOWN"
+                row["finished"] = _parse_ts(e.get("ts"))
+        if row["started"] is None:
+            row["started"] = _parse_ts(None, run_dir.name)
+        if row["started"] is not None and row["finished"] is not None:
+            row["duration"] = row["finished"] - row["started"]
+        self._con.execute(
+            f"INSERT OR REPLACE INTO runs ({', '.join(_COLUMNS)})"
+            f" VALUES ({', '.join('?' * len(_COLUMNS))})",
+            [row[c] for c in _COLUMNS],
+        )
+        return row
+
+    def rebuild(self) -> int:
+        """Re-index every run directory under root; returns the number of runs."""
+        dirs = [p for p in self.root.iterdir() if p.is_dir()]
+        self._con.execute("BEGIN")
+        try:
+            self._con.execute("DELETE FROM runs")
+            for d in dirs:
+                self.index_run(d)
+            self._con.execute("COMMIT")
+        except Exception:
+            self._con.execute("ROLLBACK")
+            raise
+        return len(dirs)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+
+# Optional dependency: zstd frames when `zstandard` is installed, gzip otherwise.
+try:
+    import zstandard
+except Exception:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+# Uncompressed bytes per independently decodable frame (gzip member / zstd
+# frame). Smaller frames mean cheaper seeks, larger ones a better ratio.
+FRAME_BYTES = 1 << 20
+SUFFIXES = (".zst", ".gz")
+READ_CHUNK = 65536
+
+
+def compressed_path(path: Path | str) -> Path | None:
+    """The compressed sibling of `path` (path.zst / path.gz), if one exists."""
+    for suffix in SUFFIXES:
+        p = Path(f"{path}{suffix}")
+        if p.exists():
+            return p
+    return None
+
+
+def _index_path(path: Path) -> Path:
+    return Path(f"{path}.idx")
+
+
+def compress_file(src: Path | str, codec: str = "auto", frame_bytes: int = FRAME_BYTES) -> Path:
+    """
+    Replace `src` with a seekable compressed copy.
+
+    The data is cut into frames of about `frame_bytes` at line boundaries,
+    and each frame is compressed on its own: concatenated gzip members, or
+    zstd frames. A sidecar `<dst>.idx` (JSON list of [raw_offset,
+    compressed_offset]) lets readers start at any uncompressed offset
+    without decoding the frames before it (written only when there is more
+    than one frame). Returns the compressed path.
+    """
+    src = Path(src)
+    if codec == "auto":
+        codec = "zstd" if zstandard is not None else "gzip"
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("zstd compression requires zstandard (pip install zstandard)")
+    dst = Path(f"{src}{'.zst' if codec == 'zstd' else '.gz'}")
+    tmp = Path(f"{dst}.tmp")
+    cctx = zstandard.ZstdCompressor(level=9) if codec == "zstd" else None
+    index: list[list[int]] = []
+    raw_off = 0
+    with src.open("rb") as fin, tmp.open("wb") as fout:
+        while True:
+            frame = fin.read(frame_bytes)
+            if not frame:
+                break
+            frame += fin.readline()  # finish the current line
+            index.append([raw_off, fout.tell()])
+            fout.write(cctx.compress(frame) if cctx else gzip.compress(frame, mtime=0))
+            raw_off += len(frame)
+    if len(index) > 1:  # a single frame needs no index
+        _index_path(tmp).write_text(json.dumps(index))
+        os.replace(_index_path(tmp), _index_path(dst))
+    os.replace(tmp, dst)
+    src.unlink()
+    return dst
+
+
+def _frame_start(path: Path, offset: int) -> tuple[int, int]:
+    """(raw_offset, compressed_offset) of the frame holding `offset`."""
+    try:
+        index = json.loads(_index_path(path).read_text())
+    except (OSError, ValueError):
+        return 0, 0  # no index: decode from the start
+    start = (0, 0)
+    for raw, comp in index:
+        if raw > offset:
+            break
+        start = (raw, comp)
+    return start
+
+
+def _decoded(f, codec: str) -> Iterator[bytes]:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("reading .zst files requires zstandard (pip install zstandard)")
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        yield from iter(lambda: reader.read(READ_CHUNK), b"")
+        return
+    d = zlib.decompressobj(wbits=31)
+    while True:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            return
+        while chunk:
+            yield d.decompress(chunk)
+            if not d.eof:
+                break
+            chunk = d.unused_data  # next gzip member
+            d = zlib.decompressobj(wbits=31)
+
+
+def read_from(path: Path | str, offset: int = 0) -> Iterator[bytes]:
+    """Yield the decompressed bytes of `path` starting at uncompressed `offset`."""
+    path = Path(path)
+    codec = "zstd" if path.suffix == ".zst" else "gzip"
+    raw, comp = _frame_start(path, offset)
+    skip = offset - raw
+    with path.open("rb") as f:
+        f.seek(comp)
+        for chunk in _decoded(f, codec):
+            if skip:
+                if skip >= len(chunk):
+                    skip -= len(chunk)
+                    continue
+                chunk, skip = chunk[skip:], 0
+            if chunk:
+                yield chunk
+
+
+def iter_lines(path: Path | str, offset: int = 0) -> Iterator[bytes]:
+    """Complete lines (with newline) of a compressed file from uncompressed `offset`."""
+    tail = b""
+    for chunk in read_from(path, offset):
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if tail:
+        yield tail
+
+
+def raw_size(path: Path | str) -> int:
+    """Uncompressed size (decodes from the last indexed frame only)."""
+    raw, _ = _frame_start(Path(path), 1 << 62)
+    return raw + sum(len(c) for c in read_from(path, raw))
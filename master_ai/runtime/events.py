@@ -4,11 +4,26 @@ import json
 import time
 from pathlib import Path
 
+from . import compress, metrics
+from .eventstream import HUB
+from .trace import traced
+
 ISO = "%Y-%m-%dT%H:%M:%S%z"
 
+EVENT_WRITE_SECONDS = metrics.histogram(
+    "master_ai_event_write_seconds",
+    "EventBus.emit append latency",
+    buckets=(1e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.05, 0.1),
+)
+
 
 class EventBus:
-    """Append-only JSONL event log for a single run directory."""
+    """
+    Append-only JSONL event log for a single run directory.
+
+    Each emit also wakes any in-process event stream subscribers for the run
+    (see runtime.eventstream); with nobody subscribed that is a no-op.
+    """
 
     def __init__(self, run_dir: Path) -> None:
         self.run_dir = Path(run_dir)
@@ -17,10 +32,15 @@ class EventBus:
         if not self.path.exists():
             self.path.write_text("")
 
+    @traced("EventBus.emit")
     def emit(self, kind: str, data: dict) -> None:
         evt = {"ts": time.strftime(ISO, time.gmtime()), "kind": kind, "data": data}
+        t0 = time.perf_counter()
         with self.path.open("a", encoding="utf-8") as f:
             f.write(json.dumps(evt, ensure_ascii=False) + "\n")
+            offset = f.tell()
+        EVENT_WRITE_SECONDS.observe(time.perf_counter() - t0)
+        HUB.publish(self.run_dir, offset)
 
 
 # --- module-level function expected by callers ---
@@ -34,24 +54,67 @@ def log(kind: str, data: dict, *, bus: EventBus = None) -> None:
 
 
 # ---- Helpers used by the Streamlit monitor ----
+def _events_path(p: Path) -> Path:
+    return Path(p) if str(p).endswith(".jsonl") else (Path(p) / "events.jsonl")
+
+
+def _lines(path: Path, offset: int = 0):
+    """Raw lines from `offset`: the live file, or its compressed copy once gc has run."""
+    if path.exists():
+        with path.open("rb") as f:
+            f.seek(offset)
+            yield from f
+        return
+    packed = compress.compressed_path(path)
+    if packed is not None:
+        yield from compress.iter_lines(packed, offset)
+
+
 def read_events(p: Path) -> list[dict]:
-    path = p if str(p).endswith(".jsonl") else (Path(p) / "events.jsonl")
-    if not path.exists():
-        return []
     out: list[dict] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                out.append(json.loads(line))
-            except Exception:
-                # skip broken lines
-                pass
+    for line in _lines(_events_path(p)):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            out.append(json.loads(line))
+        except Exception:
+            # skip broken lines
+            pass
     return out
 
 
+def read_events_from(p: Path, offset: int = 0) -> tuple[list[dict], int]:
+    """
+    Parse only the events appended after byte `offset`.
+
+    Returns (events, new_offset). A trailing line that is still being written
+    (no newline yet) is left for the next call; if the file shrank below
+    `offset` it is re-read from the start. Compressed (gc'd) logs are read
+    from the same uncompressed offsets.
+    """
+    path = _events_path(p)
+    if path.exists():
+        if offset > path.stat().st_size:
+            offset = 0
+    elif compress.compressed_path(path) is None:
+        return [], 0
+    out: list[dict] = []
+    for raw in _lines(path, offset):
+        if not raw.endswith(b"\n"):
+            break
+        offset += len(raw)
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            out.append(json.loads(line))
+        except Exception:
+            # skip broken lines
+            pass
+    return out, offset
+
+
 def latest_info(run_dir: Path) -> dict:
     info = {
         "result": None,
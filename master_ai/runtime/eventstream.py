@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import re
+import socket
+import socketserver
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+# Set to "host:port" or "unix:/path/to.sock" to have the Agent serve its
+# events while it runs; UIs read the matching URL from MASTER_AI_EVENTS_URL
+# ("http://host:port" or "unix:/path/to.sock").
+ADDR_ENV = "MASTER_AI_EVENTS_ADDR"
+URL_ENV = "MASTER_AI_EVENTS_URL"
+
+HEARTBEAT_S = 15.0
+# How often a subscriber re-checks the file when no in-process publish woke it
+# (events written by another process).
+POLL_S = 0.1
+
+_RUN_ID_RE = re.compile(r"^[\w.-]+$")
+
+
+class EventHub:
+    """
+    In-process wakeup channel between EventBus writers and stream subscribers.
+
+    The events file stays the source of truth (cursors are byte offsets into
+    events.jsonl); the hub only tells waiting subscribers that a run's file
+    grew, so local publishes reach clients without polling delay.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._sizes: dict[str, int] = {}
+        self.subscribers = 0
+
+    def attach(self, delta: int) -> None:
+        with self._cond:
+            self.subscribers += delta
+
+    def publish(self, run_dir: Path, offset: int) -> None:
+        if not self.subscribers:  # nobody listening: keep EventBus.emit cheap
+            return
+        with self._cond:
+            self._sizes[str(Path(run_dir).resolve())] = offset
+            self._cond.notify_all()
+
+    def wait(self, run_dir: Path, offset: int, timeout: float) -> None:
+        """Block until the run's file is known to be past `offset`, or timeout."""
+        key = str(Path(run_dir).resolve())
+        with self._cond:
+            self._cond.wait_for(lambda: self._sizes.get(key, 0) > offset, timeout)
+
+
+HUB = EventHub()
+
+
+def _sse(offset: int, evt: dict) -> bytes:
+    data = json.dumps(evt, ensure_ascii=False)
+    return f"id: {offset}\nevent: {evt.get('kind', 'message')}\ndata: {data}\n\n".encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """GET /runs/<run_id>/events?cursor=<byte offset>  ->  text/event-stream."""
+
+    server_version = "MasterAIEvents/0.1"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a) -> None:  # keep the agent's stdout clean
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        parts = urlsplit(self.path)
+        m = re.fullmatch(r"/runs/([^/]+)/events", parts.path)
+        if not m or not _RUN_ID_RE.match(m.group(1)):
+            self.send_error(404)
+            return
+        root: Path = self.server.runs_root  # type: ignore[attr-defined]
+        run_id = m.group(1)
+        if run_id == "latest":
+            runs = sorted(p.name for p in root.iterdir() if p.is_dir())
+            if not runs:
+                self.send_error(404)
+                return
+            run_id = runs[-1]
+        run_dir = root / run_id
+        if not run_dir.is_dir():
+            self.send_error(404)
+            return
+        q = parse_qs(parts.query)
+        cursor = self.headers.get("Last-Event-ID") or (q.get("cursor") or ["0"])[0]
+        offset = int(cursor) if str(cursor).isdigit() else 0
+        try:
+            heartbeat = min(max(float(q["heartbeat"][0]), 0.2), HEARTBEAT_S)
+        except (KeyError, ValueError):
+            heartbeat = HEARTBEAT_S
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Run-Id", run_id)
+        self.end_headers()
+        self.close_connection = True
+        self._stream(run_dir, offset, heartbeat)
+
+    def _stream(self, run_dir: Path, offset: int, heartbeat: float) -> None:
+        ev_path = run_dir / "events.jsonl"
+        last_beat = time.monotonic()
+        HUB.attach(1)
+        try:
+            while True:
+                size = ev_path.stat().st_size if ev_path.exists() else 0
+                if size > offset:
+                    with open(ev_path, "rb") as f:
+                        f.seek(offset)
+                        chunk = f.read(size - offset)
+                    # Send complete lines only; the cursor is the byte offset after each.
+                    for raw in chunk.splitlines(keepends=True):
+                        if not raw.endswith(b"\n"):
+                            break
+                        offset += len(raw)
+                        try:
+                            evt = json.loads(raw)
+                        except ValueError:
+                            continue
+                        self.wfile.write(_sse(offset, evt))
+                    self.wfile.flush()
+                    last_beat = time.monotonic()
+                elif size < offset:
+                    offset = 0  # file replaced/truncated
+                    continue
+                if time.monotonic() - last_beat > heartbeat:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    last_beat = time.monotonic()
+                HUB.wait(run_dir, offset, POLL_S)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            HUB.attach(-1)
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):  # BaseHTTPRequestHandler expects a (host, port)-ish address
+        sock, _ = super().get_request()
+        return sock, ("unix", 0)
+
+
+def start_event_server(runs_root: Path | str, addr: str = "127.0.0.1:0") -> socketserver.BaseServer:
+    """
+    Serve run events as server-sent events on `addr` ("host:port" or
+    "unix:/path.sock") from a daemon thread. Returns the server; for TCP the
+    bound port is `server.server_address[1]`.
+    """
+    server: socketserver.BaseServer
+    if addr.startswith("unix:"):
+        path = addr[len("unix:") :]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = _UnixServer(path, _Handler)
+    else:
+        host, _, port = addr.rpartition(":")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port or 0)), _Handler)
+        server.daemon_threads = True
+    server.runs_root = Path(runs_root)  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, name="event-server", daemon=True).start()
+    return server
+
+
+_server: socketserver.BaseServer | None = None
+_server_lock = threading.Lock()
+
+
+def ensure_server_from_env(runs_root: Path | str) -> socketserver.BaseServer | None:
+    """Start (once per process) the event server configured by MASTER_AI_EVENTS_ADDR."""
+    global _server
+    addr = os.environ.get(ADDR_ENV)
+    if not addr:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = start_event_server(runs_root, addr)
+        return _server
+
+
+# ---- client -----------------------------------------------------------------
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float | None = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+def _connect(base_url: str, timeout: float | None) -> http.client.HTTPConnection:
+    if base_url.startswith("unix:"):
+        return _UnixHTTPConnection(base_url[len("unix:") :], timeout=timeout)
+    u = urlsplit(base_url)
+    return http.client.HTTPConnection(u.hostname or "127.0.0.1", u.port or 80, timeout=timeout)
+
+
+def _sse_events(
+    lines: Iterable[bytes], on_idle: Callable[[], None] | None
+) -> Iterator[tuple[int | None, dict]]:
+    """(last id seen, event) per SSE message; comment lines (heartbeats) call on_idle."""
+    ev_id: int | None = None
+    data: list[str] = []
+    for raw in lines:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if line.startswith("id:"):
+            ev_id = int(line[3:].strip())
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+        elif line.startswith(":") and on_idle is not None:
+            on_idle()
+        elif not line and data:
+            yield ev_id, json.loads("\n".join(data))
+            data = []
+
+
+def subscribe(
+    base_url: str,
+    run_id: str,
+    cursor: int = 0,
+    *,
+    timeout: float | None = 30.0,
+    reconnect: bool = True,
+    on_idle: Callable[[], None] | None = None,
+    heartbeat: float | None = None,
+) -> Iterator[tuple[int, dict]]:
+    """
+    Yield (offset, event) for a run, starting after byte `cursor` of its
+    events.jsonl and then live as events are written. Reconnects from the
+    last seen offset (Last-Event-ID) if the stream drops. `timeout` bounds
+    the wait for any data, heartbeats included.
+
+    `on_idle` is called on every server heartbeat (every `heartbeat`
+    seconds while no events arrive); Streamlit callers use it to give the
+    script runner a chance to stop a blocked loop on rerun.
+    """
+    query = f"&heartbeat={heartbeat}" if heartbeat else ""
+    while True:
+        conn = _connect(base_url, timeout)
+        try:
+            conn.request(
+                "GET",
+                f"/runs/{run_id}/events?cursor={cursor}{query}",
+                headers={"Accept": "text/event-stream", "Last-Event-ID": str(cursor)},
+            )
+            resp = conn.getresponse()
+            if resp.status != 200:
+                raise RuntimeError(f"event stream: HTTP {resp.status} for run {run_id}")
+            for ev_id, evt in _sse_events(resp, on_idle):
+                if ev_id is not None:
+                    cursor = ev_id
+                yield cursor, evt
+        except (ConnectionError, http.client.HTTPException, OSError):
+            if not reconnect:
+                raise
+            time.sleep(0.5)
+        finally:
+            conn.close()
+        if not reconnect:
+            return
+
+
+def events_url() -> str | None:
+    """The event stream URL configured for UIs (MASTER_AI_EVENTS_URL), if any."""
+    return os.environ.get(URL_ENV) or None
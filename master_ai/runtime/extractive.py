@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import heapq
+import re
+import zlib
+from collections.abc import Iterable
+from typing import Any
+
+# Optional dependency: only the extractive mode needs NumPy.
+try:
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+_SENT_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9_'-]*")
+_STOP = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its of on or our"
+    " she so that the their them there they this to was we were which will with you your".split()
+)
+
+# Hashed feature space: global document statistics stay O(N_FEATURES) no
+# matter how large the input is.
+N_FEATURES = 1 << 18
+# Sentences scored per block; bounds per-block working memory.
+BLOCK_SENTENCES = 4096
+# Shorter sentences are only used when too few longer ones exist.
+MIN_WORDS = 3
+# Candidates kept per wanted sentence for the final rescoring.
+POOL_FACTOR = 4
+MAX_SENTENCE_CHARS = 400
+
+
+def split_sentences(lines: Iterable[str]) -> Iterable[str]:
+    """Split cleaned lines into sentences (a line end always ends a sentence)."""
+    for line in lines:
+        for s in _SENT_RE.split(line):
+            s = s.strip()
+            if s:
+                yield s[:MAX_SENTENCE_CHARS]
+
+
+class _Block:
+    """Sparse term matrix (COO, hashed columns) for one block of sentences."""
+
+    def __init__(self) -> None:
+        self.sentences: list[str] = []
+        self.positions: list[int] = []
+        self.rows: list[int] = []
+        self.cols: list[int] = []
+        self._ids: dict[str, int] = {}
+
+    def add(self, sentence: str, pos: int) -> bool:
+        """False (nothing added) for a sentence of fewer than MIN_WORDS words."""
+        words = [w for w in _WORD_RE.findall(sentence.lower()) if w not in _STOP]
+        if len(words) < MIN_WORDS:
+            return False
+        r = len(self.sentences)
+        self.sentences.append(sentence)
+        self.positions.append(pos)
+        ids = self._ids
+        for w in words:
+            h = ids.get(w)
+            if h is None:
+                h = ids[w] = zlib.crc32(w.encode("utf-8")) & (N_FEATURES - 1)
+            self.rows.append(r)
+            self.cols.append(h)
+        return True
+
+
+class ExtractiveSummarizer:
+    """
+    Streaming TF-IDF centrality ranking.
+
+    Sentences are processed in blocks: each block becomes a sparse
+    sentence x term matrix (hashed columns), weighted with log-TF * IDF from
+    the document-frequency counts seen so far, L2-normalized, and scored by
+    cosine similarity to the running document centroid. Only the current
+    block, the global df/centroid vectors and a pool of POOL_FACTOR * k
+    candidates are kept.
+
+    Early blocks are scored against partial statistics, so the pool is
+    rescored with the final idf and centroid before the top k are picked.
+    The centroid itself still sums weights taken with the idf of its time,
+    and a sentence that left the pool is not reconsidered; on long inputs
+    the result approximates a two-pass ranking. Sentences under MIN_WORDS
+    words fill in, in document order, when fewer than k others exist.
+    """
+
+    def __init__(self, k: int = 5, block_sentences: int = BLOCK_SENTENCES) -> None:
+        if np is None:
+            raise RuntimeError("extractive summarization requires numpy (pip install numpy)")
+        self.k = k
+        self.block_sentences = block_sentences
+        self.df = np.zeros(N_FEATURES, dtype=np.float64)
+        self.centroid = np.zeros(N_FEATURES, dtype=np.float64)
+        self.n_sentences = 0
+        self._pos = 0
+        # (running score, position, sentence, term columns, term counts)
+        self._heap: list[tuple[float, int, str, Any, Any]] = []
+        self._short: list[tuple[int, str]] = []  # the first k under MIN_WORDS
+        self._block = _Block()
+
+    def feed(self, sentences: Iterable[str]) -> None:
+        for s in sentences:
+            if not self._block.add(s, self._pos) and len(self._short) < self.k:
+                self._short.append((self._pos, s))
+            self._pos += 1
+            if len(self._block.sentences) >= self.block_sentences:
+                self._score_block()
+
+    def result(self) -> list[str]:
+        """Top-k sentences in document order."""
+        if self._block.sentences:
+            self._score_block()
+        c_norm = np.linalg.norm(self.centroid) or 1.0
+        rescored = []
+        for _, pos, sentence, cols, tf in self._heap:
+            w = self._weights(cols, tf)
+            rescored.append((float(w @ self.centroid[cols]) / c_norm, pos, sentence))
+        best = heapq.nlargest(self.k, rescored)
+        picked = [(pos, s) for _, pos, s in best] + self._short[: self.k - len(best)]
+        return [s for _, s in sorted(picked)]
+
+    def _weights(self, cols, tf):
+        """Unit-length log-TF * IDF weights of one sentence's terms."""
+        idf = np.log((1.0 + self.n_sentences) / (1.0 + self.df[cols])) + 1.0
+        w = (1.0 + np.log(tf)) * idf
+        return w / (np.linalg.norm(w) or 1.0)
+
+    def _score_block(self) -> None:
+        b, self._block = self._block, _Block()
+        n = len(b.sentences)
+        rows = np.asarray(b.rows, dtype=np.int64)
+        cols = np.asarray(b.cols, dtype=np.int64)
+        # Collapse duplicate (sentence, term) pairs into term counts.
+        keys, tf = np.unique(rows * N_FEATURES + cols, return_counts=True)
+        rows, cols = keys // N_FEATURES, keys % N_FEATURES
+
+        self.df += np.bincount(cols, minlength=N_FEATURES)
+        self.n_sentences += n
+        idf = np.log((1.0 + self.n_sentences) / (1.0 + self.df[cols])) + 1.0
+        w = (1.0 + np.log(tf)) * idf
+        norms = np.sqrt(np.bincount(rows, weights=w * w, minlength=n))
+        w /= norms[rows]
+
+        self.centroid += np.bincount(cols, weights=w, minlength=N_FEATURES)
+        c_norm = np.linalg.norm(self.centroid) or 1.0
+        scores = np.bincount(rows, weights=w * self.centroid[cols], minlength=n) / c_norm
+
+        # Only this block's best candidates can enter the pool.
+        pool = POOL_FACTOR * self.k
+        starts = np.searchsorted(rows, np.arange(n + 1))
+        for i in np.argsort(scores)[::-1][:pool].tolist():
+            span = slice(starts[i], starts[i + 1])
+            item = (float(scores[i]), b.positions[i], b.sentences[i], cols[span], tf[span])
+            if len(self._heap) < pool:
+                heapq.heappush(self._heap, item)
+            elif item[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+
+def summarize_lines(
+    lines: Iterable[str], k: int = 5, block_sentences: int = BLOCK_SENTENCES
+) -> str:
+    """Return the `k` most central sentences of `lines`, in document order."""
+    es = ExtractiveSummarizer(k, block_sentences)
+    es.feed(split_sentences(lines))
+    return "\n".join(es.result())
@@ -3,6 +3,8 @@ from __future__ import annotations
 from collections.abc import Iterable
 from pathlib import Path
 
+from .trace import traced
+
 # Optional event logging shim (no-op if not available)
 try:
     from .events import log as _emit  # type: ignore
@@ -17,6 +19,7 @@ def _resolve(cwd: Path | str, p: Path | str) -> Path:
     return (base / p).resolve() if not str(p).startswith("/") else Path(p)
 
 
+@traced("fileops.write_file")
 def write_file(path: Path | str, content: str, *, cwd: Path | str) -> Path:
     """Create/overwrite file with content (mkdir parents)."""
     dst = _resolve(cwd, path)
@@ -26,6 +29,7 @@ def write_file(path: Path | str, content: str, *, cwd: Path | str) -> Path:
     return dst
 
 
+@traced("fileops.patch_file")
 def patch_file(path: Path | str, before: str, after: str, *, cwd: Path | str) -> bool:
     """Simple string replace of first occurrence. Returns True if changed."""
     dst = _resolve(cwd, path)
@@ -73,6 +77,7 @@ def _delete_line_with(text: str, anchor: str) -> str:
     return "".join(keep)
 
 
+@traced("fileops.apply_structured_edits")
 def apply_structured_edits(edits: Iterable[dict], *, cwd: Path | str) -> None:
     """
     Apply a list of edit dicts. Each edit:
@@ -106,6 +111,7 @@ def apply_structured_edits(edits: Iterable[dict], *, cwd: Path | str) -> None:
         _emit("log", {"step": 1, "line": f"edit: {dst} op={op}"})
 
 
+@traced("fileops.scaffold_layout")
 def scaffold_layout(paths: Iterable[str | Path], *, cwd: Path | str) -> None:
     """Create empty files/dirs as per given relative paths."""
     for rel in paths:
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import email.utils
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+# Where cached bodies live (relative to the working directory, like RUNS_ROOT).
+DEFAULT_DIR = Path(os.environ.get("MASTER_AI_HTTP_CACHE_DIR", "artifacts/cache/http"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Bodies larger than this are passed through without being cached.
+MAX_ENTRY_BYTES = 32 * 1024 * 1024
+# Upper bound for heuristic freshness (no explicit max-age / Expires).
+HEURISTIC_MAX_AGE = 24 * 3600
+
+
+@dataclass
+class CachedBody:
+    """
+    A response body on disk.
+
+    status is "fresh" (served without network), "revalidated" (304),
+    "miss" (fetched and stored) or "uncached" (fetched but not storable; the
+    caller owns `path` and should move or delete it).
+    """
+
+    path: Path
+    headers: dict[str, str]
+    status: str
+
+
+def _key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _cache_control(headers: dict[str, str]) -> dict[str, str | None]:
+    out: dict[str, str | None] = {}
+    for part in headers.get("cache-control", "").split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        k, _, v = part.partition("=")
+        out[k.strip()] = v.strip().strip('"') or None
+    return out
+
+
+def _http_date(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except Exception:
+        return None
+
+
+def freshness_lifetime(headers: dict[str, str], now: float | None = None) -> float:
+    """Seconds a response stays fresh (RFC 9111 section 4.2, minus s-maxage)."""
+    cc = _cache_control(headers)
+    if "no-cache" in cc or "no-store" in cc:
+        return 0.0
+    age_s = headers.get("age", "")
+    age = float(age_s) if age_s.isdigit() else 0.0
+    if cc.get("max-age") and str(cc["max-age"]).isdigit():
+        return max(0.0, int(cc["max-age"]) - age)
+    now = time.time() if now is None else now
+    date = _http_date(headers.get("date")) or now
+    expires = _http_date(headers.get("expires"))
+    if expires is not None:
+        return max(0.0, expires - date - age)
+    last_mod = _http_date(headers.get("last-modified"))
+    if last_mod is not None:
+        return min(HEURISTIC_MAX_AGE, max(0.0, (date - last_mod) * 0.1))
+    return 0.0
+
+
+class _SingleFlight:
+    """Collapse concurrent calls for the same key onto one in-flight call."""
+
+    class _Call:
+        def __init__(self) -> None:
+            self.done = threading.Event()
+            self.result: Any = None
+            self.error: BaseException | None = None
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, _SingleFlight._Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        """Return (result, shared): shared is True for callers that waited on a leader."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+        assert call is not None
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class HttpCache:
+    """
+    Size-bounded on-disk HTTP cache.
+
+    Bodies are files under `root/<kk>/<key>`; metadata (validators, expiry,
+    last access) lives in `root/index.sqlite3` so several processes can share
+    one cache. Entries are evicted least-recently-used once the total body
+    size exceeds `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        root: Path | str = DEFAULT_DIR,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entry_bytes: int = MAX_ENTRY_BYTES,
+    ) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._local = threading.local()
+        self._flight = _SingleFlight()
+        self._db().execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                expires REAL NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+
+    # ---- storage helpers ----------------------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.root / "index.sqlite3", timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            self._local.con = con
+        return con
+
+    def _body_path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def lookup(self, url: str) -> tuple[dict[str, str], float] | None:
+        """(headers, expires_at) for a cached URL whose body is present, else None."""
+        key = _key(url)
+        db = self._db()
+        row = db.execute("SELECT headers, expires FROM entries WHERE key=?", (key,)).fetchone()
+        if row is None or not self._body_path(key).exists():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def is_fresh(self, url: str) -> bool:
+        hit = self.lookup(url)
+        return hit is not None and time.time() < hit[1]
+
+    def invalidate(self, url: str) -> None:
+        key = _key(url)
+        self._db().execute("DELETE FROM entries WHERE key=?", (key,))
+        self._body_path(key).unlink(missing_ok=True)
+
+    def _touch(self, key: str) -> None:
+        self._db().execute("UPDATE entries SET accessed=? WHERE key=?", (time.time(), key))
+
+    def _evict(self) -> None:
+        db = self._db()
+        (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if total <= target:
+                break
+            db.execute("DELETE FROM entries WHERE key=?", (key,))
+            self._body_path(key).unlink(missing_ok=True)
+            total -= size
+
+    # ---- fetching -------------------------------------------------------------
+
+    def fetch(self, url: str, get: Callable[[dict[str, str]], Any]) -> CachedBody:
+        """
+        Return the body for `url`, from disk when fresh, otherwise via
+        `get(extra_headers)` (a streaming requests-style GET) with conditional
+        validators when a stale copy exists. Concurrent fetches of the same URL
+        in this process share one network request.
+        """
+        body, shared = self._flight.do(_key(url), lambda: self._fetch(url, get))
+        if shared and body.status == "uncached":
+            # The leader owns its temp file; fetch our own copy.
+            return self._fetch(url, get)
+        return body
+
+    def _fetch(self, url: str, get: Callable[[dict[str, str]], Any]) -> CachedBody:
+        key = _key(url)
+        path = self._body_path(key)
+        hit = self.lookup(url)
+        cond: dict[str, str] = {}
+        if hit is not None:
+            headers, expires = hit
+            if time.time() < expires:
+                self._touch(key)
+                return CachedBody(path, headers, "fresh")
+            if headers.get("etag"):
+                cond["If-None-Match"] = headers["etag"]
+            if headers.get("last-modified"):
+                cond["If-Modified-Since"] = headers["last-modified"]
+
+        with get(cond) as r:
+            if r.status_code == 304 and hit is not None:
+                headers = {**hit[0], **{k.lower(): v for k, v in r.headers.items()}}
+                now = time.time()
+                self._db().execute(
+                    "UPDATE entries SET headers=?, expires=?, accessed=? WHERE key=?",
+                    (json.dumps(headers), now + freshness_lifetime(headers, now), now, key),
+                )
+                return CachedBody(path, headers, "revalidated")
+            r.raise_for_status()
+            headers = {k.lower(): v for k, v in r.headers.items()}
+            tmp_dir = self.root / "tmp"
+            tmp_dir.mkdir(exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in r.iter_content(65536):
+                    if chunk:
+                        f.write(chunk)
+                        size += len(chunk)
+            tmp = Path(tmp_name)
+
+        storable = (
+            r.status_code == 200
+            and "no-store" not in _cache_control(headers)
+            and size <= self.max_entry_bytes
+        )
+        if not storable:
+            return CachedBody(tmp, headers, "uncached")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, path)
+        now = time.time()
+        self._db().execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (key, url, json.dumps(headers), now + freshness_lifetime(headers, now), size, now),
+        )
+        self._evict()
+        return CachedBody(path, headers, "miss")
+
+
+_default: HttpCache | None = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> HttpCache | None:
+    """Process-wide cache; None when disabled via MASTER_AI_HTTP_CACHE=0."""
+    global _default
+    if os.environ.get("MASTER_AI_HTTP_CACHE", "1").lower() in {"0", "off", "false", "no"}:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = HttpCache()
+        return _default
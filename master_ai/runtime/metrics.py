@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import bisect
+import math
+import os
+import threading
+from collections.abc import Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Set to "host:port" to have the Agent serve /metrics while it runs, and/or to
+# a file path to have it write a textfile (node_exporter textfile collector)
+# when a run finishes.
+ADDR_ENV = "MASTER_AI_METRICS_ADDR"
+TEXTFILE_ENV = "MASTER_AI_METRICS_TEXTFILE"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Child:
+    """One labelled series. Every update takes only this series' own lock."""
+
+    __slots__ = ("_lock", "value")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)  # a single store needs no lock
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> tuple[list[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: dict[tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        return _Child()
+
+    def labels(self, *values: str, **kw: str):
+        """The series for these label values (created on first use)."""
+        key = values or tuple(kw[n] for n in self.labelnames)
+        child = self._children.get(key)  # lock-free fast path
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+            norm = tuple(str(v) for v in key)
+            with self._lock:
+                child = self._children.setdefault(norm, self._new_child())
+                self._children[key] = child  # alias, e.g. (200,) -> ("200",)
+        return child
+
+    def _series(self) -> list[tuple[tuple[str, ...], object]]:
+        with self._lock:
+            seen: set[int] = set()
+            out = []
+            for key, child in sorted(self._children.items(), key=lambda kv: tuple(map(str, kv[0]))):
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    out.append((tuple(map(str, key)), child))
+            return out
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in self._series():
+            out.append(f"{self.name}{_label_str(self.labelnames, key)} {_fmt(child.value)}")
+        return out
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._children[()].dec(amount)
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, doc, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in self._series():
+            counts, total, n = child.snapshot()
+            acc = 0
+            for bound, c in zip((*self.bounds, math.inf), counts, strict=True):
+                acc += c
+                le = _label_str(self.labelnames, key, f'le="{_fmt(bound)}"')
+                out.append(f"{self.name}_bucket{le} {acc}")
+            labels = _label_str(self.labelnames, key)
+            out.append(f"{self.name}_sum{labels} {_fmt(total)}")
+            out.append(f"{self.name}_count{labels} {n}")
+        return out
+
+
+class Registry:
+    """Process-wide set of metrics, rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+
+    def _get(self, cls, name: str, doc: str, labelnames: Sequence[str], **kw) -> _Metric:
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, doc, labelnames, **kw)
+            elif not isinstance(m, cls) or m.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered differently")
+            return m
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, doc: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY._get(Counter, name, doc, labelnames)  # type: ignore[return-value]
+
+
+def gauge(name: str, doc: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY._get(Gauge, name, doc, labelnames)  # type: ignore[return-value]
+
+
+def histogram(
+    name: str, doc: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    h = REGISTRY._get(Histogram, name, doc, labelnames, buckets=buckets)
+    return h  # type: ignore[return-value]
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ---- exporters ----------------------------------------------------------------
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *_a) -> None:
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_http_server(addr: str = "127.0.0.1:9464") -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread."""
+    host, _, port = addr.rpartition(":")
+    server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def write_textfile(path: Path | str) -> None:
+    """Atomically write the current metrics for a textfile collector."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(render())
+    os.replace(tmp, path)
+
+
+_server: ThreadingHTTPServer | None = None
+_server_lock = threading.Lock()
+
+
+def ensure_server_from_env() -> ThreadingHTTPServer | None:
+    """Start (once per process) the /metrics endpoint configured by MASTER_AI_METRICS_ADDR."""
+    global _server
+    addr = os.environ.get(ADDR_ENV)
+    if not addr:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = start_http_server(addr)
+        return _server
+
+
+def write_textfile_from_env() -> None:
+    path = os.environ.get(TEXTFILE_ENV)
+    if path:
+        write_textfile(path)
@@ -1,10 +1,25 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+import os
+import shutil
+import threading
 import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
 
 import requests
 
+from . import metrics
+from .httpcache import CachedBody, HttpCache, default_cache
+from .trace import traced
+
 # Optional event logging: fall back to a no-op if unavailable.
 try:
     from .events import log as _emit  # type: ignore
@@ -16,29 +31,377 @@ except Exception:  # pragma: no cover
 
 UA = "MasterAI/0.1 (+https://example.invalid)"
 
+FETCHES = metrics.counter("master_ai_fetch_total", "fetch_file calls by outcome", ["outcome"])
+FETCH_RETRIES = metrics.counter("master_ai_fetch_retries_total", "fetch_file re-attempts")
+FETCH_SECONDS = metrics.histogram("master_ai_fetch_seconds", "fetch_file wall time")
+FETCH_BYTES = metrics.counter("master_ai_fetch_bytes_total", "Bytes saved by fetch_file")
+HTTP_CACHE = metrics.counter(
+    "master_ai_http_cache_total", "HTTP cache lookups by status", ["status"]
+)
+
+# One keep-alive session per worker thread (requests.Session is not thread-safe).
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = requests.Session()
+        s.headers["User-Agent"] = UA
+        _local.session = s
+    return s
+
 
 def _get(url: str, *, stream: bool = False, timeout: int = 30) -> requests.Response:
-    return requests.get(url, headers={"User-Agent": UA}, stream=stream, timeout=timeout)
+    return _session().get(url, stream=stream, timeout=timeout)
+
+
+def _cache_for(cache: bool | None) -> HttpCache | None:
+    """cache=None follows MASTER_AI_HTTP_CACHE (on by default); False bypasses it."""
+    return None if cache is False else default_cache()
+
+
+@traced("net._cached_get")
+def _cached_get(
+    c: HttpCache, url: str, timeout: int, response: requests.Response | None = None
+) -> CachedBody:
+    """`response`: an open unconditional GET to use instead of a new request."""
+
+    def get(h: dict[str, str]) -> requests.Response:
+        if response is not None and not h:
+            return response
+        return _session().get(url, stream=True, timeout=timeout, headers=h)
+
+    body = c.fetch(url, get)
+    HTTP_CACHE.labels(body.status).inc()
+    return body
+
+
+def _materialize(
+    c: HttpCache, body: CachedBody, url: str, dest: Path, size: int | None, sha256: str | None
+) -> None:
+    """Copy a cached body to dest via dest.part (verified, atomic rename)."""
+    part = _part_path(dest)
+    try:
+        if body.status == "uncached":
+            shutil.move(body.path, part)  # copies when the cache is on another filesystem
+        else:
+            shutil.copyfile(body.path, part)  # never hardlink: dest may be edited in place
+    except OSError:
+        part.unlink(missing_ok=True)
+        raise
+    finally:
+        if body.status == "uncached":
+            body.path.unlink(missing_ok=True)
+    try:
+        _verify(part, size, sha256, None)
+    except ValueError:
+        part.unlink(missing_ok=True)
+        c.invalidate(url)
+        raise
+    os.replace(part, dest)
+
+
+def _part_path(dest: Path, suffix: str = ".part") -> Path:
+    return dest.with_name(dest.name + suffix)
+
+
+def _hash_file(path: Path, h=None):
+    h = h or hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h
+
+
+def _resume_get(
+    url: str,
+    path: Path,
+    *,
+    timeout: int,
+    first: int = 0,
+    last: int | None = None,
+    digest: bool = False,
+    on_bytes: Callable[[int], None] | None = None,
+    response: requests.Response | None = None,
+) -> tuple[int, Any]:
+    """
+    Append bytes [first + len(path) .. last] of `url` to `path`, resuming a
+    previous partial attempt via an HTTP Range request.
+
+    Falls back to a full restart when the server ignores Range for a whole-file
+    download. With `digest=True` the sha256 of the file is computed in the same
+    pass (the already-present prefix is hashed from disk first). `response`
+    is an open plain GET to read from when no Range is needed.
+    Returns (size_of_path, sha256_or_None).
+    """
+    have = path.stat().st_size if path.exists() else 0
+    if last is not None and first + have > last:
+        _close(response)
+        return have, None  # segment already complete
+    ranged = bool(have or first or last is not None)
+    headers = {"Range": f"bytes={first + have}-{'' if last is None else last}"} if ranged else {}
+    if ranged or response is None:
+        _close(response)
+        response = _session().get(url, stream=True, timeout=timeout, headers=headers)
+
+    with response as r:
+        if r.status_code == 416 and have:
+            # Nothing left to send, if the partial file is the whole of it.
+            _check_complete(r, url, path, first + have, whole=last is None)
+            return have, (_hash_file(path) if digest else None)
+        r.raise_for_status()
+        if ranged and r.status_code != 206:
+            if first or last is not None:
+                raise RuntimeError(f"server ignored Range request for {url}")
+            have = 0  # whole-file restart
+        return _append(r, path, have, digest, on_bytes)
+
+
+def _close(response: requests.Response | None) -> None:
+    if response is not None:
+        response.close()
+
+
+def _check_complete(r: requests.Response, url: str, path: Path, end: int, whole: bool) -> None:
+    """After a 416: the partial file must match Content-Range's total, else it goes."""
+    total = r.headers.get("Content-Range", "").rpartition("/")[2]
+    if not (whole and total.isdigit() and end == int(total)):
+        path.unlink(missing_ok=True)  # stale or overlong: the retry starts clean
+        raise RuntimeError(f"range not satisfiable for {url} at {end} bytes")
+
+
+def _append(
+    r: requests.Response,
+    path: Path,
+    have: int,
+    digest: bool,
+    on_bytes: Callable[[int], None] | None,
+) -> tuple[int, Any]:
+    h = (_hash_file(path) if have else hashlib.sha256()) if digest else None
+    with path.open("ab" if have else "wb") as f:
+        for chunk in r.iter_content(65536):
+            if chunk:
+                f.write(chunk)
+                have += len(chunk)
+                if h is not None:
+                    h.update(chunk)
+                if on_bytes:
+                    on_bytes(len(chunk))
+    return have, h
+
+
+def _verify(path: Path, size: int | None, sha256: str | None, h) -> None:
+    if size is not None and path.stat().st_size != size:
+        raise ValueError(f"size mismatch: expected {size}, got {path.stat().st_size}")
+    if sha256:
+        got = (h or _hash_file(path)).hexdigest()
+        if got.lower() != sha256.lower():
+            raise ValueError(f"sha256 mismatch: expected {sha256}, got {got}")
+
+
+@traced("net._download")
+def _download(
+    url: str,
+    dest: Path,
+    *,
+    timeout: int,
+    on_bytes: Callable[[int], None] | None = None,
+    size: int | None = None,
+    sha256: str | None = None,
+    response: requests.Response | None = None,
+) -> int:
+    """
+    One resumable single-stream attempt into `dest.part`, verified and then
+    atomically renamed onto `dest`. Returns the final file size.
+    """
+    part = _part_path(dest)
+    n, h = _resume_get(
+        url, part, timeout=timeout, digest=bool(sha256), on_bytes=on_bytes, response=response
+    )
+    try:
+        _verify(part, size, sha256, h)
+    except ValueError:
+        part.unlink(missing_ok=True)  # corrupt: next attempt starts clean
+        raise
+    os.replace(part, dest)
+    return n
+
+
+@traced("net._open")
+def _open(url: str, timeout: int) -> requests.Response | None:
+    """The first plain GET, opened for its headers; None if it failed outright."""
+    try:
+        return _session().get(url, stream=True, timeout=timeout)
+    except Exception:  # noqa: BLE001 - the download attempts retry and report it
+        return None
+
+
+def _length_and_ranges(r: requests.Response | None) -> tuple[int | None, bool]:
+    """(content_length_or_None, supports_byte_ranges) from a 200 response."""
+    if r is None or r.status_code != 200:
+        return None, False
+    length = r.headers.get("Content-Length")
+    size = int(length) if length and length.isdigit() else None
+    return size, r.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+
+@traced("net._download_segmented")
+def _download_segmented(
+    url: str,
+    dest: Path,
+    total: int,
+    segments: int,
+    *,
+    timeout: int,
+    sha256: str | None = None,
+) -> int:
+    """
+    Fetch `total` bytes as `segments` parallel ranged requests into
+    `dest.partN` files (each resumable on its own), then stitch them into
+    `dest.part` while hashing, verify and rename onto `dest`.
+    """
+    step = -(-total // segments)
+    bounds = [(a, min(a + step, total) - 1) for a in range(0, total, step)]
+    seg_paths = [_part_path(dest, f".part{i}") for i in range(len(bounds))]
+
+    def _seg(i: int) -> None:
+        first, last = bounds[i]
+        n, _ = _resume_get(url, seg_paths[i], timeout=timeout, first=first, last=last)
+        if n != last - first + 1:
+            raise RuntimeError(f"short segment {i}: {n}/{last - first + 1} bytes")
+
+    with ThreadPoolExecutor(max_workers=len(bounds), thread_name_prefix="segment") as pool:
+        for fut in [pool.submit(_seg, i) for i in range(len(bounds))]:
+            fut.result()
+
+    part = _part_path(dest)
+    h = hashlib.sha256() if sha256 else None
+    with part.open("wb") as out:
+        for sp in seg_paths:
+            with sp.open("rb") as f:
+                for chunk in iter(lambda f=f: f.read(1 << 20), b""):
+                    out.write(chunk)
+                    if h is not None:
+                        h.update(chunk)
+    for sp in seg_paths:
+        sp.unlink(missing_ok=True)
+    try:
+        _verify(part, total, sha256, h)
+    except ValueError:
+        part.unlink(missing_ok=True)
+        raise
+    os.replace(part, dest)
+    return total
+
+
+# Files at least this big are split into parallel ranged segments.
+SEGMENT_THRESHOLD = 32 * 1024 * 1024
+MIN_SEGMENT = 8 * 1024 * 1024
 
 
+@traced("net.fetch_file")
 def fetch_file(
-    url: str, dest: Path, retries: int = 3, backoff: float = 0.6, timeout: int = 30
+    url: str,
+    dest: Path,
+    retries: int = 3,
+    backoff: float = 0.6,
+    timeout: int = 30,
+    *,
+    sha256: str | None = None,
+    size: int | None = None,
+    segments: int = 4,
+    cache: bool | None = None,
 ) -> Path:
-    """Download URL to dest with simple retry + backoff."""
-    dest = Path(dest)
+    """
+    Download URL to dest with retry + backoff.
+
+    Data lands in `dest.part` and retries resume it with HTTP Range instead of
+    starting over; `dest` only appears (atomic rename) once the download is
+    complete and, if `size` / `sha256` are given, verified. Large files on
+    servers that accept byte ranges are fetched as up to `segments` parallel
+    ranged requests.
+
+    Bodies up to the HTTP cache's entry limit go through runtime.httpcache:
+    fresh copies are served without touching the network and stale ones are
+    revalidated with a conditional request. Pass cache=False to bypass it.
+    """
+    t0 = time.perf_counter()
+    try:
+        dest, outcome = _fetch_file(
+            url, Path(dest), retries, backoff, timeout, sha256, size, segments, cache
+        )
+    except Exception:
+        FETCHES.labels("error").inc()
+        raise
+    finally:
+        FETCH_SECONDS.observe(time.perf_counter() - t0)
+    FETCHES.labels(outcome).inc()
+    FETCH_BYTES.inc(dest.stat().st_size)
+    return dest
+
+
+def _fetch_file(
+    url: str,
+    dest: Path,
+    retries: int,
+    backoff: float,
+    timeout: int,
+    sha256: str | None,
+    size: int | None,
+    segments: int,
+    cache: bool | None,
+) -> tuple[Path, str]:
     dest.parent.mkdir(parents=True, exist_ok=True)
+    c = _cache_for(cache)
+    if c is not None and c.lookup(url) is not None:
+        if _via_cache(c, url, dest, size, sha256, timeout):
+            return dest, "cache"
+    # The first GET doubles as the probe: its headers give the size and whether
+    # ranged segments would work. A partial dest.part resumes with Range instead.
+    first = None if _part_path(dest).exists() else _open(url, timeout)
+    total, ranges = _length_and_ranges(first)
+    if c is not None and first is not None and total is not None and total <= c.max_entry_bytes:
+        first, response = None, first
+        if _via_cache(c, url, dest, size, sha256, timeout, response):
+            return dest, "cache"
+    if size is not None and total is not None and total != size:
+        _close(first)
+        raise RuntimeError(f"failed to fetch {url}: server reports {total} bytes, expected {size}")
+    n_seg = min(segments, (total or 0) // MIN_SEGMENT)
+    if ranges and total is not None and total >= SEGMENT_THRESHOLD and n_seg > 1:
+        _close(first)
+        fetch = functools.partial(
+            _download_segmented, url, dest, total, n_seg, timeout=timeout, sha256=sha256
+        )
+    else:
+        fetch = functools.partial(_download, url, dest, timeout=timeout, size=size, sha256=sha256)
+        if first is not None:  # the first attempt reads the probe's body
+            fetch = _once_with(fetch, first)
+    _attempts(url, dest, fetch, retries, backoff)
+    return dest, "ok"
+
+
+def _once_with(fetch: Callable[..., int], response: requests.Response) -> Callable[[], int]:
+    """`fetch`, passed `response` on its first call only."""
+    pending = [response]
+
+    def call() -> int:
+        return fetch(response=pending.pop()) if pending else fetch()
+
+    return call
+
+
+def _attempts(url: str, dest: Path, fetch: Callable[[], int], retries: int, backoff: float) -> None:
     last_err: Exception | None = None
     for i in range(1, retries + 1):
+        if i > 1:
+            FETCH_RETRIES.inc()
         try:
             _emit("log", {"step": 1, "line": f"download try {i}/{retries}: {url}"})
-            with _get(url, stream=True, timeout=timeout) as r:
-                r.raise_for_status()
-                with dest.open("wb") as f:
-                    for chunk in r.iter_content(8192):
-                        if chunk:
-                            f.write(chunk)
+            fetch()
             _emit("log", {"step": 1, "line": f"saved -> {dest}"})
-            return dest
+            return
         except Exception as e:  # noqa: BLE001
             last_err = e
             _emit("log", {"step": 1, "line": f"download error: {e}"})
@@ -47,7 +410,222 @@ def fetch_file(
     raise RuntimeError(f"failed to fetch {url}: {last_err}")
 
 
-def fetch_text(url: str, timeout: int = 30) -> str:
-    r = _get(url, stream=False, timeout=timeout)
-    r.raise_for_status()
-    return r.text
+def _via_cache(
+    c: HttpCache,
+    url: str,
+    dest: Path,
+    size: int | None,
+    sha256: str | None,
+    timeout: int,
+    response: requests.Response | None = None,
+) -> bool:
+    """Save `url` to dest through the HTTP cache; False (logged) if that failed."""
+    try:
+        body = _cached_get(c, url, timeout, response)
+        _materialize(c, body, url, dest, size, sha256)
+    except Exception as e:  # noqa: BLE001
+        _emit("log", {"step": 1, "line": f"cache path failed, downloading: {e}"})
+        return False
+    finally:
+        if response is not None:
+            response.close()  # unused when another thread fetched the same URL
+    _emit("log", {"step": 1, "line": f"saved -> {dest} (cache: {body.status})"})
+    return True
+
+
+@traced("net.fetch_text")
+def fetch_text(url: str, timeout: int = 30, *, cache: bool | None = None) -> str:
+    c = _cache_for(cache)
+    if c is None:
+        r = _get(url, stream=False, timeout=timeout)
+        r.raise_for_status()
+        return r.text
+    body = _cached_get(c, url, timeout)
+    data = body.path.read_bytes()
+    if body.status == "uncached":
+        body.path.unlink(missing_ok=True)
+    enc = requests.utils.get_encoding_from_headers(body.headers) or "utf-8"
+    return data.decode(enc, errors="replace")
+
+
+@contextmanager
+def stream_body(
+    url: str, timeout: int = 30, *, chunk_size: int = 16384, cache: bool | None = None
+) -> Iterator[tuple[dict[str, str], Iterator[bytes]]]:
+    """
+    Yield (lowercased headers, chunk iterator) for reading a body incrementally.
+
+    Leaving the block early closes the connection, so readers that stop after
+    a few KB don't pay for the rest of the body. A fresh HTTP-cache entry is
+    read from disk instead of the network.
+    """
+    c = _cache_for(cache)
+    if c is not None and c.is_fresh(url):
+        body = _cached_get(c, url, timeout)
+        try:
+            with body.path.open("rb") as f:
+                yield body.headers, iter(lambda: f.read(chunk_size), b"")
+        finally:
+            if body.status == "uncached":
+                body.path.unlink(missing_ok=True)
+        return
+    with _session().get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        yield {k.lower(): v for k, v in r.headers.items()}, r.iter_content(chunk_size)
+
+
+# ---- Batch downloads --------------------------------------------------------
+
+
+@dataclass
+class FetchResult:
+    url: str
+    dest: Path
+    ok: bool
+    bytes: int = 0
+    seconds: float = 0.0
+    attempts: int = 0
+    error: str | None = None
+
+
+class _Progress:
+    """Thread-safe aggregate counters, reported at most every `interval` seconds."""
+
+    def __init__(
+        self, total: int, cb: Callable[[dict], None] | None, interval: float = 0.5
+    ) -> None:
+        self.total = total
+        self.cb = cb
+        self.interval = interval
+        self.t0 = time.monotonic()
+        self.bytes = 0
+        self.done = 0
+        self.failed = 0
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add_bytes(self, n: int) -> None:
+        with self._lock:
+            self.bytes += n
+        self._maybe_report()
+
+    def file_done(self, ok: bool) -> None:
+        with self._lock:
+            self.done += 1
+            if not ok:
+                self.failed += 1
+        self._maybe_report(force=True)
+
+    def snapshot(self) -> dict:
+        elapsed = max(time.monotonic() - self.t0, 1e-6)
+        return {
+            "files_done": self.done,
+            "files_total": self.total,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "bytes_per_s": round(self.bytes / elapsed, 1),
+            "seconds": round(elapsed, 3),
+        }
+
+    def _maybe_report(self, force: bool = False) -> None:
+        if not self.cb:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last < self.interval:
+                return
+            self._last = now
+        self.cb(self.snapshot())
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class HostLimiter:
+    """Lazily created per-host semaphores bounding concurrent requests to one host."""
+
+    def __init__(self, per_host: int) -> None:
+        self.per_host = max(1, per_host)
+        self._sems: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url: str) -> threading.BoundedSemaphore:
+        h = _host(url)
+        with self._lock:
+            if h not in self._sems:
+                self._sems[h] = threading.BoundedSemaphore(self.per_host)
+            return self._sems[h]
+
+
+def interleave_by_host(urls: list[str]) -> list[int]:
+    """Round-robin indices across hosts so one slow host can't hog the pool."""
+    buckets: dict[str, list[int]] = {}
+    for i, u in enumerate(urls):
+        buckets.setdefault(_host(u), []).append(i)
+    out: list[int] = []
+    queues = list(buckets.values())
+    j = 0
+    while len(out) < len(urls):
+        for q in queues:
+            if j < len(q):
+                out.append(q[j])
+        j += 1
+    return out
+
+
+@traced("net.fetch_many")
+def fetch_many(
+    items: Iterable[tuple[str, Path | str]],
+    *,
+    max_workers: int = 8,
+    per_host: int = 4,
+    retries: int = 3,
+    backoff: float = 0.6,
+    timeout: int = 30,
+    on_progress: Callable[[dict], None] | None = None,
+) -> list[FetchResult]:
+    """
+    Download many (url, dest) pairs concurrently.
+
+    - `max_workers` bounds the total number of in-flight downloads,
+      `per_host` bounds them per URL host.
+    - Each item is retried on its own; a failure never aborts the batch.
+    - `on_progress` receives aggregate snapshots (files done, bytes, bytes/s).
+    Returns one FetchResult per item, in input order.
+    """
+    pairs = [(u, Path(d)) for u, d in items]
+    if not pairs:
+        return []
+
+    limiter = HostLimiter(per_host)
+    progress = _Progress(len(pairs), on_progress)
+
+    def _one(url: str, dest: Path) -> FetchResult:
+        res = FetchResult(url=url, dest=dest, ok=False)
+        t0 = time.monotonic()
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        for i in range(1, retries + 1):
+            res.attempts = i
+            try:
+                with limiter.slot(url):
+                    res.bytes = _download(url, dest, timeout=timeout, on_bytes=progress.add_bytes)
+                res.ok = True
+                res.error = None
+                break
+            except Exception as e:  # noqa: BLE001
+                res.error = str(e)
+                if i < retries:
+                    time.sleep(backoff * i)
+        res.seconds = round(time.monotonic() - t0, 3)
+        progress.file_done(res.ok)
+        return res
+
+    results: list[FetchResult | None] = [None] * len(pairs)
+    workers = max(1, min(max_workers, len(pairs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+        order = interleave_by_host([u for u, _ in pairs])
+        futs = {pool.submit(_one, *pairs[i]): i for i in order}
+        for fut in as_completed(futs):
+            results[futs[fut]] = fut.result()
+    return [r for r in results if r is not None]
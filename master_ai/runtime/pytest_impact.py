@@ -0,0 +1,228 @@
+"""
+pytest plugin for test impact analysis (see testimpact)
+Enabled with `-p master_ai.runtime.pytest_impact --impact-db PATH
+--impact-root DIR`: traces which lines of files under DIR each test
+executes (sys.monitoring on 3.12+, sys.settrace before) and stores them,
+with each test's outcome and duration, in the impact map. Lines run
+during collection (imports) are stored under testimpact.IMPORTS.
+`--impact-shard I/N` keeps only shard I of N of the collected tests,
+split by test file and balanced on `--impact-weights` (JSON: seconds
+per file); it works with or without a map.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import pytest
+
+from master_ai.runtime import testimpact
+from master_ai.runtime.testimpact import IMPORTS, SKIP_DIRS, ImpactDB, line_hashes, pack
+
+FLUSH_EVERY = 200  # tests per database write
+_OWN_FILES = {__file__, testimpact.__file__}  # never part of a map
+
+
+class _Tracer:
+    """Executed (file, line) pairs for files under `root`, collected per test."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = str(root) + os.sep
+        self.lines: dict[str, set[int]] = defaultdict(set)
+        self._rel: dict[str, str | None] = {}
+        self._tool: int | None = None
+
+    def rel(self, filename: str) -> str | None:
+        rel = self._rel.get(filename, "")
+        if rel == "":
+            rel = None
+            ours = filename in _OWN_FILES
+            if filename.startswith(self.root) and filename.endswith(".py") and not ours:
+                candidate = filename[len(self.root) :]
+                if not SKIP_DIRS.intersection(Path(candidate).parts[:-1]):
+                    rel = candidate
+            self._rel[filename] = rel
+        return rel
+
+    # sys.monitoring: every line reports once, then is disabled until reset()
+    def _on_line(self, code, line: int):
+        rel = self.rel(code.co_filename)
+        if rel is not None:
+            self.lines[rel].add(line)
+        return sys.monitoring.DISABLE
+
+    # sys.settrace: only frames of our files get a line tracer
+    def _on_call(self, frame, event, arg):
+        rel = self.rel(frame.f_code.co_filename)
+        if rel is None:
+            return None
+
+        def local(frame, event, arg):
+            if event == "line":
+                self.lines[rel].add(frame.f_lineno)
+            return local
+
+        self.lines[rel].add(frame.f_lineno)
+        return local
+
+    def start(self) -> None:
+        mon = getattr(sys, "monitoring", None)
+        if mon is not None:
+            for tool in (mon.COVERAGE_ID, 3, 4):
+                try:
+                    mon.use_tool_id(tool, "master_ai-impact")
+                except ValueError:
+                    continue
+                self._tool = tool
+                mon.register_callback(tool, mon.events.LINE, self._on_line)
+                mon.set_events(tool, mon.events.LINE)
+                return
+        threading.settrace(self._on_call)
+        sys.settrace(self._on_call)
+
+    def take(self) -> dict[str, set[int]]:
+        """Lines since the last take(); re-arms sys.monitoring's disabled lines."""
+        lines, self.lines = self.lines, defaultdict(set)
+        if self._tool is not None:
+            sys.monitoring.restart_events()
+        return lines
+
+    def stop(self) -> None:
+        if self._tool is not None:
+            sys.monitoring.set_events(self._tool, 0)
+            sys.monitoring.register_callback(self._tool, sys.monitoring.events.LINE, None)
+            sys.monitoring.free_tool_id(self._tool)
+            self._tool = None
+        else:
+            sys.settrace(None)
+            threading.settrace(None)  # type: ignore[arg-type]
+
+
+class ImpactRecorder:
+    def __init__(self, db: ImpactDB, root: Path, full: bool) -> None:
+        self.db = db
+        self.root = root
+        self.full = full
+        self.tracer = _Tracer(root)
+        self.hashes: dict[str, tuple[list[int], list[int]]] = {}
+        self.results: list[tuple] = []
+        self.coverage: dict[str, dict[str, bytes]] = {}
+        self.outcomes: dict[str, str] = {}
+        self.seen: set[str] = set()
+        self.tracer.start()
+
+    def _pack(self, lines: dict[str, set[int]], pairs: bool = True) -> dict[str, bytes]:
+        out = {}
+        for rel, nums in lines.items():
+            if rel not in self.hashes:
+                try:
+                    text = (self.root / rel).read_text(errors="replace").splitlines()
+                except OSError:
+                    continue
+                self.hashes[rel] = (line_hashes(text), line_hashes(text, pairs=False))
+            hashes = self.hashes[rel][0 if pairs else 1]
+            out[rel] = pack(hashes[n - 1] for n in nums if 0 < n <= len(hashes))
+        return out
+
+    def _nodeid(self, item: pytest.Item) -> tuple[str, str]:
+        """(nodeid relative to the impact root, its file) - pytest's rootdir may differ."""
+        file = os.path.relpath(item.path, self.root)
+        sep = item.nodeid.find("::")
+        return file + (item.nodeid[sep:] if sep >= 0 else ""), file
+
+    def _flush(self) -> None:
+        if self.results or self.coverage:
+            self.db.record(self.results, self.coverage)
+        self.results, self.coverage = [], {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item: pytest.Item, nextitem):
+        before = self.tracer.take()  # collection / between tests: import-time lines
+        if before:
+            self.coverage.setdefault(IMPORTS, {}).update(self._pack(before, pairs=False))
+        nodeid, file = self._nodeid(item)
+        self.outcomes[item.nodeid] = "passed"
+        t0 = time.perf_counter()
+        yield
+        duration = time.perf_counter() - t0
+        self.results.append((nodeid, file, self.outcomes.pop(item.nodeid), duration, time.time()))
+        self.coverage[nodeid] = self._pack(self.tracer.take())
+        if len(self.results) >= FLUSH_EVERY:
+            self._flush()
+
+    def pytest_collection_modifyitems(self, items: list[pytest.Item]) -> None:
+        # before sharding: a full run's shards each see every collected test
+        self.seen.update(self._nodeid(item)[0] for item in items)
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        if report.nodeid not in self.outcomes:
+            return
+        if report.failed:
+            self.outcomes[report.nodeid] = "failed"
+        elif report.skipped and self.outcomes[report.nodeid] != "failed":
+            self.outcomes[report.nodeid] = "skipped"
+
+    def pytest_sessionfinish(self, session: pytest.Session, exitstatus: int) -> None:
+        self.tracer.stop()
+        self._flush()
+        if self.full and exitstatus in (0, 1):
+            self.db.prune(self.seen)
+        self.db.close()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("impact", "test impact map (master_ai.runtime.testimpact)")
+    group.addoption("--impact-db", help="record per-test coverage into this SQLite map")
+    group.addoption("--impact-root", help="project root the map's paths are relative to")
+    group.addoption(
+        "--impact-full", action="store_true", help="full run: drop tests no longer collected"
+    )
+    group.addoption("--impact-shard", help="I/N: run only shard I (0-based) of N")
+    group.addoption("--impact-weights", help="JSON {test file: seconds} to balance shards")
+
+
+def shard_of(files: list[str], weights: dict[str, float], shards: int) -> dict[str, int]:
+    """Whole files to shards, heaviest first onto the least loaded (unknown: the mean)."""
+    known = [weights[f] for f in files if f in weights]
+    default = sum(known) / len(known) if known else 1.0
+    load = [0.0] * shards
+    out = {}
+    for f in sorted(files, key=lambda f: (-weights.get(f, default), f)):
+        i = load.index(min(load))
+        out[f] = i
+        load[i] += weights.get(f, default)
+    return out
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    shard = config.getoption("impact_shard")
+    if not shard:
+        return
+    index, count = (int(x) for x in shard.split("/"))
+    weights: dict[str, float] = {}
+    if config.getoption("impact_weights"):
+        with open(config.getoption("impact_weights")) as f:
+            weights = json.load(f)
+    root = Path(config.getoption("impact_root") or config.rootpath).resolve()
+    files = {item: os.path.relpath(item.path, root) for item in items}
+    owner = shard_of(sorted(set(files.values())), weights, count)
+    keep = [item for item in items if owner[files[item]] == index]
+    if len(keep) < len(items):
+        config.hook.pytest_deselected(items=[i for i in items if owner[files[i]] != index])
+        items[:] = keep
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    path = config.getoption("impact_db")
+    if path:
+        root = Path(config.getoption("impact_root") or config.rootpath).resolve()
+        full = config.getoption("impact_full")
+        recorder = ImpactRecorder(ImpactDB(path), root, full)
+        config.pluginmanager.register(recorder, "impact-recorder")
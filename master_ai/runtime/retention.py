@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .catalog import RunCatalog
+from .compress import compress_file
+from .utils import RUNS_ROOT
+
+# Blobs live next to the runs root (artifacts/blobs) so hardlinks stay on
+# one filesystem.
+BLOBS_DIRNAME = "blobs"
+# Run files that are compressed in place rather than deduplicated.
+LOG_NAMES = ("events.jsonl",)
+LOG_SUFFIXES = (".log",)
+# Never delete or compact runs that are still going. A RUNNING run whose
+# events have not changed for STALE_AFTER_S is assumed to have crashed.
+LIVE_STATUSES = ("RUNNING",)
+STALE_AFTER_S = 6 * 3600
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Which runs `collect` keeps.
+
+    A finished run is deleted when it falls outside the newest `keep_last`
+    runs or is older than `max_age_days` (either rule suffices). If
+    `statuses` is set, only runs with one of those statuses are eligible for
+    deletion. Runs older than `compact_after_days` that survive are compacted:
+    written files are deduplicated into the blob store and logs compressed.
+    """
+
+    keep_last: int | None = 200
+    max_age_days: float | None = 30.0
+    statuses: tuple[str, ...] | None = None
+    compact_after_days: float | None = 1.0
+
+
+@dataclass
+class GcReport:
+    deleted: list[str] = field(default_factory=list)
+    compacted: list[str] = field(default_factory=list)
+    files_deduped: int = 0
+    files_compressed: int = 0
+    blobs_removed: int = 0
+    bytes_freed: int = 0
+    dry_run: bool = False
+
+
+def _tree_bytes(path: Path) -> int:
+    total = 0
+    for dirpath, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            # Deduplicated files are shared with the blob store; their space
+            # is freed (and counted) when the blob is pruned.
+            if st.st_nlink == 1:
+                total += st.st_size
+    return total
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed file store: `root/<ab>/<sha256>`.
+
+    Run files are replaced by hardlinks to their blob, so N identical copies
+    cost one inode's worth of disk. A blob whose link count drops to 1 is
+    referenced by no run and can be pruned.
+    """
+
+    def __init__(self, root: Path | str) -> None:
+        self.root = Path(root)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def dedupe(self, path: Path) -> int:
+        """Hardlink `path` to its blob; returns the bytes saved (0 if new or linked)."""
+        blob = self.path(_sha256(path))
+        st = path.stat()
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.link(path, blob)
+            return 0
+        bst = blob.stat()
+        if (bst.st_dev, bst.st_ino) == (st.st_dev, st.st_ino):
+            return 0
+        tmp = path.with_name(f".{path.name}.blob")
+        os.link(blob, tmp)
+        os.replace(tmp, path)
+        return st.st_size
+
+    def prune(self, dry_run: bool = False) -> tuple[int, int]:
+        """Remove blobs no run links to; returns (count, bytes)."""
+        n = freed = 0
+        if not self.root.exists():
+            return 0, 0
+        for sub in self.root.iterdir():
+            for blob in sub.iterdir() if sub.is_dir() else ():
+                st = blob.stat()
+                if st.st_nlink == 1:
+                    n += 1
+                    freed += st.st_size
+                    if not dry_run:
+                        blob.unlink()
+        return n, freed
+
+
+def _is_log(p: Path) -> bool:
+    return p.name in LOG_NAMES or p.suffix in LOG_SUFFIXES
+
+
+def _run_files(run_dir: Path) -> list[Path]:
+    out = []
+    for dirpath, _dirs, files in os.walk(run_dir):
+        for name in files:
+            p = Path(dirpath, name)
+            if not p.is_symlink():
+                out.append(p)
+    # events.jsonl goes last: its compressed copy marks the run as compacted.
+    out.sort(key=lambda p: p.name == "events.jsonl")
+    return out
+
+
+def compact_run(run_dir: Path, blobs: BlobStore, report: GcReport) -> None:
+    """Deduplicate a finished run's written files and compress its logs."""
+    for p in _run_files(run_dir):
+        size = p.stat().st_size
+        if _is_log(p):
+            report.files_compressed += 1
+            if not report.dry_run:
+                report.bytes_freed += size - compress_file(p).stat().st_size
+        elif size:
+            if report.dry_run:
+                report.files_deduped += 1
+                continue
+            try:
+                saved = blobs.dedupe(p)
+            except OSError:
+                continue  # blob store on another filesystem, permissions, ...
+            report.files_deduped += bool(saved)
+            report.bytes_freed += saved
+
+
+def is_compacted(run_dir: Path) -> bool:
+    return not (run_dir / "events.jsonl").exists()
+
+
+def _is_live(row: dict, run_dir: Path, now: float) -> bool:
+    if row["status"] not in LIVE_STATUSES:
+        return False
+    try:
+        return now - (run_dir / "events.jsonl").stat().st_mtime < STALE_AFTER_S
+    except OSError:
+        return False
+
+
+def collect(
+    policy: RetentionPolicy,
+    *,
+    root: Path | str = RUNS_ROOT,
+    blobs_root: Path | str | None = None,
+    dry_run: bool = False,
+    now: float | None = None,
+) -> GcReport:
+    """
+    Apply `policy` to the runs under `root`: delete expired runs (and their
+    catalog rows), compact cold ones, then prune unreferenced blobs.
+
+    Runs are enumerated from the run catalog rather than by scanning the
+    tree, and compacted runs are not touched again, so the cost of a gc pass
+    tracks the number of new runs, not the size of the archive.
+    """
+    root = Path(root)
+    now = time.time() if now is None else now
+    report = GcReport(dry_run=dry_run)
+    blobs = BlobStore(blobs_root or root.parent / BLOBS_DIRNAME)
+    cat = RunCatalog(root)
+    try:
+        if cat.count() == 0:
+            cat.rebuild()
+        rows = cat.query(limit=-1)  # newest first
+        statuses = {s.upper() for s in policy.statuses} if policy.statuses else None
+        for i, row in enumerate(rows):
+            run_dir = root / row["run_id"]
+            if not run_dir.is_dir():
+                if not dry_run:
+                    cat.forget(row["run_id"])
+                continue
+            if _is_live(row, run_dir, now):
+                continue
+            age_days = (now - (row["finished"] or row["started"] or now)) / 86400
+            expired = (policy.keep_last is not None and i >= policy.keep_last) or (
+                policy.max_age_days is not None and age_days > policy.max_age_days
+            )
+            if expired and (statuses is None or row["status"] in statuses):
+                report.deleted.append(row["run_id"])
+                report.bytes_freed += _tree_bytes(run_dir)
+                if not dry_run:
+                    shutil.rmtree(run_dir)
+                    cat.forget(row["run_id"])
+                continue
+            if (
+                policy.compact_after_days is not None
+                and age_days > policy.compact_after_days
+                and not is_compacted(run_dir)
+            ):
+                compact_run(run_dir, blobs, report)
+                report.compacted.append(row["run_id"])
+        n, freed = blobs.prune(dry_run)
+        report.blobs_removed, report.bytes_freed = n, report.bytes_freed + freed
+    finally:
+        cat.close()
+    return report
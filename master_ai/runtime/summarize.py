@@ -1,65 +1,341 @@
 from __future__ import annotations
 
+import codecs
+import os
 import re
-from html import unescape
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
 
 # --- tiny HTML scrubber ------------------------------------------------------
 
-_TAG_RE = re.compile(r"<[^>]+>")
 _WS_RE = re.compile(r"[ \t\f\r\v]+")
+_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
 
+# Input is fed to the tokenizer in slices this big, so we can stop early.
+_FEED_CHARS = 16384
+# Input is parsed as HTML only if it looks like it: a closing tag, comment or
+# doctype within _FEED_CHARS of the first "<" or "&", or a leading tag.
+# Plain text such as "if a<b and c>d" is kept as it is.
+_HTML_RE = re.compile(r"</[a-zA-Z][\w:-]*\s*>|<!--|<!doctype", re.IGNORECASE)
+_LEADING_TAG_RE = re.compile(r"\s*<[a-zA-Z!?]")
 
-def _strip_html(s: str) -> str:
-    # remove tags, unescape entities, normalize spaces
-    s = _TAG_RE.sub(" ", s)
-    s = unescape(s)
-    # collapse intra-line whitespace
-    s = _WS_RE.sub(" ", s)
-    return s
+
+class _LineCollector(HTMLParser):
+    """
+    Incremental HTML-to-lines tokenizer.
+
+    Text inside script/style is dropped, block-level tags and newlines end a
+    line, other tags separate words, and `done` turns true as soon as
+    `max_lines` non-empty lines exist, so callers can stop feeding input.
+    Input that does not look like HTML (_HTML_RE) is split into lines as is.
+    """
+
+    SKIP = frozenset({"script", "style", "template"})
+    BLOCK = frozenset(
+        "address article aside blockquote br dd div dl dt figcaption footer form"
+        " h1 h2 h3 h4 h5 h6 header hr li main nav ol p pre section table td th"
+        " title tr ul".split()
+    )
+
+    def __init__(self, max_lines: int) -> None:
+        super().__init__(convert_charrefs=True)
+        self.max_lines = max_lines
+        self.lines: list[str] = []
+        self._buf: list[str] = []
+        self._skip = 0
+        self.html: bool | None = None  # undecided until markup may matter
+        self._head: list[str] = []
+        self._head_len = 0
+        self._text_seen = False
+
+    @property
+    def done(self) -> bool:
+        return len(self.lines) >= self.max_lines
+
+    def _flush(self) -> None:
+        if self._buf:
+            line = _WS_RE.sub(" ", "".join(self._buf)).strip()
+            self._buf.clear()
+            if line and not self.done:
+                self.lines.append(line)
+
+    def feed(self, data: str) -> None:
+        if self.html is None and not self._head and "<" not in data and "&" not in data:
+            self.handle_data(data)  # the same lines whether or not this is HTML
+            self._text_seen = self._text_seen or bool(data.strip())
+        elif self.html is None:
+            self._head.append(data)
+            self._head_len += len(data)
+            if self._head_len >= _FEED_CHARS:
+                self._sniff()
+        elif self.html:
+            super().feed(data)
+        else:
+            self.handle_data(data)
+
+    def _sniff(self) -> None:
+        head = "".join(self._head)
+        self._head.clear()
+        leading = not self._text_seen and _LEADING_TAG_RE.match(head)
+        self.html = bool(leading or _HTML_RE.search(head))
+        self.feed(head)
+
+    def handle_starttag(self, tag, attrs):  # noqa: D102
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.BLOCK:
+            self._flush()
+        else:
+            self._buf.append(" ")
+
+    def handle_startendtag(self, tag, attrs):  # noqa: D102
+        if tag in self.BLOCK:
+            self._flush()
+        else:
+            self._buf.append(" ")
+
+    def handle_endtag(self, tag):  # noqa: D102
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK:
+            self._flush()
+        else:
+            self._buf.append(" ")
+
+    def handle_data(self, data):  # noqa: D102
+        if self._skip or self.done:
+            return
+        first, *rest = data.split("\n")
+        self._buf.append(first)
+        for part in rest:
+            self._flush()
+            self._buf.append(part)
+
+    def close(self) -> None:
+        if self.html is None:
+            self._sniff()
+        super().close()
+        self._flush()
+
+
+def _charset(headers: dict[str, str] | None, default: str = "utf-8") -> str:
+    m = _CHARSET_RE.search((headers or {}).get("content-type", ""))
+    enc = m.group(1) if m else default
+    try:
+        codecs.lookup(enc)
+    except LookupError:
+        enc = default
+    return enc
 
 
 # --- public API --------------------------------------------------------------
 
 
-def summarize_text(txt: str | bytes | None, max_lines: int = 5) -> str:
+MODES = ("lead", "extractive")
+
+
+def _extractive_stream(chunks: Iterable[bytes | str], k: int, decoder) -> str:
+    from .extractive import ExtractiveSummarizer, split_sentences
+
+    es = ExtractiveSummarizer(k)
+    c = _LineCollector(sys.maxsize)
+    for chunk in chunks:
+        c.feed(decoder.decode(chunk) if isinstance(chunk, bytes | bytearray) else chunk)
+        if c.lines:
+            es.feed(split_sentences(c.lines))
+            c.lines = []
+    c.feed(decoder.decode(b"", final=True))
+    c.close()
+    es.feed(split_sentences(c.lines))
+    return "\n".join(es.result())
+
+
+def summarize_stream(
+    chunks: Iterable[bytes | str],
+    max_lines: int = 5,
+    encoding: str = "utf-8",
+    mode: str = "lead",
+) -> str:
+    """
+    Summarize text/HTML arriving in chunks. Bytes are decoded incrementally
+    with `encoding`.
+
+    mode="lead" returns the first `max_lines` lines and stops reading as soon
+    as they are collected (the rest of `chunks` is left unread; close the
+    source to release it). mode="extractive" consumes everything and returns
+    the `max_lines` most central sentences (TF-IDF, needs numpy), in
+    document order, processing the input in bounded blocks.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown summarize mode: {mode!r} (expected one of {MODES})")
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    if mode == "extractive":
+        return _extractive_stream(chunks, max_lines, decoder)
+    c = _LineCollector(max_lines)
+    for chunk in chunks:
+        c.feed(decoder.decode(chunk) if isinstance(chunk, bytes | bytearray) else chunk)
+        if c.done:
+            return "\n".join(c.lines)
+    c.feed(decoder.decode(b"", final=True))
+    c.close()
+    return "\n".join(c.lines)
+
+
+def _slices(data: str | bytes, size: int = _FEED_CHARS):
+    view = memoryview(data) if isinstance(data, bytes) else data
+    for i in range(0, len(data), size):
+        yield bytes(view[i : i + size]) if isinstance(view, memoryview) else view[i : i + size]
+
+
+def summarize_text(txt: str | bytes | None, max_lines: int = 5, mode: str = "lead") -> str:
     """
     Take raw text or HTML and return the first `max_lines` of cleaned text.
+    Only as much of the input as needed is tokenized (and, for bytes, decoded);
+    see summarize_stream for `mode`.
     Never returns None.
     """
     if txt is None:
         return ""
-    if isinstance(txt, bytes):
-        try:
-            txt = txt.decode("utf-8", errors="ignore")
-        except Exception:
-            txt = txt.decode("latin-1", errors="ignore")
-
-    s = _strip_html(str(txt))
-    # per-line trim, drop empty, return first N
-    lines = [ln.strip() for ln in s.splitlines() if ln.strip()]
-    if not lines:
-        # fallback: split on periods if page had no newlines
-        chunks = [c.strip() for c in re.split(r"[\.!?]+", s) if c.strip()]
-        lines = chunks
-    return "\n".join(lines[:max_lines])
-
-
-def summarize_url(url: str, max_lines: int = 5) -> str:
+    if not isinstance(txt, bytes):
+        txt = str(txt)
+    return summarize_stream(_slices(txt), max_lines, mode=mode)
+
+
+def summarize_url(url: str, max_lines: int = 5, mode: str = "lead") -> str:
     """
-    Fetch a URL using runtime.net.fetch_text, then summarize it.
+    Stream a URL via runtime.net.stream_body and summarize it, closing the
+    connection once enough lines are collected.
     """
-    from .net import fetch_text
+    from .net import stream_body
 
-    text = fetch_text(url)
-    return summarize_text(text, max_lines)
+    with stream_body(url) as (headers, chunks):
+        return summarize_stream(chunks, max_lines, encoding=_charset(headers), mode=mode)
 
 
-def summarize_file(path: str | bytes, max_lines: int = 5, encoding: str = "utf-8") -> str:
+def summarize_file(
+    path: str | bytes, max_lines: int = 5, encoding: str = "utf-8", mode: str = "lead"
+) -> str:
     """
-    Read a file from disk and summarize its contents.
+    Read a file from disk and summarize its contents, reading only as much as needed.
     """
     from pathlib import Path
 
-    p = Path(path)
-    data = p.read_text(encoding=encoding, errors="ignore")
-    return summarize_text(data, max_lines)
+    with Path(path).open("rb") as f:
+        chunks = iter(lambda: f.read(_FEED_CHARS), b"")
+        return summarize_stream(chunks, max_lines, encoding, mode=mode)
+
+
+# --- batch API ---------------------------------------------------------------
+
+# Files per process-pool task: amortizes pickling/IPC for many small files.
+_FILE_BATCH = 16
+
+
+def _result(kind: str, source: str, fn, *args) -> dict:
+    t0 = time.perf_counter()
+    out = {"kind": kind, "source": source, "ok": True, "summary": "", "error": None}
+    try:
+        out["summary"] = fn(source, *args)
+    except Exception as e:  # noqa: BLE001
+        out["ok"] = False
+        out["error"] = str(e)
+    out["seconds"] = round(time.perf_counter() - t0, 4)
+    return out
+
+
+def _summarize_file_batch(paths: list[str], max_lines: int, mode: str) -> list[dict]:
+    """Process-pool worker: summarize a batch of files."""
+    return [_result("file", p, summarize_file, max_lines, "utf-8", mode) for p in paths]
+
+
+def _summarize_url_job(url: str, max_lines: int, mode: str, limiter) -> list[dict]:
+    with limiter.slot(url):
+        return [_result("url", url, summarize_url, max_lines, mode)]
+
+
+def summarize_many(
+    files: Iterable[str | os.PathLike] = (),
+    urls: Iterable[str] = (),
+    *,
+    max_lines: int = 5,
+    mode: str = "lead",
+    jobs: int | None = None,
+    url_jobs: int = 16,
+    per_host: int = 4,
+    ordered: bool = False,
+) -> Iterator[dict]:
+    """
+    Summarize many files and URLs, yielding one result dict per input:
+      {"kind": "file"|"url", "source", "ok", "summary", "error", "seconds"}
+
+    Files are decoded/stripped/summarized in a process pool of `jobs` workers
+    (default: all cores); URLs are fetched by `url_jobs` threads with at most
+    `per_host` requests per host. Results stream out as they complete, or in
+    input order (files first, then URLs) with `ordered=True`.
+    """
+    paths = [os.fspath(f) for f in files]
+    url_list = list(urls)
+    if not paths and not url_list:
+        return
+
+    batches = [paths[i : i + _FILE_BATCH] for i in range(0, len(paths), _FILE_BATCH)]
+    futs: dict[Future, int] = {}
+    procs = ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) if batches else None
+    threads = ThreadPoolExecutor(max_workers=max(1, url_jobs)) if url_list else None
+    try:
+        if procs is not None:
+            _submit_files(procs, futs, batches, max_lines, mode)
+        if threads is not None:
+            _submit_urls(threads, futs, url_list, len(batches), max_lines, mode, per_host)
+        yield from _in_order(futs) if ordered else _as_done(futs)
+    finally:
+        for pool in (procs, threads):
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _submit_files(
+    pool: ProcessPoolExecutor,
+    futs: dict[Future, int],
+    batches: list[list[str]],
+    max_lines: int,
+    mode: str,
+) -> None:
+    for i, batch in enumerate(batches):
+        futs[pool.submit(_summarize_file_batch, batch, max_lines, mode)] = i
+
+
+def _submit_urls(
+    pool: ThreadPoolExecutor,
+    futs: dict[Future, int],
+    urls: list[str],
+    offset: int,
+    max_lines: int,
+    mode: str,
+    per_host: int,
+) -> None:
+    """One job per URL, interleaved across hosts; result slots start at `offset`."""
+    from .net import HostLimiter, interleave_by_host
+
+    limiter = HostLimiter(per_host)
+    for j in interleave_by_host(urls):
+        futs[pool.submit(_summarize_url_job, urls[j], max_lines, mode, limiter)] = offset + j
+
+
+def _as_done(futs: dict[Future, int]) -> Iterator[dict]:
+    for fut in as_completed(futs):
+        yield from fut.result()
+
+
+def _in_order(futs: dict[Future, int]) -> Iterator[dict]:
+    """Results by slot index, each released as soon as all earlier ones are in."""
+    ready: dict[int, list[dict]] = {}
+    next_idx = 0
+    for fut in as_completed(futs):
+        ready[futs[fut]] = fut.result()
+        while next_idx in ready:
+            yield from ready.pop(next_idx)
+            next_idx += 1
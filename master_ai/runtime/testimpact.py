@@ -0,0 +1,442 @@
+"""
+Test impact analysis
+A pytest plugin (pytest_impact) records, for every test, which lines of
+which project files it executed. A line is stored as a hash of its text
+and the following line, so a map stays valid while unrelated parts of a
+file move, and an edit, deletion or insertion next to an executed line
+shows up as a hash that is no longer in the file. Lines that ran at
+import time are kept (hashed alone) under the pseudo test IMPORTS and
+affect every test covering that file.
+
+run_impacted(root) then runs only the affected tests:
+  • tests with an executed line that changed (content compared with the
+    digest each file had when last checked)
+  • tests that failed last time, ordered first, then fastest first
+  • test files that are new or changed, as whole files
+It falls back to a full run (which also refreshes the map) when there is
+no map yet, a global file (conftest.py, pytest.ini, ...) changed, the map
+is older than FULL_MAX_AGE_S or FULL_EVERY selective runs have passed.
+The map lives in <root>/.testimpact/impact.sqlite3.
+
+With `shards` > 1 the selection is split across that many pytest
+processes by whole test file, balanced on the recorded durations.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+DB_NAME = ".testimpact/impact.sqlite3"
+PLUGIN = "master_ai.runtime.pytest_impact"
+IMPORTS = "<import>"
+FULL_EVERY = 25  # selective runs between full ones
+FULL_MAX_AGE_S = 24 * 3600.0
+TIMEOUT_S = 1800
+PYTEST = [sys.executable, "-m", "pytest"]  # the interpreter the plugin imports into
+# "off": always the plain full suite, no map
+IMPACT_ENV = "MASTER_AI_TEST_IMPACT"
+GLOBAL_FILES = (
+    "conftest.py",
+    "pytest.ini",
+    "pyproject.toml",
+    "setup.cfg",
+    "tox.ini",
+    "requirements.txt",
+)
+SKIP_DIRS = {".venv", "venv", ".git", "node_modules", "site-packages", ".tox", "__pycache__"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    nodeid TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    outcome TEXT,
+    duration REAL,
+    last_run REAL,
+    last_failed REAL
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    nodeid TEXT NOT NULL,
+    path TEXT NOT NULL,
+    hashes BLOB NOT NULL,
+    PRIMARY KEY (nodeid, path)
+);
+CREATE INDEX IF NOT EXISTS coverage_path ON coverage(path);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, digest TEXT);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def line_hashes(lines: list[str], pairs: bool = True) -> list[int]:
+    """
+    Per line (index 0 = line 1): crc32 of the stripped line and the one
+    after it, or of the line alone (import-time lines, so that a def line
+    does not change with its body).
+    """
+    stripped = [ln.strip() for ln in lines]
+    if not pairs:
+        return [zlib.crc32(ln.encode()) for ln in stripped]
+    nxt = stripped[1:] + [""] if stripped else []
+    return [zlib.crc32(f"{a}\n{b}".encode()) for a, b in zip(stripped, nxt, strict=True)]
+
+
+def file_hashes(path: Path) -> set[int]:
+    """Both kinds of line hash for the file's current content."""
+    try:
+        lines = path.read_text(errors="replace").splitlines()
+    except OSError:
+        return set()
+    return set(line_hashes(lines)) | set(line_hashes(lines, pairs=False))
+
+
+def digest(path: Path) -> str | None:
+    try:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def pack(hashes: Iterable[int]) -> bytes:
+    return array("I", sorted(set(hashes))).tobytes()
+
+
+def unpack(blob: bytes) -> array:
+    a = array("I")
+    a.frombytes(blob)
+    return a
+
+
+class ImpactDB:
+    """Per-test coverage map plus outcome history (SQLite, WAL)."""
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.con.close()
+
+    def get_meta(self, key: str, default: str | None = None) -> str | None:
+        row = self.con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, **values: object) -> None:
+        self.con.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()],
+        )
+
+    def record(self, results: list[tuple], coverage: dict[str, dict[str, bytes]]) -> None:
+        """
+        results: (nodeid, file, outcome, duration, ts) per test run;
+        coverage: nodeid -> {path: packed hashes}, replacing what was stored.
+        """
+        with self.con:
+            self.con.execute("BEGIN")
+            self.con.executemany(
+                "INSERT INTO tests (nodeid, file, outcome, duration, last_run, last_failed)"
+                " VALUES (?1, ?2, ?3, ?4, ?5, CASE WHEN ?3 = 'failed' THEN ?5 END)"
+                " ON CONFLICT(nodeid) DO UPDATE SET file = excluded.file,"
+                " outcome = excluded.outcome, duration = excluded.duration,"
+                " last_run = excluded.last_run,"
+                " last_failed = COALESCE(excluded.last_failed, last_failed)",
+                results,
+            )
+            for nodeid, paths in coverage.items():
+                if nodeid == IMPORTS:  # only the files imported this session
+                    self.con.executemany(
+                        "DELETE FROM coverage WHERE nodeid = ? AND path = ?",
+                        [(nodeid, p) for p in paths],
+                    )
+                else:
+                    self.con.execute("DELETE FROM coverage WHERE nodeid = ?", (nodeid,))
+                self.con.executemany(
+                    "INSERT INTO coverage (nodeid, path, hashes) VALUES (?, ?, ?)",
+                    [(nodeid, p, blob) for p, blob in paths.items()],
+                )
+
+    def prune(self, seen: set[str]) -> None:
+        """Forget tests that a full run no longer collected."""
+        gone = [(n,) for (n,) in self.con.execute("SELECT nodeid FROM tests") if n not in seen]
+        with self.con:
+            self.con.execute("BEGIN")
+            self.con.executemany("DELETE FROM tests WHERE nodeid = ?", gone)
+            self.con.executemany("DELETE FROM coverage WHERE nodeid = ?", gone)
+
+    def has_map(self) -> bool:
+        return self.con.execute("SELECT 1 FROM tests LIMIT 1").fetchone() is not None
+
+    def mapped_paths(self) -> list[str]:
+        return [p for (p,) in self.con.execute("SELECT DISTINCT path FROM coverage")]
+
+    def coverage_of(self, path: str) -> list[tuple[str, bytes]]:
+        return self.con.execute(
+            "SELECT nodeid, hashes FROM coverage WHERE path = ?", (path,)
+        ).fetchall()
+
+    def digests(self) -> dict[str, str]:
+        return dict(self.con.execute("SELECT path, digest FROM files"))
+
+    def set_digests(self, digests: dict[str, str | None]) -> None:
+        with self.con:
+            self.con.execute("BEGIN")
+            self.con.executemany(
+                "INSERT OR REPLACE INTO files (path, digest) VALUES (?, ?)", digests.items()
+            )
+
+    def tests(self) -> dict[str, tuple[str, str | None, float | None, float | None]]:
+        """nodeid -> (file, outcome, duration, last_failed)."""
+        rows = self.con.execute("SELECT nodeid, file, outcome, duration, last_failed FROM tests")
+        return {r[0]: r[1:] for r in rows}
+
+
+@dataclass
+class Selection:
+    full: bool
+    reason: str
+    args: list[str] = field(default_factory=list)  # nodeids / test files, in run order
+    digests: dict[str, str | None] = field(default_factory=dict)  # to store once run
+
+
+def _test_files(root: Path, known: set[str]) -> list[str]:
+    """Test files under tests/ and the top-level dirs that already hold known tests."""
+    parts = [Path(f).parts for f in known]
+    tops = {p[0] for p in parts if len(p) > 1} | {"tests"}
+    out = [f.name for f in root.glob("test_*.py")] if any(len(p) == 1 for p in parts) else []
+    for top in sorted(tops):
+        for dirpath, dirnames, filenames in os.walk(root / top):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+            for name in filenames:
+                if name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py")):
+                    out.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return sorted(out)
+
+
+def select(db: ImpactDB, root: Path, now: float | None = None) -> Selection:
+    """What to run for the current state of `root` (see the module docstring)."""
+    now = time.time() if now is None else now
+    stored = db.digests()
+    globals_now = {f"global:{g}": digest(root / g) for g in GLOBAL_FILES}
+    if not db.has_map():
+        return Selection(True, "no impact map yet", digests=globals_now)
+    if any(stored.get(k) != d for k, d in globals_now.items()):
+        return Selection(True, "a global test file changed", digests=globals_now)
+    last_full = db.get_meta("last_full")  # None after only hinted runs
+    if last_full is not None and now - float(last_full) > FULL_MAX_AGE_S:
+        return Selection(True, "impact map is stale", digests=globals_now)
+    if int(db.get_meta("since_full", "0")) >= FULL_EVERY:
+        return Selection(True, f"periodic full run (every {FULL_EVERY})", digests=globals_now)
+
+    tests = db.tests()
+    changed: dict[str, str | None] = {}
+    for path in db.mapped_paths():
+        d = digest(root / path)
+        if d != stored.get(path):
+            changed[path] = d
+    affected: set[str] = set()
+    for path, d in changed.items():
+        current = file_hashes(root / path) if d else set()
+        rows = db.coverage_of(path)
+        stale = [n for n, blob in rows if not current.issuperset(unpack(blob))]
+        if IMPORTS in stale:  # module-level code changed
+            stale = [n for n, _ in rows]
+        affected.update(n for n in stale if n != IMPORTS)
+    affected.update(n for n, t in tests.items() if t[1] == "failed")
+
+    known_files = {t[0] for t in tests.values()}
+    whole = {f for f in _test_files(root, known_files) if f not in known_files or f in changed}
+    nodeids = [n for n in affected if n in tests and tests[n][0] not in whole]
+    # recently failing first, then fastest first
+    nodeids.sort(key=lambda n: (-(tests[n][3] or 0), tests[n][2] or 0.0, n))
+    failing_files = {tests[n][0] for n in tests if tests[n][1] == "failed"}
+    files = sorted(whole, key=lambda f: (f not in failing_files, f))
+    failing = [f for f in files if f in failing_files]
+    args = failing + nodeids + [f for f in files if f not in failing_files]
+    reason = f"{len(changed)} changed file(s) -> {len(nodeids)} test(s), {len(files)} file(s)"
+    return Selection(False, reason, args, {**globals_now, **changed})
+
+
+@dataclass
+class ImpactRun:
+    returncode: int
+    mode: str  # "full", "selected", "hinted", "none" or "plain"
+    reason: str
+    args: list[str]
+    stdout: str = ""
+    stderr: str = ""
+
+
+@dataclass
+class ImpactPlan:
+    """The pytest commands for one impact run; finish_impacted() once they exit."""
+
+    root: Path
+    mode: str
+    reason: str
+    args: list[str]
+    commands: list[list[str]]  # one per shard, empty when there is nothing to run
+    env: dict[str, str]
+    digests: dict[str, str | None] = field(default_factory=dict)
+    weights: Path | None = None
+
+
+def _pytest_env() -> dict[str, str]:
+    env = dict(os.environ)
+    repo = str(Path(__file__).resolve().parents[2])  # so the plugin imports anywhere
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (repo, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def _shard_weights(db: ImpactDB, root: Path) -> Path:
+    """Seconds per test file, written once so that every shard splits alike."""
+    weights: dict[str, float] = {}
+    for file, _, duration, _ in db.tests().values():
+        weights[file] = weights.get(file, 0.0) + (duration or 0.0)
+    fd, tmp = tempfile.mkstemp(prefix="weights.", suffix=".json", dir=root / ".testimpact")
+    with os.fdopen(fd, "w") as f:
+        json.dump(weights, f)
+    return Path(tmp)
+
+
+def _sharded(
+    base: list[str], args: list[str], shards: int, weights: Path | None
+) -> list[list[str]]:
+    if shards <= 1:
+        return [[*PYTEST, *base, *args]]
+    extra = ["--impact-weights", str(weights)] if weights else []
+    return [
+        [*PYTEST, *base, "--impact-shard", f"{i}/{shards}", *extra, *args] for i in range(shards)
+    ]
+
+
+def plan_impacted(
+    root: Path | str,
+    *,
+    full: bool = False,
+    hint: list[str] | None = None,
+    extra: list[str] | None = None,
+    shards: int = 1,
+) -> ImpactPlan:
+    """
+    Select the tests affected by changes under `root` (all of them with
+    `full`) and split them into up to `shards` pytest commands, by test
+    file and balanced on recorded durations. `hint` (test paths) replaces
+    the full run that would build a missing map; the map then fills in
+    over later runs.
+    """
+    root = Path(root).resolve()
+    base = ["-q", *(extra or []), "-p", PLUGIN]
+    env = _pytest_env()
+    if importlib.util.find_spec("pytest") is None:
+        return ImpactPlan(root, "none", "pytest is not installed", [], [], env)
+    if os.environ.get(IMPACT_ENV, "").lower() in {"0", "off", "false", "no"}:
+        n = min(shards, max(1, len(_test_files(root, set()))))
+        cmds = _sharded(base, [], n, None)
+        return ImpactPlan(root, "plain", f"{IMPACT_ENV}=off", [], cmds, env)
+    db_path = root / DB_NAME
+    db = ImpactDB(db_path)
+    try:
+        sel = select(db, root)
+        if full:
+            sel = Selection(True, "full run requested", digests=sel.digests)
+        mode = "full" if sel.full else "selected"
+        if sel.full and hint is not None and not db.has_map():
+            sel = Selection(False, "no impact map yet; hinted tests", hint, sel.digests)
+            mode = "hinted"
+        if not sel.full and not sel.args:
+            db.set_digests(sel.digests)
+            db.set_meta(since_full=int(db.get_meta("since_full", "0")) + 1)
+            return ImpactPlan(root, "none", sel.reason + "; nothing to run", [], [], env)
+        base += ["--impact-db", str(db_path), "--impact-root", str(root)]
+        if sel.full:
+            base.append("--impact-full")
+            files = _test_files(root, {t[0] for t in db.tests().values()})
+        else:
+            files = sorted({a.split("::")[0] for a in sel.args})
+        n = min(shards, max(1, len(files)))
+        weights = _shard_weights(db, root) if n > 1 else None
+        cmds = _sharded(base, sel.args, n, weights)
+        return ImpactPlan(root, mode, sel.reason, sel.args, cmds, env, sel.digests, weights)
+    finally:
+        db.close()
+
+
+def finish_impacted(plan: ImpactPlan, returncodes: list[int | None]) -> None:
+    """
+    Record a plan's run; `returncodes` per command, None for one that was
+    stopped. Only a run whose commands all completed moves the stored
+    digests forward, so tests a stopped shard skipped are selected again.
+    """
+    if plan.weights is not None:
+        plan.weights.unlink(missing_ok=True)
+    if plan.mode in ("plain", "none"):
+        return
+    done = {0, 1, 5} if len(plan.commands) > 1 else {0, 1}  # 5: a shard got no tests
+    if not all(rc in done for rc in returncodes):
+        return
+    db = ImpactDB(plan.root / DB_NAME)
+    try:
+        # the stored map now reflects these contents, plus files this run
+        # mapped for the first time (all of them after a full run)
+        known = {} if plan.mode == "full" else db.digests()
+        new = {p: digest(plan.root / p) for p in db.mapped_paths() if p not in known}
+        if plan.mode == "full":
+            db.set_meta(last_full=time.time(), since_full=0)
+        else:
+            db.set_meta(since_full=int(db.get_meta("since_full", "0")) + 1)
+        db.set_digests({**new, **plan.digests})
+    finally:
+        db.close()
+
+
+def combined_returncode(returncodes: list[int | None]) -> int:
+    """One pytest exit code for several shards: a failure wins, 5 only if all are 5."""
+    codes = [1 if rc is None else rc for rc in returncodes]
+    bad = [rc for rc in codes if rc not in (0, 5)]
+    if bad:
+        return bad[0]
+    return 5 if codes and all(rc == 5 for rc in codes) else 0
+
+
+def run_impacted(
+    root: Path | str,
+    *,
+    full: bool = False,
+    hint: list[str] | None = None,
+    extra: list[str] | None = None,
+    shards: int = 1,
+    timeout: int = TIMEOUT_S,
+) -> ImpactRun:
+    """plan_impacted() and run its commands side by side (see there)."""
+    from master_ai.tools.shell import run
+
+    plan = plan_impacted(root, full=full, hint=hint, extra=extra, shards=shards)
+    if not plan.commands:
+        return ImpactRun(0, plan.mode, plan.reason, plan.args)
+
+    def one(cmd: list[str]):
+        return run(cmd, cwd=str(plan.root), timeout=timeout, env=plan.env)
+
+    with ThreadPoolExecutor(len(plan.commands)) as pool:
+        done = list(pool.map(one, plan.commands))
+    rcs = [cp.returncode for cp in done]
+    finish_impacted(plan, rcs)
+    rc = rcs[0] if len(rcs) == 1 else combined_returncode(rcs)
+    out = "\n".join(cp.stdout for cp in done)
+    err = "\n".join(cp.stderr for cp in done)
+    return ImpactRun(rc, plan.mode, plan.reason, plan.args, out, err)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# MASTER_AI_TRACE=1 turns tracing on for every Agent run (same as --trace).
+ENV = "MASTER_AI_TRACE"
+
+_NULL = nullcontext()
+
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "t0")
+
+    def __init__(self, tracer: Tracer, name: str, cat: str, args: dict[str, Any]) -> None:
+        self.tracer, self.name, self.cat, self.args = tracer, name, cat, args
+        self.t0 = 0.0
+
+    def __enter__(self) -> _Span:
+        self.t0 = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.complete(self.name, self.t0, _now_us(), self.cat, self.args)
+
+
+class Tracer:
+    """
+    Collects spans in the Chrome trace-event format ("X" complete events,
+    microsecond timestamps) and writes them as JSON that chrome://tracing
+    and https://ui.perfetto.dev open directly.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self.pid = os.getpid()
+        self.origin = _now_us()
+        self.events: list[dict[str, Any]] = []
+        self._threads: dict[int, str] = {}
+
+    def span(self, name: str, cat: str = "master_ai", args: dict | None = None) -> _Span:
+        return _Span(self, name, cat, args or {})
+
+    def _tid(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        return tid
+
+    def complete(
+        self, name: str, t0: float, t1: float, cat: str = "master_ai", args: dict | None = None
+    ) -> None:
+        # list.append is atomic: worker threads record without a lock
+        self.events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": round(t0 - self.origin, 3),
+                "dur": round(t1 - t0, 3),
+                "pid": self.pid,
+                "tid": self._tid(),
+                "args": args or {},
+            }
+        )
+
+    def instant(self, name: str, cat: str = "master_ai", args: dict | None = None) -> None:
+        self.events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "i",
+                "s": "t",
+                "ts": round(_now_us() - self.origin, 3),
+                "pid": self.pid,
+                "tid": self._tid(),
+                "args": args or {},
+            }
+        )
+
+    def save(self) -> Path:
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": n}}
+            for tid, n in list(self._threads.items())
+        ]
+        doc = {"traceEvents": meta + list(self.events), "displayTimeUnit": "ms"}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps(doc))
+        os.replace(tmp, self.path)
+        return self.path
+
+
+# One active tracer per process (the Agent runs one run at a time); spans from
+# pool threads land in the same trace.
+_active: Tracer | None = None
+
+
+def enabled() -> bool:
+    return _active is not None
+
+
+def env_enabled() -> bool:
+    return os.environ.get(ENV, "").lower() in {"1", "true", "on", "yes"}
+
+
+def start(path: Path | str) -> Tracer:
+    global _active
+    _active = Tracer(path)
+    return _active
+
+
+def stop() -> Path | None:
+    """Deactivate tracing and write the trace file; returns its path."""
+    global _active
+    t, _active = _active, None
+    return t.save() if t is not None else None
+
+
+def span(name: str, cat: str = "master_ai", **args: Any):
+    """
+    `with span("name", key=value):` records a timed slice when tracing is on.
+    When off it returns a shared no-op context manager (one global lookup).
+    """
+    t = _active
+    if t is None:
+        return _NULL
+    return t.span(name, cat, args)
+
+
+def instant(name: str, cat: str = "master_ai", **args: Any) -> None:
+    t = _active
+    if t is not None:
+        t.instant(name, cat, args)
+
+
+def traced(name: str | None = None, cat: str = "master_ai") -> Callable[[F], F]:
+    """Decorator: run the function inside a span (named after it by default)."""
+
+    def deco(fn: F) -> F:
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*a: Any, **kw: Any) -> Any:
+            t = _active
+            if t is None:
+                return fn(*a, **kw)
+            with t.span(label, cat, {}):
+                return fn(*a, **kw)
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
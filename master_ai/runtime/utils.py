@@ -4,6 +4,8 @@ import os
 import subprocess
 from pathlib import Path
 
+from . import trace
+
 # Where runs land by default (used by other modules too)
 RUNS_ROOT = Path("artifacts/runs")
 
@@ -48,7 +50,9 @@ def run_stream(
         env.update(env_add)
 
     # Use bash if available for nicer -lc behavior; otherwise fall back to /bin/sh
-    if _bash_available():
+    with trace.span("bash_probe"):  # a full login shell: profile cost shows up here
+        has_bash = _bash_available()
+    if has_bash:
         args = ["/bin/bash", "-lc", cmd]
     else:
         args = ["/bin/sh", "-c", cmd]
@@ -56,13 +60,14 @@ def run_stream(
     # NOTE: If you later implement a strict "safe_mode", this is the place to add checks:
     # e.g., verify the command against an allowlist before executing.
 
-    proc = subprocess.Popen(
-        args,
-        cwd=str(workdir),
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-    )
+    with trace.span("popen", argv=args[:2]):
+        proc = subprocess.Popen(
+            args,
+            cwd=str(workdir),
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
     return proc
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import os
+import signal
 import subprocess
-from collections.abc import Sequence
+import sys
+from collections.abc import Mapping, Sequence
 
 ALLOWED = {
     "python",
     "pytest",
     "pip",
+    "ruff",
+    "mypy",
+    "dmypy",
     "echo",
     "ls",
     "cat",
@@ -17,11 +23,44 @@ ALLOWED = {
 }
 
 
+def _check(cmd: Sequence[str]) -> None:
+    # sys.executable: our own interpreter by full path, e.g. for `-m pytest`
+    if cmd and cmd[0] not in ALLOWED and cmd[0] != sys.executable:
+        raise RuntimeError(f"Command not allowed: {cmd[0]}")
+
+
 def run(
-    cmd: Sequence[str], cwd: str | None = None, timeout: int = 120
+    cmd: Sequence[str],
+    cwd: str | None = None,
+    timeout: int = 120,
+    env: Mapping[str, str] | None = None,
 ) -> subprocess.CompletedProcess:
-    if cmd and cmd[0] not in ALLOWED:
-        raise RuntimeError(f"Command not allowed: {cmd[0]}")
+    _check(cmd)
     return subprocess.run(
-        cmd, cwd=cwd, capture_output=True, text=True, timeout=timeout, check=False
+        cmd, cwd=cwd, env=env, capture_output=True, text=True, timeout=timeout, check=False
     )
+
+
+def start(
+    cmd: Sequence[str], cwd: str | None = None, env: Mapping[str, str] | None = None
+) -> subprocess.Popen:
+    """Like run() but returns at once; the caller communicate()s or stop()s it."""
+    _check(cmd)
+    return subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,  # its own process group, see stop()
+    )
+
+
+def stop(proc: subprocess.Popen, sig: int = signal.SIGTERM) -> None:
+    """Signal a start()ed process and everything it spawned."""
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass
@@ -1,9 +1,15 @@
 """
 Model Selector
 ==============
-Chooses the cheapest model that satisfies a requested metric.
+Chooses a model from prices plus live measurements.
 
-• Pricing table lives in MODELS.
+• Pricing table lives in PRICES (model_prices.json).
+• record(model, ...)  -> per-call latency / TTFT / tokens/s / errors / cost,
+  kept as EWMAs plus a window of recent samples (for percentiles) in
+  SQLite, so every process shares them and an update is one UPSERT.
+• route(...)  -> candidate models best-first for a latency SLO and budget;
+  degraded models (error EWMA high, or tripped by consecutive failures)
+  sink to the end, which gives ai_utils.gpt() its failover order.
 • choose_model(metric)  -> returns the model_id string
 • update_price(model_id, price)  -> runtime update (auto-persists JSON)
 """
@@ -11,9 +17,25 @@ Chooses the cheapest model that satisfies a requested metric.
 from __future__ import annotations
 
 import json
+import math
+import os
 import pathlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
 
 DATA_PATH = pathlib.Path("model_prices.json")
+# "off" disables recording; any other value is the SQLite file to use.
+STATS_ENV = "MASTER_AI_MODEL_STATS"
+STATS_PATH = pathlib.Path.home() / "automation" / "cache" / "model_stats.sqlite3"
+ALPHA = 0.2  # EWMA weight of the newest sample
+SAMPLES_PER_MODEL = 256  # window for percentiles
+TRIM_EVERY = 32  # a model's calls between trims of its window
+MIN_CALLS = 5  # before the error EWMA can mark a model degraded
+MAX_ERROR_RATE = 0.5
+TRIP_AFTER = 3  # consecutive failures that take a model out...
+COOLDOWN_S = 60.0  # ...for this long
 
 # fall-back pricing table (USD per 1K tokens)
 DEFAULT_PRICES = {
@@ -41,22 +63,251 @@ PRICES: dict[str, float] = _load_prices()
 
 
 # ──────────────────────────────────────────────────────────────
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    model TEXT PRIMARY KEY,
+    calls INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    error_ewma REAL NOT NULL DEFAULT 0,
+    latency_ewma REAL,
+    ttft_ewma REAL,
+    tps_ewma REAL,
+    cost REAL NOT NULL DEFAULT 0,
+    fail_streak INTEGER NOT NULL DEFAULT 0,
+    down_until REAL NOT NULL DEFAULT 0,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model TEXT NOT NULL,
+    ts REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    latency REAL,
+    ttft REAL
+);
+CREATE INDEX IF NOT EXISTS samples_model ON samples(model, id);
+"""
+
+
+def _ewma(col: str) -> str:
+    # NULL sample keeps the average; the first sample seeds it
+    return (
+        f"{col} = CASE WHEN excluded.{col} IS NULL THEN {col}"
+        f" WHEN {col} IS NULL THEN excluded.{col}"
+        f" ELSE {col} + {ALPHA} * (excluded.{col} - {col}) END"
+    )
+
+
+_UPSERT = f"""
+INSERT INTO models (model, calls, errors, error_ewma, latency_ewma, ttft_ewma, tps_ewma, cost,
+                    fail_streak, down_until, updated)
+VALUES (:model, 1, :err, :err, :latency, :ttft, :tps, :cost, :err, 0, :now)
+ON CONFLICT(model) DO UPDATE SET
+    calls = calls + 1,
+    errors = errors + excluded.errors,
+    error_ewma = error_ewma + {ALPHA} * (excluded.error_ewma - error_ewma),
+    {_ewma("latency_ewma")},
+    {_ewma("ttft_ewma")},
+    {_ewma("tps_ewma")},
+    cost = cost + excluded.cost,
+    fail_streak = CASE WHEN excluded.errors THEN fail_streak + 1 ELSE 0 END,
+    down_until = CASE WHEN excluded.errors AND fail_streak + 1 >= {TRIP_AFTER}
+                      THEN :now + {COOLDOWN_S} ELSE down_until END,
+    updated = excluded.updated
+RETURNING calls
+"""
+
+
+@dataclass
+class ModelStats:
+    model: str
+    calls: int = 0
+    errors: int = 0
+    error_ewma: float = 0.0
+    latency_ewma: float | None = None
+    ttft_ewma: float | None = None
+    tps_ewma: float | None = None
+    cost: float = 0.0
+    fail_streak: int = 0
+    down_until: float = 0.0
+    latency_p50: float | None = None
+    latency_p95: float | None = None
+    ttft_p95: float | None = None
+
+    def degraded(self, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        if self.down_until > now:
+            return True
+        return self.calls >= MIN_CALLS and self.error_ewma > MAX_ERROR_RATE
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+class StatsStore:
+    """Per-model live stats in SQLite (WAL); safe across threads and processes."""
+
+    def __init__(self, path: pathlib.Path | str = STATS_PATH) -> None:
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._con.row_factory = sqlite3.Row
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._con.close()
+
+    def record(
+        self,
+        model: str,
+        *,
+        ok: bool,
+        latency: float | None = None,
+        ttft: float | None = None,
+        tokens: int | None = None,
+        out_tokens: int | None = None,
+        now: float | None = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        gen = latency - (ttft or 0) if latency is not None else None
+        tps = out_tokens / gen if ok and out_tokens and gen and gen > 0 else None
+        cost = (tokens or 0) / 1000 * PRICES.get(model, 0.0)
+        row = {
+            "model": model,
+            "err": 0 if ok else 1,
+            "latency": latency if ok else None,
+            "ttft": ttft if ok else None,
+            "tps": tps,
+            "cost": cost,
+            "now": now,
+        }
+        with self._lock:
+            (calls,) = self._con.execute(_UPSERT, row).fetchone()
+            self._con.execute(
+                "INSERT INTO samples (model, ts, ok, latency, ttft) VALUES (?, ?, ?, ?, ?)",
+                (model, now, int(ok), row["latency"], row["ttft"]),
+            )
+            if calls % TRIM_EVERY == 0:  # trim this model's window now and then
+                self._con.execute(
+                    "DELETE FROM samples WHERE model = ? AND id <= (SELECT id FROM samples"
+                    " WHERE model = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (model, model, SAMPLES_PER_MODEL),
+                )
+
+    def get(self, model: str) -> ModelStats:
+        with self._lock:
+            row = self._con.execute("SELECT * FROM models WHERE model = ?", (model,)).fetchone()
+            samples = self._con.execute(
+                "SELECT latency, ttft FROM samples WHERE model = ? AND ok = 1"
+                " ORDER BY id DESC LIMIT ?",
+                (model, SAMPLES_PER_MODEL),
+            ).fetchall()
+        if row is None:
+            return ModelStats(model)
+        st = ModelStats(**{k: row[k] for k in row.keys() if k != "updated"})
+        lat = [r["latency"] for r in samples if r["latency"] is not None]
+        ttft = [r["ttft"] for r in samples if r["ttft"] is not None]
+        st.latency_p50, st.latency_p95 = _percentile(lat, 0.5), _percentile(lat, 0.95)
+        st.ttft_p95 = _percentile(ttft, 0.95)
+        return st
+
+
+_store: StatsStore | None = None
+_store_lock = threading.Lock()
+
+
+def stats_store() -> StatsStore | None:
+    """The store configured by MASTER_AI_MODEL_STATS (None when off)."""
+    global _store
+    setting = os.environ.get(STATS_ENV, "")
+    if setting.lower() in {"0", "off", "false", "no"}:
+        return None
+    path = pathlib.Path(setting) if setting else STATS_PATH
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = StatsStore(path)
+        return _store
+
+
+def close_stats_store() -> None:
+    """Close the shared store; the next stats_store() opens it again."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = None
+
+
+def record(model: str, **kw) -> None:
+    """Record one call (see StatsStore.record); a no-op when stats are off."""
+    store = stats_store()
+    if store is not None:
+        store.record(model, **kw)
+
+
+def get_stats(model: str) -> ModelStats:
+    store = stats_store()
+    return store.get(model) if store is not None else ModelStats(model)
+
+
+def route(
+    *,
+    max_latency_s: float | None = None,
+    max_ttft_s: float | None = None,
+    budget_per_1k: float | None = None,
+    prefer: str | None = None,
+    candidates: list[str] | None = None,
+) -> list[str]:
+    """
+    Candidate models best-first: healthy before degraded, then within
+    budget, then meeting the SLO (p95 latency / TTFT; unmeasured models
+    count as meeting it so they get tried), then `prefer`, then cheaper,
+    then faster.
+    """
+    now = time.time()
+    ranked = []
+    for m in candidates or list(PRICES):
+        st = get_stats(m)
+        price = PRICES.get(m, math.inf)
+        slow = (max_latency_s is not None and (st.latency_p95 or 0) > max_latency_s) or (
+            max_ttft_s is not None and (st.ttft_p95 or 0) > max_ttft_s
+        )
+        over = budget_per_1k is not None and price > budget_per_1k
+        speed = st.latency_p50 if st.latency_p50 is not None else math.inf
+        ranked.append(((st.degraded(now), over, slow, m != prefer, price, speed), m))
+    return [m for _, m in sorted(ranked)]
+
+
 def choose_model(metric: str = "cheap") -> str:
     """
     metric:
-        "cheap"   – lowest cost
-        "premium" – top-tier (gpt-4o)
-        "speed"   – mid-range but faster (gpt-3.5 / haiku)
+        "cheap"   – lowest cost (healthy models first)
+        "premium" – top-tier (gpt-4o), unless it is degraded
+        "speed"   – lowest measured median latency; before any
+                    measurements, mid-range but faster (gpt-3.5 / haiku)
     """
     if metric == "premium":
-        return "gpt-4o"
+        return route(prefer="gpt-4o", candidates=["gpt-4o", "claude-3-sonnet"])[0]
     if metric == "speed":
-        return min(
-            PRICES,
-            key=lambda m: (PRICES[m], m not in ("gpt-3.5-turbo", "claude-3-haiku")),
-        )
+        now = time.time()
+
+        def key(m: str):
+            st = get_stats(m)
+            measured = st.latency_p50 if st.latency_p50 is not None else math.inf
+            heuristic = (PRICES[m], m not in ("gpt-3.5-turbo", "claude-3-haiku"))
+            return (st.degraded(now), measured, heuristic)
+
+        return min(PRICES, key=key)
     # default: cheapest
-    return min(PRICES, key=PRICES.get)
+    return route()[0]
 
 
 def update_price(model_id: str, price_per_1k: float) -> None:
@@ -4,53 +4,63 @@ Streamlit chat for MasterAI — smooth log updates
 ------------------------------------------------
   ▸ ##status##   – latest self-edit timestamp
   ▸ /run …       – launch master_ai build loop
-Logs are tailed by a background thread which triggers st.rerun()
-only when the file changes → no page flashing.
-History lives in ./chat_history/<session>.json
+  ▸ anything else – streamed from gpt_stream(), rendered as tokens arrive
+The end of the script follows logs/current_run.log incrementally
+(ai_helpers.log_tail: only appended bytes are read, inotify wakes it) and
+patches just the right panel → no page flashing, no full reruns. With
+MASTER_AI_EVENTS_URL set, the right panel instead follows the newest run's
+event stream (SSE) the same way.
+History lives in ./chat_history/<session>/ (append-only JSONL segments);
+prompts carry its rolling summary plus recent turns (ai_helpers.memory).
 """
 
 from __future__ import annotations
 
 import datetime
 import glob
-import importlib
-import json
 import os
 import pathlib
-import threading
 import time
 import uuid
+from collections import deque
+from collections.abc import Iterator
 
 import streamlit as st
 
+from ai_helpers.ai_utils import gpt_stream
+from ai_helpers.chat_store import ChatStore, open_history
+from ai_helpers.log_tail import DirWatcher, LogTail
+from ai_helpers.memory import ConversationMemory
+from master_ai.runtime.eventstream import events_url, subscribe
+
 ROOT = pathlib.Path(__file__).resolve().parent
 LOG_FILE = ROOT / "logs" / "current_run.log"
 HIST_DIR = ROOT / "chat_history"
 HIST_DIR.mkdir(exist_ok=True)
+HISTORY_WINDOW = 200  # messages restored into a session
+RUNS_ROOT = ROOT / "artifacts" / "runs"
+EVENTS_URL = events_url()
 
 
 # ──── helpers ──────────────────────────────────────────────────────────────
-def _hist_path(sid: str) -> pathlib.Path:
-    return HIST_DIR / f"{sid}.json"
+def _history(sid: str) -> ChatStore:
+    return open_history(HIST_DIR / f"{sid}.json")  # migrates an old <sid>.json
 
 
-def _save_history() -> None:
-    if "sid" in st.session_state and "messages" in st.session_state:
-        _hist_path(st.session_state.sid).write_text(json.dumps(st.session_state.messages, indent=2))
+def _save_history(msg: dict) -> None:
+    if "sid" in st.session_state:
+        _history(st.session_state.sid).append(msg)
 
 
 def _load_history(sid: str) -> list[dict]:
-    p = _hist_path(sid)
-    if p.exists():
-        try:
-            return json.loads(p.read_text())
-        except Exception:
-            pass
-    return []
+    try:
+        return _history(sid).last(HISTORY_WINDOW)
+    except Exception:
+        return []
 
 
-def master_ai_chat(prompt: str) -> str:
-    """Dispatch prompt to built-ins or master_ai.gpt_chat()."""
+def master_ai_chat(prompt: str, history: list[dict] | None = None) -> Iterator[str]:
+    """Dispatch prompt to built-ins or gpt_stream(); yields the reply as it arrives."""
     lower = prompt.strip().lower()
     if lower == "##status##":
         plans = sorted(glob.glob("plans/plan_*.txt"), key=os.path.getmtime, reverse=True)
@@ -58,47 +68,103 @@ def master_ai_chat(prompt: str) -> str:
             ts = datetime.datetime.fromtimestamp(os.path.getmtime(plans[0])).strftime(
                 "%Y-%m-%d %H:%M:%S"
             )
-            return f"Latest micro-project: {os.path.basename(plans[0])} (edited {ts})"
-        return "No recorded self-edits yet."
+            yield f"Latest micro-project: {os.path.basename(plans[0])} (edited {ts})"
+        else:
+            yield "No recorded self-edits yet."
+        return
     if lower.startswith("/run ") and len(prompt.strip()) > 10:
         from ai_helpers.run_goal import run_goal_async
 
-        return run_goal_async(prompt[5:].strip())
-    try:
-        master_ai = importlib.import_module("master_ai")
-        resp = master_ai.gpt_chat(prompt)
-        return resp.get("result", "(empty)")
-    except Exception as e:
-        return f"⚠️ error: {e}"
+        yield run_goal_async(prompt[5:].strip())
+        return
+    yield from gpt_stream(prompt, history)
+
+
+def _bubble(role: str, content: str) -> str:
+    align = "right" if role == "user" else "left"
+    colour = "#0078d4" if role == "user" else "#2d2d2d"
+    return (
+        f"<div style='text-align:{align}; margin:4px 0;'>"
+        f"  <span style='display:inline-block; max-width:80%;"
+        f"               background:{colour}; color:white;"
+        f"               padding:8px 12px; border-radius:8px;'>"
+        f"    {content}"
+        f"  </span>"
+        f"</div>"
+    )
 
 
 def add_msg(role: str, content: str) -> None:
-    st.session_state.messages.append({"id": str(uuid.uuid4()), "role": role, "content": content})
-    _save_history()
+    msg = {"id": str(uuid.uuid4()), "role": role, "content": content}
+    st.session_state.messages.append(msg)
+    _save_history(msg)
+
 
+# ──── log tail (incremental) ──────────────────────────────────────────────
+def _log_tail() -> tuple[LogTail, DirWatcher]:
+    """This session's tail of LOG_FILE and its inotify watcher."""
+    if "_tail" not in st.session_state:
+        st.session_state._tail = (LogTail(LOG_FILE), DirWatcher(LOG_FILE))
+    return st.session_state._tail
 
-# ──── background log-tail thread ───────────────────────────────────────────
-def _tail_log() -> None:
-    last_size = 0
+
+def _follow_log(ph) -> None:
+    """Repaint `ph` whenever the log grows; a rerun/stop ends the loop."""
+    tail, watcher = _log_tail()
     while True:
-        try:
-            size = LOG_FILE.stat().st_size
-            if size != last_size:
-                last_size = size
-                lines = LOG_FILE.read_text().splitlines()[-20:]
-                st.session_state._log_tail = "\n".join(lines) if lines else "(idle)"
-                if hasattr(st, "rerun"):
-                    st.rerun()
-            time.sleep(2)
-        except Exception:
-            time.sleep(2)
+        if tail.wait(1.0, watcher):
+            ph.code(tail.text(), language="bash")
+        st.session_state.get("_tail")  # rerun/stop yield point while idle
+
 
+# ──── live run events (push) ───────────────────────────────────────────────
+def _newest_run() -> str | None:
+    try:
+        from master_ai.runtime.catalog import RunCatalog
+
+        cat = RunCatalog(RUNS_ROOT)
+        row = cat.latest()
+        cat.close()
+        if row:
+            return row["run_id"]
+    except Exception:
+        pass
+    runs = sorted(p.name for p in RUNS_ROOT.glob("*") if p.is_dir())
+    return runs[-1] if runs else None
+
+
+def _event_line(ev: dict) -> str:
+    data = ev.get("data") or {}
+    detail = data.get("line") or data.get("text") or data.get("result") or data.get("op") or ""
+    return f"{str(ev.get('ts', ''))[11:19]} {ev.get('kind')} {detail}".rstrip()
+
+
+def _follow_events(ph) -> None:
+    """Stream the newest run's events into `ph`, resuming from the session's cursor."""
+    run_id = _newest_run()
+    if not run_id:
+        return
+    feed = st.session_state.setdefault("_ev_feed", {"run": None, "cursor": 0})
+    if feed["run"] != run_id:
+        feed.update(run=run_id, cursor=0, lines=deque(maxlen=20))
+    try:
+        stream = subscribe(
+            EVENTS_URL,
+            run_id,
+            feed["cursor"],
+            reconnect=False,
+            heartbeat=1.0,
+            on_idle=lambda: st.session_state.get("_ev_feed"),  # rerun/stop yield point
+        )
+        for offset, ev in stream:
+            feed["cursor"] = offset
+            feed["lines"].append(_event_line(ev))
+            ph.code("\n".join(feed["lines"]), language="bash")
+            if ev.get("kind") == "run_finished":
+                return
+    except (OSError, RuntimeError):
+        pass
 
-if "_log_thread" not in st.session_state:
-    st.session_state._log_tail = "(idle)"
-    t = threading.Thread(target=_tail_log, daemon=True)
-    t.start()
-    st.session_state._log_thread = t
 
 # ──── page config / state ─────────────────────────────────────────────────
 st.set_page_config(page_title="MasterAI Chat", layout="wide")
@@ -118,31 +184,44 @@ with left:
 with main:
     st.header("💬 Chat")
     for m in st.session_state.messages:
-        align = "right" if m["role"] == "user" else "left"
-        colour = "#0078d4" if m["role"] == "user" else "#2d2d2d"
-        st.markdown(
-            f"<div style='text-align:{align}; margin:4px 0;'>"
-            f"  <span style='display:inline-block; max-width:80%;"
-            f"               background:{colour}; color:white;"
-            f"               padding:8px 12px; border-radius:8px;'>"
-            f"    {m['content']}"
-            f"  </span>"
-            f"</div>",
-            unsafe_allow_html=True,
-        )
+        st.markdown(_bubble(m["role"], m["content"]), unsafe_allow_html=True)
 
     prompt = st.text_input("Message", key="user_in", label_visibility="collapsed")
     if st.button("Send", type="primary") and prompt.strip():
+        # summary of older turns + recent ones within the token window (before this prompt)
+        try:
+            history = ConversationMemory(_history(st.session_state.sid)).context()
+        except Exception:
+            history = [
+                {"role": m["role"], "content": m["content"]}
+                for m in st.session_state.messages[-10:]
+            ]
         add_msg("user", prompt)
-        with st.spinner("MasterAI is thinking…"):
-            reply = master_ai_chat(prompt)
+        st.markdown(_bubble("user", prompt), unsafe_allow_html=True)
+        # Render deltas as they arrive (at most ~20 repaints/s); persist the full text once.
+        out = st.empty()
+        out.markdown(_bubble("assistant", "▌"), unsafe_allow_html=True)
+        reply, painted = "", 0.0
+        for delta in master_ai_chat(prompt, history):
+            reply += delta
+            if time.monotonic() - painted > 0.05:
+                out.markdown(_bubble("assistant", reply + "▌"), unsafe_allow_html=True)
+                painted = time.monotonic()
+        out.markdown(_bubble("assistant", reply), unsafe_allow_html=True)
         add_msg("assistant", reply)
         if hasattr(st, "rerun"):
             st.rerun()
 
 with right:
     st.header("🧠 Thoughts / Doing")
-    st.code(st.session_state._log_tail, language="bash")
+    live_panel = st.empty()
+    if EVENTS_URL:
+        feed = st.session_state.get("_ev_feed")
+        live_panel.code("\n".join(feed["lines"]) if feed else "(idle)", language="bash")
+    else:
+        tail, _ = _log_tail()
+        tail.poll()
+        live_panel.code(tail.text(), language="bash")
 
 # open browser locally
 if os.getenv("STREAMLIT_AUTOLAUNCH"):
@@ -150,3 +229,9 @@ if os.getenv("STREAMLIT_AUTOLAUNCH"):
     import webbrowser
 
     _th.Timer(1.0, lambda: webbrowser.open("http://localhost:8501")).start()
+
+# Last: block on the event stream / log, patching only the right panel.
+if EVENTS_URL:
+    _follow_events(live_panel)
+else:
+    _follow_log(live_panel)
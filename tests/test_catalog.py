@@ -0,0 +1,36 @@
+import json
+
+from master_ai.runtime.catalog import RunCatalog
+
+
+def _write_run(root, run_id, goal, result, rcs):
+    d = root / run_id
+    d.mkdir()
+    events = [{"ts": "2025-08-08T21:33:25", "kind": "run_started", "data": {"goal": goal}}]
+    events.append({"kind": "plan_ready", "data": {"steps": [{}] * len(rcs)}})
+    events += [{"kind": "action_done", "data": {"rc": rc, "seconds": 0.5}} for rc in rcs]
+    events.append({"ts": "2025-08-08T21:33:27", "kind": "run_finished", "data": {"result": result}})
+    (d / "events.jsonl").write_text("".join(json.dumps(e) + "\n" for e in events))
+
+
+def test_rebuild_and_query(tmp_path):
+    _write_run(tmp_path, "20250808_213325", "say hello", "OK", [0])
+    _write_run(tmp_path, "20250809_101010", "fetch data", "FAILED", [0, 1])
+    cat = RunCatalog(tmp_path)
+    assert cat.rebuild() == 2
+
+    assert [r["run_id"] for r in cat.query()] == ["20250809_101010", "20250808_213325"]
+    (failed,) = cat.query(status="failed")
+    assert (failed["steps_total"], failed["steps_done"], failed["steps_failed"]) == (2, 2, 1)
+    assert cat.query(goal="hello")[0]["duration"] == 2
+    assert cat.count() == 2
+    assert cat.query(limit=1, offset=1)[0]["run_id"] == "20250808_213325"
+
+
+def test_agent_style_updates(tmp_path):
+    cat = RunCatalog(tmp_path)
+    cat.run_started("r1", "run: echo hi", True)
+    assert cat.latest()["status"] == "RUNNING"
+    cat.run_finished("r1", "OK", steps_total=1, steps_done=1, step_seconds=0.25)
+    row = cat.latest()
+    assert row["status"] == "OK" and row["duration"] >= 0
@@ -0,0 +1,41 @@
+import json
+
+from ai_helpers.chat_store import ChatStore, open_history
+
+
+def test_last_spans_segments_and_compact_trims(tmp_path):
+    store = ChatStore(tmp_path / "h", segment_bytes=200)
+    for i in range(50):
+        store.append({"role": "user", "content": f"m{i}"})
+    assert len(store.segments()) > 3
+    assert [m["content"] for m in store.last(3)] == ["m47", "m48", "m49"]
+    assert len(store.last(100)) == len(store) == 50
+
+    assert store.base() == 0
+    dropped = store.compact(keep_segments=1, max_messages=10)
+    assert dropped == 40 and len(store.segments()) == 2
+    assert [m["content"] for m in store] == [f"m{i}" for i in range(40, 50)]
+    assert store.base() == 40 and store.compact(keep_segments=1, max_messages=10) == 0
+
+
+def test_torn_append_is_repaired(tmp_path):
+    store = ChatStore(tmp_path / "h")
+    store.extend([{"n": 1}, {"n": 2}])
+    seg = store.segments()[0]
+    with seg.open("ab") as f:  # crash mid-write: no index entry, partial line
+        f.write(b'{"n": 3}\n{"n"')
+    assert store.last(5) == [{"n": 1}, {"n": 2}, {"n": 3}]
+    store.append({"n": 4})
+    assert [m["n"] for m in store] == [1, 2, 3, 4]
+
+
+def test_open_history_migrates_legacy_json(tmp_path):
+    legacy = tmp_path / "20250101_000000.json"
+    legacy.write_text(json.dumps([{"role": "user", "content": "hi"}], indent=2))
+    store = open_history(legacy)
+    assert store.last(10) == [{"role": "user", "content": "hi"}]
+    assert not legacy.exists() and legacy.with_name(legacy.name + ".migrated").exists()
+
+    project = tmp_path / "chat_history.json"
+    project.write_text(json.dumps({"dialog": [{"t": 1, "role": "user", "content": "x"}]}))
+    assert open_history(project).last(1)[0]["content"] == "x"
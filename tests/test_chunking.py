@@ -0,0 +1,34 @@
+from ai_helpers.chunking import RegexTokenizer, chunk_text, map_reduce
+
+TOK = RegexTokenizer()
+
+
+def test_chunks_respect_budget_boundaries_and_overlap():
+    paras = [f"Paragraph {i} " + "word " * 40 for i in range(30)]
+    code = "```python\n" + "\n".join(f"x{i} = {i}" for i in range(20)) + "\n```"
+    text = "\n\n".join(paras[:15] + [code] + paras[15:])
+    chunks = chunk_text(text, max_tokens=200, overlap=60, tokenizer=TOK)
+    assert all(TOK.count(c) <= 200 for c in chunks)
+    assert any(code in c for c in chunks)  # the code block is never cut
+    assert all(c.startswith(("Paragraph", "```")) for c in chunks)  # no mid-paragraph starts
+    assert chunks[1].split("\n\n")[0] in chunks[0]  # overlap carries a whole paragraph
+
+
+def test_oversized_piece_falls_back_to_finer_boundaries():
+    text = "Sentence one is here. " * 200 + "x" * 5000
+    chunks = chunk_text(text, max_tokens=100, overlap=0, tokenizer=TOK)
+    assert all(TOK.count(c) <= 100 for c in chunks)
+    assert "".join(chunks).replace(" ", "").count("x") == 5000
+
+
+def test_map_reduce_merges_hierarchically():
+    calls = []
+
+    def ask(prompts):
+        calls.append(len(prompts))
+        return [ValueError("boom") if "fail" in p else f"A{len(p)}" for p in prompts]
+
+    text = "\n\n".join(f"part {i} " + "y " * 150 for i in range(12)) + "\n\nfail"
+    out = map_reduce(text, ask, max_tokens=400, overlap=0, tokenizer=TOK)
+    assert calls[0] > 1 and calls[-1] == 1 and len(calls) >= 2
+    assert out.startswith("A") and out.endswith("❌ Error processing chunk: boom")
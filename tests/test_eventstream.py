@@ -0,0 +1,32 @@
+import threading
+
+from master_ai.runtime.events import EventBus
+from master_ai.runtime.eventstream import start_event_server, subscribe
+
+
+def test_subscribe_replays_from_cursor_then_streams_live(tmp_path):
+    bus = EventBus(tmp_path / "r1")
+    bus.emit("run_started", {"goal": "g"})
+    bus.emit("progress", {"current": 1})
+    srv = start_event_server(tmp_path)
+    url = f"http://127.0.0.1:{srv.server_address[1]}"
+    try:
+        first = next(subscribe(url, "r1", reconnect=False, timeout=5))
+        assert first[1]["kind"] == "run_started"
+
+        got = []
+
+        def consume():
+            for off, ev in subscribe(url, "r1", first[0], reconnect=False, timeout=5):
+                got.append((off, ev["kind"]))
+                if ev["kind"] == "run_finished":
+                    return
+
+        t = threading.Thread(target=consume)
+        t.start()
+        bus.emit("run_finished", {"result": "OK"})
+        t.join(5)
+        assert [k for _, k in got] == ["progress", "run_finished"]
+        assert got[-1][0] == bus.path.stat().st_size
+    finally:
+        srv.shutdown()
@@ -0,0 +1,77 @@
+import subprocess
+import threading
+import time
+
+import executor
+from master_ai.runtime.testimpact import ImpactRun
+
+
+def test_apply_plan_generates_files_concurrently(tmp_path, monkeypatch):
+    lock, state = threading.Lock(), {"now": 0, "peak": 0}
+    ran = []
+
+    def fake_gpt(prompt):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        time.sleep(0.1)
+        with lock:
+            state["now"] -= 1
+        if "broken.py" in prompt:
+            return "❌ GPT error: boom"
+        return "# v2\n" if "# v1" in prompt else "# v1\n"
+
+    monkeypatch.setattr(executor, "PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr(executor, "gpt", fake_gpt)
+    monkeypatch.setattr(executor, "_run_tests", lambda touched, full: ran.append(touched))
+    (tmp_path / "broken.py").write_text("keep me\n")
+    steps = [f"Create pkg/m{i}.py" for i in range(4)] + ["Fix broken.py", "Improve pkg/m0.py"]
+
+    t0 = time.perf_counter()
+    written = executor.apply_plan(steps)
+    assert time.perf_counter() - t0 < 0.45  # m0's two passes bound it, not the sum
+    assert state["peak"] > 1
+    assert written == [f"pkg/m{i}.py" for i in range(4)]
+    assert (tmp_path / "pkg/m0.py").read_text() == "# v2\n"  # same-file steps ran in order
+    assert (tmp_path / "broken.py").read_text() == "keep me\n"
+    assert ran == [[tmp_path / t for t in written]]
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_related_tests_by_name_and_import(tmp_path):
+    (tmp_path / "tests").mkdir()
+    for name, body in {
+        "test_alpha.py": "",
+        "test_uses.py": "from pkg.beta import x\n",
+        "test_other.py": "import pkg.betamax\n",
+        "test_from.py": "from pkg import alpha2, beta\n",
+    }.items():
+        (tmp_path / "tests" / name).write_text(body)
+    touched = [tmp_path / "alpha.py", tmp_path / "pkg" / "beta.py", tmp_path / "tests/test_x.py"]
+    (tmp_path / "tests/test_x.py").write_text("")
+    got = executor.related_tests(touched, tmp_path)
+    names = ("test_alpha.py", "test_from.py", "test_uses.py", "test_x.py")
+    assert got == sorted(str(tmp_path / "tests" / n) for n in names)
+
+
+def test_full_suite_runs_only_after_the_affected_tests_pass(monkeypatch, capsys):
+    calls, codes = [], [1]
+
+    def fake_run(root, full=False, hint=None):
+        calls.append(full)
+        return ImpactRun(codes[len(calls) - 1], "full" if full else "selected", "", [], "ok")
+
+    monkeypatch.setattr(executor, "run_impacted", fake_run)
+    executor._run_tests(full_suite=True)
+    assert calls == [False]
+    calls.clear()
+    codes[:] = [0, 0]
+    executor._run_tests(full_suite=True)
+    assert calls == [False, True]
+
+    def timeout(root, full=False, hint=None):
+        raise subprocess.TimeoutExpired(["pytest"], 1)
+
+    monkeypatch.setattr(executor, "run_impacted", timeout)
+    executor._run_tests(full_suite=True)
+    assert "tests not run" in capsys.readouterr().out
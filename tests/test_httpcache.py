@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+from master_ai.runtime import net
+from master_ai.runtime.httpcache import CachedBody, HttpCache, freshness_lifetime
+
+
+class _Resp:
+    def __init__(self, status, headers, body=b""):
+        self.status_code = status
+        self.headers = headers
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_a):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+    def iter_content(self, _n):
+        yield self.body
+
+
+def test_freshness_lifetime():
+    assert freshness_lifetime({"cache-control": "public, max-age=60"}) == 60
+    assert freshness_lifetime({"cache-control": "no-cache, max-age=60"}) == 0
+    assert freshness_lifetime({}) == 0
+
+
+def test_fresh_then_revalidate(tmp_path):
+    cache = HttpCache(tmp_path)
+    seen = []
+
+    def get(headers):
+        seen.append(headers)
+        if headers:
+            return _Resp(304, {"Cache-Control": "max-age=0"})
+        return _Resp(200, {"ETag": '"v1"', "Cache-Control": "max-age=3600"}, b"hello")
+
+    assert cache.fetch("http://x/a", get).status == "miss"
+    assert cache.fetch("http://x/a", get).status == "fresh"
+    assert len(seen) == 1
+
+    cache._db().execute("UPDATE entries SET expires=0")
+    body = cache.fetch("http://x/a", get)
+    assert body.status == "revalidated"
+    assert seen[-1] == {"If-None-Match": '"v1"'}
+    assert body.path.read_bytes() == b"hello"
+
+
+def test_lru_eviction(tmp_path):
+    cache = HttpCache(tmp_path, max_bytes=10)
+
+    def get(_headers):
+        return _Resp(200, {"Cache-Control": "max-age=60"}, b"123456")
+
+    cache.fetch("http://x/old", get)
+    cache.fetch("http://x/new", get)
+    assert cache.lookup("http://x/old") is None
+    assert cache.lookup("http://x/new") is not None
+
+
+def _fetch_together(cache, url, get, n=4):
+    start = threading.Barrier(n)
+    out = []
+
+    def one():
+        start.wait()
+        out.append(cache.fetch(url, get))
+
+    threads = [threading.Thread(target=one) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+def test_concurrent_fetches_share_one_request(tmp_path):
+    cache = HttpCache(tmp_path)
+    calls = []
+
+    def get(_headers):
+        calls.append(1)
+        time.sleep(0.2)
+        return _Resp(200, {"Cache-Control": "max-age=60"}, b"shared")
+
+    bodies = _fetch_together(cache, "http://x/a", get)
+    assert len(calls) == 1
+    assert {b.path.read_bytes() for b in bodies} == {b"shared"}
+
+
+def test_uncached_bodies_are_not_shared(tmp_path):
+    cache = HttpCache(tmp_path)
+    calls = []
+
+    def get(_headers):
+        calls.append(1)
+        time.sleep(0.2)
+        return _Resp(200, {"Cache-Control": "no-store"}, b"mine")
+
+    bodies = _fetch_together(cache, "http://x/private", get)
+    assert len({b.path for b in bodies}) == 4  # each caller owns its temp file
+    assert len(calls) == 4
+
+
+def test_materialize_removes_the_temp_body_when_the_move_fails(tmp_path, monkeypatch):
+    tmp = tmp_path / "cache" / "tmp" / "body"
+    tmp.parent.mkdir(parents=True)
+    tmp.write_bytes(b"data")
+
+    def move(*_a):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr(net.shutil, "move", move)
+    body = CachedBody(tmp, {}, "uncached")
+    dest = tmp_path / "out" / "f"
+    dest.parent.mkdir()
+    with pytest.raises(OSError):
+        net._materialize(HttpCache(tmp_path / "cache"), body, "http://x/f", dest, None, None)
+    assert not tmp.exists() and list(dest.parent.iterdir()) == []
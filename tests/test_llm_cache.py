@@ -0,0 +1,38 @@
+from ai_helpers import ai_utils, llm_client
+from ai_helpers.llm_cache import LLMCache, cache_key
+
+
+def test_key_is_canonical():
+    msgs = [{"role": "user", "content": "hi"}]
+    a = cache_key("m", msgs, temperature=0, top_p=1)
+    assert a == cache_key("m", msgs, top_p=1, temperature=0)
+    assert cache_key("m", msgs) != cache_key("m2", msgs)
+
+
+def test_ttl_lru_and_disk_cap(tmp_path):
+    cache = LLMCache(tmp_path / "c.sqlite3", ttl=10, memory_entries=2, disk_bytes=1000)
+    cache.put("a", "x" * 100, now=0)
+    assert cache.get("a", now=5) == "x" * 100
+    assert cache.get("a", now=11) is None  # expired
+
+    for i in range(20):
+        cache.put(f"k{i}", "y" * 100, now=20 + i)
+    assert len(cache._mem) == 2
+    assert len(cache) <= 9 and cache.get("k19", now=45) is not None
+    assert cache.get("k0", now=45) is None  # least recently used went first
+
+    reopened = LLMCache(tmp_path / "c.sqlite3")
+    assert reopened.get("k19", now=45) == "y" * 100  # served from disk
+
+
+def test_gpt_stub_backend_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("MASTER_AI_LLM_BACKEND", "stub")
+    monkeypatch.setenv("MASTER_AI_LLM_CACHE", str(tmp_path / "llm.sqlite3"))
+    monkeypatch.setenv("MASTER_AI_MODEL_STATS", "off")
+    calls = []
+    real = llm_client._stub_reply
+    monkeypatch.setattr(llm_client, "_stub_reply", lambda msgs: calls.append(1) or real(msgs))
+    assert ai_utils.gpt("plan it") == ai_utils.gpt("plan it") == "[stub] plan it"
+    assert len(calls) == 1
+    ai_utils.gpt("plan it", cache=False)
+    assert len(calls) == 2
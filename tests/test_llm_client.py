@@ -0,0 +1,81 @@
+import random
+import threading
+import time
+
+import pytest
+
+from ai_helpers.llm_client import LLMClient, RateLimited, RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def _no_cache(monkeypatch):
+    monkeypatch.setenv("MASTER_AI_LLM_CACHE", "off")
+    monkeypatch.setenv("MASTER_AI_MODEL_STATS", "off")
+
+
+def test_map_is_concurrent_bounded_and_ordered():
+    lock, state = threading.Lock(), {"now": 0, "peak": 0}
+
+    def transport(model, msgs):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        time.sleep(random.uniform(0.01, 0.03))
+        with lock:
+            state["now"] -= 1
+        return msgs[-1]["content"].upper(), 10
+
+    client = LLMClient(max_concurrency=4, transport=transport)
+    prompts = [[{"role": "user", "content": f"p{i}"}] for i in range(20)]
+    t0 = time.perf_counter()
+    assert client.map(prompts) == [f"P{i}" for i in range(20)]
+    assert state["peak"] == 4
+    assert time.perf_counter() - t0 < 0.3  # ~5 waves, not 20 sequential calls
+
+
+def test_429_backs_off_and_halves_concurrency():
+    calls = []
+
+    def transport(model, msgs):
+        calls.append(time.monotonic())
+        if len(calls) <= 2:
+            raise RateLimited(retry_after=0.05)
+        return "ok", None
+
+    client = LLMClient(max_concurrency=8, transport=transport)
+    assert client.complete([{"role": "user", "content": "x"}]) == "ok"
+    assert len(calls) == 3 and calls[2] - calls[0] >= 0.1
+    assert client.limiter.limit == 2
+
+    def always_limited(model, msgs):
+        raise RateLimited(retry_after=0)
+
+    client = LLMClient(transport=always_limited, max_retries=2)
+    with pytest.raises(RateLimited):
+        client.complete([{"role": "user", "content": "x"}])
+
+
+def test_token_budget_delays_admission():
+    limiter = RateLimiter(max_concurrency=4, tpm=60000)  # 1000 tokens/s
+    limiter.acquire(60000)
+    limiter.release(ok=True)
+    t0 = time.perf_counter()
+    limiter.acquire(100)
+    assert time.perf_counter() - t0 >= 0.08
+
+
+def test_stream_yields_deltas_retries_before_first_and_caches(tmp_path, monkeypatch):
+    monkeypatch.setenv("MASTER_AI_LLM_CACHE", str(tmp_path / "llm.sqlite3"))
+    calls = []
+
+    def stream(model, msgs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RateLimited(retry_after=0)
+        yield from ["Hel", "lo", "!"]
+
+    client = LLMClient(stream_transport=stream, backend="fake")
+    msgs = [{"role": "user", "content": "hi"}]
+    assert list(client.stream(msgs)) == ["Hel", "lo", "!"]
+    assert list(client.stream(msgs)) == ["Hello!"] and len(calls) == 2  # cache hit
+    assert client.limiter.active == 0
@@ -0,0 +1,88 @@
+import http.client
+import json
+import random
+
+import pytest
+
+import model_selector
+from ai_helpers.llm_stub import StubConfig, sample, start_stub_server
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kw):
+        srv = start_stub_server(config=StubConfig(ttft="fixed:0", tokens_per_s=0, seed=1, **kw))
+        servers.append(srv)
+        return srv
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def _post(srv, doc):
+    host, port = srv.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=5)
+    headers = {"Content-Type": "application/json"}
+    conn.request("POST", "/v1/chat/completions", json.dumps(doc), headers)
+    return conn.getresponse()
+
+
+def test_sample_specs():
+    rng = random.Random(0)
+    assert sample("fixed:0.5", rng) == 0.5
+    assert all(0.1 <= sample("uniform:0.1,0.2", rng) <= 0.2 for _ in range(100))
+    assert sample("normal:-5,0.1", rng) == 0.0
+    with pytest.raises(ValueError):
+        sample("cauchy:1", rng)
+
+
+def test_completion_uses_canned_reply(stub):
+    srv = stub()
+    msgs = [{"role": "user", "content": "Break the goal into 3–6 high-level steps"}]
+    resp = _post(srv, {"model": "gpt-4o", "messages": msgs})
+    doc = json.loads(resp.read())
+    assert resp.status == 200
+    assert doc["object"] == "chat.completion"
+    assert doc["choices"][0]["message"]["content"].startswith("1. Create hello.py")
+    assert doc["usage"]["completion_tokens"] > 0
+
+
+def test_stream_is_sse_ending_in_done(stub):
+    srv = stub(reply_tokens=5)
+    msgs = [{"role": "user", "content": "x"}]
+    resp = _post(srv, {"model": "m", "stream": True, "messages": msgs})
+    assert resp.headers["Content-Type"] == "text/event-stream"
+    events = [ln[6:] for ln in resp.read().decode().splitlines() if ln.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+    assert len(text.split()) == 5
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+
+def test_injected_429_carries_retry_after(stub):
+    srv = stub(rate_429=1.0, retry_after=2.5)
+    resp = _post(srv, {"model": "m", "messages": []})
+    resp.read()
+    assert resp.status == 429
+    assert resp.headers["Retry-After"] == "2.5"
+    assert srv.stats == {"requests": 1, "throttled": 1}
+
+
+def test_bench_smoke(tmp_path, monkeypatch):
+    pytest.importorskip("openai")
+    from ai_helpers.llm_bench import bench
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    rows = bench(
+        ["gpt", "gpt_stream"], [1, 4], 8, config=StubConfig(ttft="fixed:0.01", tokens_per_s=0)
+    )
+    expected = [(name, level) for name in ("gpt", "gpt_stream") for level in (1, 4)]
+    assert [(r["scenario"], r["concurrency"]) for r in rows] == expected
+    assert all(r["errors"] == 0 and r["p99"] is not None for r in rows)
+    assert rows[-1]["ttft_p50"] <= rows[-1]["p50"]
+    assert model_selector._store is None  # closed with the bench's temp directory
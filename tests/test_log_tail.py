@@ -0,0 +1,38 @@
+import os
+
+from ai_helpers.log_tail import DirWatcher, LogTail, read_last_lines
+
+
+def test_read_last_lines_seeks_from_end(tmp_path):
+    log = tmp_path / "a.log"
+    log.write_text("".join(f"line {i}\n" for i in range(5000)) + "partial")
+    lines, end = read_last_lines(log, 3, block=64)
+    assert lines == ["line 4997", "line 4998", "line 4999"]
+    assert end == log.stat().st_size - len("partial")
+
+
+def test_tail_appends_partial_lines_and_follows_symlink_swap(tmp_path):
+    a, b, link = tmp_path / "a.log", tmp_path / "b.log", tmp_path / "current.log"
+    a.write_text("one\ntwo\n")
+    link.symlink_to(a)
+    tail = LogTail(link, max_lines=2)
+    assert tail.poll() and tail.text() == "one\ntwo"
+    assert not tail.poll()
+
+    with a.open("a") as f:
+        f.write("thr")
+    assert not tail.poll()  # incomplete line is held back
+    with a.open("a") as f:
+        f.write("ee\n")
+    assert tail.poll() and list(tail.lines) == ["two", "three"]
+
+    b.write_text("fresh\n")
+    tmp = tmp_path / "tmp.link"
+    tmp.symlink_to(b)
+    os.replace(tmp, link)
+    watcher = DirWatcher(link)
+    assert tail.wait(1.0, watcher) and tail.text() == "fresh"
+    watcher.close()
+
+    b.write_text("")  # truncated
+    assert tail.poll() and tail.text() == "(idle)"
@@ -0,0 +1,68 @@
+from ai_helpers.chat_store import ChatStore
+from ai_helpers.chunking import RegexTokenizer
+from ai_helpers.memory import ConversationMemory, fit_window, message_tokens
+
+TOK = RegexTokenizer()
+
+
+def _memory(tmp_path, calls, fail=False):
+    def summarize(summary, msgs, max_tokens):
+        calls.append([m["content"] for m in msgs])
+        if fail:
+            raise RuntimeError("model down")
+        return (summary + " " if summary else "") + f"<{len(msgs)} turns>"
+
+    store = ChatStore(tmp_path / "h")
+    return store, ConversationMemory(store, summarize, window_tokens=200, tokenizer=TOK)
+
+
+def test_summary_refresh_is_amortised_and_window_bounded(tmp_path):
+    calls = []
+    store, mem = _memory(tmp_path, calls)
+    for i in range(60):
+        store.append({"role": "user", "content": f"turn {i} " + "word " * 10})
+        ctx = mem.context()
+        assert sum(message_tokens(m, TOK) for m in ctx if m["role"] != "system") <= 200
+    # each refresh folds about half a window, so far fewer calls than turns
+    assert 3 <= len(calls) <= 10
+    assert sum(len(c) for c in calls) == mem.state()["covered"]
+    assert ctx[0]["role"] == "system" and "turns>" in ctx[0]["content"]
+    assert ctx[-1]["content"].startswith("turn 59 ")
+    # reading again without new turns does not summarise again
+    n = len(calls)
+    assert mem.context() == ctx and len(calls) == n
+
+
+def test_failed_refresh_keeps_state_and_trims_window(tmp_path):
+    calls = []
+    store, mem = _memory(tmp_path, calls, fail=True)
+    store.extend({"role": "user", "content": f"turn {i} " + "word " * 10} for i in range(30))
+    ctx = mem.context()
+    assert calls and mem.state() == {"summary": "", "covered": 0}
+    assert ctx[-1]["content"].startswith("turn 29 ")
+    assert sum(message_tokens(m, TOK) for m in ctx) <= 200 + mem.summary_tokens
+
+
+def test_compaction_between_turns_keeps_new_turns_pending(tmp_path):
+    calls = []
+    store, mem = _memory(tmp_path, calls)
+    store.segment_bytes = 300
+    for i in range(30):
+        store.append({"role": "user", "content": f"turn {i} " + "word " * 10})
+    mem.context()
+    covered = mem.state()["covered"]
+    assert 0 < covered < 30
+    assert store.compact(keep_segments=1, max_messages=5) > 0
+    store.extend({"role": "user", "content": f"turn {i} " + "word " * 10} for i in range(30, 33))
+    ctx = mem.context()
+    assert mem.state()["covered"] == covered and len(calls) == 1
+    turns = [m["content"].split()[1] for m in ctx if m["role"] == "user"]
+    assert turns[-3:] == ["30", "31", "32"]
+
+
+def test_fit_window_keeps_leading_system_message():
+    hist = [{"role": "system", "content": "summary"}] + [
+        {"role": "user", "content": "x " * 50} for _ in range(5)
+    ]
+    out = fit_window(hist, 120, TOK)
+    assert out[0]["role"] == "system" and len(out) == 3
@@ -0,0 +1,43 @@
+import threading
+import urllib.request
+
+from master_ai.runtime import metrics
+
+
+def test_render_and_concurrent_updates():
+    c = metrics.counter("t_requests_total", "requests", ["code"])
+    h = metrics.histogram("t_latency_seconds", "latency", buckets=(0.1, 1))
+    assert metrics.counter("t_requests_total", "requests", ["code"]) is c
+
+    def work():
+        for _ in range(1000):
+            c.labels("200").inc()
+            h.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    c.labels(code='5"x').inc()
+
+    text = metrics.render()
+    assert "# TYPE t_requests_total counter" in text
+    assert 't_requests_total{code="200"} 8000' in text
+    assert 't_requests_total{code="5\\"x"} 1' in text
+    assert 't_latency_seconds_bucket{le="0.1"} 0' in text
+    assert 't_latency_seconds_bucket{le="+Inf"} 8000' in text
+    assert "t_latency_seconds_sum 4000" in text
+
+
+def test_http_endpoint_and_textfile(tmp_path):
+    metrics.gauge("t_active", "active").set(3)
+    srv = metrics.start_http_server("127.0.0.1:0")
+    try:
+        url = f"http://127.0.0.1:{srv.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as r:
+            assert "t_active 3" in r.read().decode()
+    finally:
+        srv.shutdown()
+    metrics.write_textfile(tmp_path / "m.prom")
+    assert "t_active 3" in (tmp_path / "m.prom").read_text()
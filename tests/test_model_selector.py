@@ -0,0 +1,82 @@
+import pytest
+
+import model_selector as ms
+from ai_helpers import ai_utils, llm_client
+
+
+def test_stats_ewma_percentiles_and_breaker(tmp_path, monkeypatch):
+    monkeypatch.setenv("MASTER_AI_MODEL_STATS", str(tmp_path / "stats.sqlite3"))
+    for lat in (1.0, 1.0, 1.0, 1.0, 5.0):
+        ms.record("gpt-4o", ok=True, latency=lat, ttft=0.2, tokens=1000, out_tokens=80)
+    st = ms.get_stats("gpt-4o")
+    assert st.calls == 5 and st.latency_p50 == 1.0 and st.latency_p95 == 5.0
+    assert abs(st.latency_ewma - 1.8) < 1e-9 and 80 < st.tps_ewma < 100  # 100 tok/s, then 17
+    assert abs(st.cost - 5 * ms.PRICES["gpt-4o"]) < 1e-9
+    assert not st.degraded()
+
+    for _ in range(ms.TRIP_AFTER):
+        ms.record("gpt-4o", ok=False)
+    assert ms.get_stats("gpt-4o").degraded()
+    assert ms.route(prefer="gpt-4o")[-1] == "gpt-4o"  # failover order puts it last
+
+
+def test_sample_window_is_trimmed_per_model(tmp_path, monkeypatch):
+    monkeypatch.setenv("MASTER_AI_MODEL_STATS", str(tmp_path / "stats.sqlite3"))
+    monkeypatch.setattr(ms, "SAMPLES_PER_MODEL", 8)
+    for _ in range(200):  # interleaved: no model owns every 32nd row id
+        ms.record("gpt-4o", ok=True, latency=1.0)
+        ms.record("gpt-3.5-turbo", ok=True, latency=0.5)
+    con = ms.stats_store()._con
+    counts = dict(con.execute("SELECT model, COUNT(*) FROM samples GROUP BY model"))
+    assert counts and all(n <= 8 + ms.TRIM_EVERY for n in counts.values())
+
+
+def test_rate_limits_do_not_trip_the_breaker(tmp_path, monkeypatch):
+    monkeypatch.setenv("MASTER_AI_MODEL_STATS", str(tmp_path / "stats.sqlite3"))
+    monkeypatch.setenv("MASTER_AI_LLM_CACHE", "off")
+    calls = []
+
+    def transport(model, msgs):
+        calls.append(model)
+        if len(calls) <= ms.TRIP_AFTER:
+            raise llm_client.RateLimited(retry_after=0)
+        return "ok", 10
+
+    def stream(model, msgs):
+        raise llm_client.RateLimited(retry_after=0)
+        yield
+
+    client = llm_client.LLMClient(
+        transport=transport, stream_transport=stream, backend="stub", max_retries=ms.TRIP_AFTER
+    )
+    msgs = [{"role": "user", "content": "hi"}]
+    assert client.complete(msgs, model="gpt-4o") == "ok"
+    with pytest.raises(llm_client.RateLimited):
+        list(client.stream(msgs, model="gpt-4o"))
+    st = ms.get_stats("gpt-4o")
+    assert st.down_until == 0 and st.errors == 0 and not st.degraded()
+
+
+def test_route_honours_slo_and_budget(tmp_path, monkeypatch):
+    monkeypatch.setenv("MASTER_AI_MODEL_STATS", str(tmp_path / "stats.sqlite3"))
+    for _ in range(5):
+        ms.record("claude-3-haiku", ok=True, latency=4.0)
+        ms.record("gpt-3.5-turbo", ok=True, latency=0.5)
+    assert ms.route(max_latency_s=1.0)[0] == "gpt-3.5-turbo"
+    assert ms.route(budget_per_1k=0.0009)[0] == "claude-3-haiku"
+    assert ms.choose_model("speed") == "gpt-3.5-turbo"
+
+
+def test_gpt_fails_over_to_next_model(tmp_path, monkeypatch):
+    monkeypatch.setenv("MASTER_AI_MODEL_STATS", str(tmp_path / "stats.sqlite3"))
+    monkeypatch.setenv("MASTER_AI_LLM_CACHE", "off")
+
+    def transport(model, msgs):
+        if model == "gpt-4o":
+            raise RuntimeError("model overloaded")
+        return f"answer from {model}", 10
+
+    client = llm_client.LLMClient(transport=transport, backend="stub", max_retries=0)
+    monkeypatch.setattr(ai_utils, "default_client", lambda: client)
+    assert ai_utils.gpt("hi").startswith("answer from ")
+    assert ms.get_stats("gpt-4o").errors == 1
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from master_ai.runtime import httpcache, net
+from master_ai.runtime.httpcache import HttpCache
+from master_ai.runtime.net import fetch_file, fetch_many
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.files: dict[str, bytes] = {}
+        self.fail: dict[str, int] = {}  # path -> 500s to send before serving it
+        self.delay = 0.0
+        self.lock = threading.Lock()
+        self.active: dict[str, int] = {}
+        self.peak: dict[str, int] = {}
+        self.requests: list[tuple[str, str | None]] = []  # (path, Range)
+
+    def url(self, path, host="127.0.0.1"):
+        return f"http://{host}:{self.server_port}{path}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        srv, host = self.server, self.headers["Host"].split(":")[0]
+        with srv.lock:
+            srv.requests.append((self.path, self.headers.get("Range")))
+            srv.active[host] = srv.active.get(host, 0) + 1
+            srv.active["*"] = srv.active.get("*", 0) + 1
+            for k in (host, "*"):
+                srv.peak[k] = max(srv.peak.get(k, 0), srv.active[k])
+            failing = srv.fail.get(self.path, 0)
+            if failing:
+                srv.fail[self.path] = failing - 1
+        try:
+            time.sleep(srv.delay)
+            body = srv.files.get(self.path)
+            if failing or body is None:
+                return self._reply(500 if failing else 404)
+            rng = self.headers.get("Range")
+            if not rng:
+                return self._reply(200, body)
+            first, _, last = rng.removeprefix("bytes=").partition("-")
+            first, last = int(first), int(last or len(body) - 1)
+            if first >= len(body):
+                return self._reply(416, headers={"Content-Range": f"bytes */{len(body)}"})
+            cr = f"bytes {first}-{last}/{len(body)}"
+            self._reply(206, body[first : last + 1], {"Content-Range": cr})
+        finally:
+            with srv.lock:
+                srv.active[host] -= 1
+                srv.active["*"] -= 1
+
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    srv = _Server()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_fetch_many_bounds_concurrency_overall_and_per_host(server, tmp_path):
+    server.delay = 0.1
+    for i in range(8):
+        server.files[f"/f{i}"] = b"x" * 100
+    hosts = ["127.0.0.1", "localhost"]
+    items = [(server.url(f"/f{i}", hosts[i % 2]), tmp_path / f"f{i}") for i in range(8)]
+    results = fetch_many(items, max_workers=3, per_host=1)
+    assert all(r.ok and r.bytes == 100 for r in results)
+    assert [r.dest for r in results] == [d for _, d in items]
+    assert server.peak["*"] <= 2  # two hosts, one slot each
+    assert server.peak["127.0.0.1"] == 1 and server.peak["localhost"] == 1
+    server.peak.clear()
+
+    results = fetch_many(items, max_workers=3, per_host=4)
+    assert all(r.ok for r in results)
+    assert server.peak["*"] == 3
+
+
+def test_fetch_many_retries_each_url_on_its_own(server, tmp_path):
+    server.files.update({"/ok": b"fine", "/flaky": b"eventually"})
+    server.fail["/flaky"] = 2
+    items = [(server.url(p), tmp_path / p[1:]) for p in ("/ok", "/flaky", "/missing")]
+    ok, flaky, missing = fetch_many(items, retries=3, backoff=0)
+    assert (ok.ok, ok.attempts) == (True, 1)
+    assert (flaky.ok, flaky.attempts) == (True, 3)
+    assert (tmp_path / "flaky").read_bytes() == b"eventually"
+    assert (missing.ok, missing.attempts) == (False, 3) and "404" in missing.error
+    assert not (tmp_path / "missing").exists()
+
+
+def test_fetch_many_reports_progress(server, tmp_path):
+    for i in range(3):
+        server.files[f"/p{i}"] = b"y" * 1000
+    seen = []
+    items = [(server.url(f"/p{i}"), tmp_path / f"p{i}") for i in range(3)]
+    fetch_many(items, retries=1, on_progress=seen.append)
+    assert {s["files_done"] for s in seen} >= {1, 2, 3}
+    final = next(s for s in seen if s["files_done"] == 3)
+    assert (final["files_total"], final["failed"], final["bytes"]) == (3, 0, 3000)
+
+
+def test_fetch_file_small_file_is_one_request(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(httpcache, "_default", HttpCache(tmp_path / "cache"))
+    monkeypatch.delenv("MASTER_AI_HTTP_CACHE", raising=False)
+    server.files["/small"] = b"tiny"
+    fetch_file(server.url("/small"), tmp_path / "small", cache=False)
+    fetch_file(server.url("/small"), tmp_path / "cached")  # the probe's body fills the cache
+    assert server.requests == [("/small", None)] * 2  # no separate size probe
+    assert (tmp_path / "cached").read_bytes() == b"tiny"
+    assert HttpCache(tmp_path / "cache").lookup(server.url("/small")) is not None
+
+
+def test_fetch_file_resumes_a_partial_download(server, tmp_path):
+    data = bytes(range(256)) * 40
+    server.files["/big"] = data
+    dest = tmp_path / "big"
+    (tmp_path / "big.part").write_bytes(data[:3000])
+    fetch_file(server.url("/big"), dest, cache=False, sha256=hashlib.sha256(data).hexdigest())
+    assert dest.read_bytes() == data and not (tmp_path / "big.part").exists()
+    assert server.requests == [("/big", "bytes=3000-")]
+
+
+def test_fetch_file_checks_a_part_the_server_has_nothing_more_for(server, tmp_path):
+    server.files["/f"] = b"0123456789"
+    dest, part = tmp_path / "f", tmp_path / "f.part"
+    part.write_bytes(b"0123456789")  # complete: 416 with the same total
+    fetch_file(server.url("/f"), dest, cache=False)
+    assert dest.read_bytes() == b"0123456789"
+
+    part.write_bytes(b"0123456789-stale")  # longer than the server's copy
+    fetch_file(server.url("/f"), dest, cache=False, backoff=0)
+    assert dest.read_bytes() == b"0123456789"
+    assert server.requests[-2:] == [("/f", "bytes=16-"), ("/f", None)]
+
+
+def test_fetch_file_segments_large_files_and_verifies(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(net, "SEGMENT_THRESHOLD", 1000)
+    monkeypatch.setattr(net, "MIN_SEGMENT", 1000)
+    data = bytes(range(256)) * 16
+    server.files["/seg"] = data
+    digest = hashlib.sha256(data).hexdigest()
+    fetch_file(server.url("/seg"), tmp_path / "seg", cache=False, segments=4, sha256=digest)
+    assert (tmp_path / "seg").read_bytes() == data
+    assert sorted(r for _, r in server.requests[1:]) == [
+        "bytes=0-1023",
+        "bytes=1024-2047",
+        "bytes=2048-3071",
+        "bytes=3072-4095",
+    ]
+
+    with pytest.raises(RuntimeError, match="sha256 mismatch"):
+        fetch_file(server.url("/seg"), tmp_path / "bad", cache=False, retries=1, sha256="0" * 64)
+    assert list(tmp_path.glob("bad*")) == []
@@ -0,0 +1,31 @@
+from master_ai.agents.planner import make_plan
+
+
+def test_fetch_single_pair():
+    (step,) = make_plan("fetch: https://h/a.txt -> dl/a.txt")
+    assert step.op == "fetch"
+    assert (step.url, step.dest) == ("https://h/a.txt", "dl/a.txt")
+
+
+def test_fetch_multi_line_pairs():
+    (step,) = make_plan("fetch:\nhttps://h/a.bin -> dl/\n# skip\nhttps://h/b.bin dl/b.bin\n")
+    assert step.op == "fetch_many"
+    assert step.items == [
+        {"url": "https://h/a.bin", "dest": "dl/a.bin"},
+        {"url": "https://h/b.bin", "dest": "dl/b.bin"},
+    ]
+
+
+def test_fetch_manifest(tmp_path):
+    manifest = tmp_path / "shards.txt"
+    manifest.write_text("https://h/0.bin -> d/0.bin\nhttps://x/1.bin -> d/1.bin\n")
+    (step,) = make_plan(f"fetch: manifest={manifest}; jobs=16; per_host=2")
+    assert step.op == "fetch_many"
+    assert len(step.items) == 2
+    assert (step.jobs, step.per_host) == (16, 2)
+
+
+def test_fetch_multi_line_key_value_is_a_single_fetch():
+    (step,) = make_plan("fetch: url=https://h/a.txt;\ndest=dl/a.txt")
+    assert step.op == "fetch"
+    assert (step.url, step.dest) == ("https://h/a.txt", "dl/a.txt")
@@ -0,0 +1,57 @@
+import json
+import os
+import time
+
+from master_ai.runtime.catalog import RunCatalog
+from master_ai.runtime.compress import compress_file, read_from
+from master_ai.runtime.events import read_events, read_events_from
+from master_ai.runtime.retention import RetentionPolicy, collect
+
+
+def test_compressed_frames_are_seekable(tmp_path):
+    src = tmp_path / "events.jsonl"
+    src.write_text(
+        "".join(json.dumps({"kind": "log", "data": {"i": i}}) + "\n" for i in range(500))
+    )
+    raw = src.read_bytes()
+    dst = compress_file(src, codec="gzip", frame_bytes=1024)
+    assert not src.exists() and dst.name == "events.jsonl.gz"
+    assert b"".join(read_from(dst, 12345)) == raw[12345:]
+    assert len(read_events(tmp_path)) == 500
+    assert read_events_from(tmp_path, 0)[1] == len(raw)
+
+
+def _run(root, run_id, age_days, status="OK", files=None):
+    d = root / run_id
+    d.mkdir()
+    (d / "events.jsonl").write_text(json.dumps({"kind": "run_started", "data": {}}) + "\n")
+    for name, body in (files or {}).items():
+        (d / name).write_text(body)
+    cat = RunCatalog(root)
+    cat.run_started(run_id, "goal", True, started=time.time() - age_days * 86400)
+    cat.run_finished(run_id, status, finished=time.time() - age_days * 86400)
+    cat.close()
+    return d
+
+
+def test_collect_deletes_compacts_and_dedupes(tmp_path):
+    root = tmp_path / "runs"
+    root.mkdir()
+    old = _run(root, "r_old", 90)
+    a = _run(root, "r_a", 5, files={"dummy.py": "x = 1\n"})
+    b = _run(root, "r_b", 4, status="FAILED", files={"dummy.py": "x = 1\n"})
+    fresh = _run(root, "r_new", 0)
+
+    dry = collect(RetentionPolicy(keep_last=10, max_age_days=30), root=root, dry_run=True)
+    assert dry.deleted == ["r_old"] and old.exists()
+
+    r = collect(RetentionPolicy(keep_last=10, max_age_days=30), root=root)
+    assert r.deleted == ["r_old"] and not old.exists()
+    assert sorted(r.compacted) == ["r_a", "r_b"]
+    assert os.stat(a / "dummy.py").st_ino == os.stat(b / "dummy.py").st_ino
+    assert (a / "events.jsonl.gz").exists() and (fresh / "events.jsonl").exists()
+    assert read_events(a)[0]["kind"] == "run_started"
+
+    r = collect(RetentionPolicy(keep_last=1, max_age_days=None, statuses=("failed",)), root=root)
+    assert r.deleted == ["r_b"]
+    assert [row["run_id"] for row in RunCatalog(root).query()] == ["r_new", "r_a"]
@@ -0,0 +1,44 @@
+import sys
+import time
+
+from master_ai.agents.reviewer import Gate, first_failure, run_gates, run_quality_gates
+from master_ai.runtime.testimpact import IMPACT_ENV, ImpactDB, plan_impacted
+
+
+def test_first_failing_gate_cancels_the_rest(tmp_path):
+    t0 = time.perf_counter()
+    fail, slow = run_gates(
+        [Gate("fail", ["sh", "-c", "exit 3"]), Gate("slow", ["sh", "-c", "sleep 30"])], tmp_path
+    )
+    assert (fail.status, fail.returncode) == ("failed", 3)
+    assert (slow.status, slow.returncode) == ("cancelled", None)
+    assert time.perf_counter() - t0 < 10
+
+
+def test_reported_failure_is_the_gate_that_failed_not_one_it_cancelled(tmp_path):
+    results = run_gates(
+        [Gate("mypy", ["sh", "-c", "sleep 30"]), Gate("pytest", ["sh", "-c", "exit 3"])], tmp_path
+    )
+    assert [r.status for r in results] == ["cancelled", "failed"]
+    failed = first_failure(results)
+    assert (failed.name, failed.returncode) == ("pytest", 3)
+    assert first_failure(results[:1]).name == "mypy" and first_failure([]) is None
+
+
+def test_tests_run_in_shards_and_fill_the_impact_map(tmp_path, monkeypatch):
+    monkeypatch.delenv(IMPACT_ENV, raising=False)
+    (tmp_path / "tests").mkdir()
+    for name in "abc":
+        (tmp_path / "tests" / f"test_{name}.py").write_text(
+            f"def test_{name}1():\n    pass\n\n\ndef test_{name}2():\n    pass\n"
+        )
+
+    results = run_quality_gates(tmp_path, shards=2, check=False)
+    shards = [r for r in results if r.name.startswith("pytest")]
+    assert [r.name for r in shards] == ["pytest[0/2]", "pytest[1/2]"]
+    assert all(r.status == "passed" for r in shards)
+    assert shards[0].cmd[:3] == [sys.executable, "-m", "pytest"]
+    db = ImpactDB(tmp_path / ".testimpact" / "impact.sqlite3")
+    assert len(db.tests()) == 6  # every test ran in exactly one shard, none was pruned
+    db.close()
+    assert plan_impacted(tmp_path, shards=2).mode == "none"
@@ -0,0 +1,84 @@
+import pytest
+
+from master_ai.runtime.summarize import summarize_stream, summarize_text
+
+
+def test_summarize_html_skips_script_and_style():
+    html = (
+        "<html><head><title>T &amp; x</title><style>a{}</style>"
+        "<script>var s = '<p>no</p>';</script></head>"
+        "<body><h1>Head</h1><p>one\ntwo</p></body></html>"
+    )
+    assert summarize_text(html, 4) == "T & x\nHead\none\ntwo"
+
+
+def test_inline_tags_separate_words():
+    assert summarize_text("<b>Hello</b><i>World</i> foo") == "Hello World foo"
+
+
+def test_plain_text_with_angle_brackets_is_not_parsed_as_html():
+    assert summarize_text("if a<b and c>d: ok") == "if a<b and c>d: ok"
+    assert summarize_stream(["x = 1\n", "if a<b and c>d: ok\n"]) == "x = 1\nif a<b and c>d: ok"
+
+
+def test_summarize_stream_stops_early():
+    consumed = []
+
+    def chunks():
+        for i in range(1000):
+            consumed.append(i)
+            yield f"line {i}\n".encode()
+
+    assert summarize_stream(chunks(), 3) == "line 0\nline 1\nline 2"
+    assert len(consumed) < 10
+
+
+def test_summarize_bytes_splits_multibyte_chars():
+    data = ("é" * 20000 + "\nok\n").encode("utf-8")
+    assert summarize_text(data, 2) == "é" * 20000 + "\nok"
+
+
+def test_summarize_many_files_ordered(tmp_path):
+    from master_ai.runtime.summarize import summarize_many
+
+    paths = []
+    for i in range(40):
+        p = tmp_path / f"doc{i}.txt"
+        p.write_text(f"title {i}\nbody\n")
+        paths.append(p)
+    paths.append(tmp_path / "missing.txt")
+
+    out = list(summarize_many(paths, max_lines=1, jobs=2, ordered=True))
+    assert [r["summary"] for r in out[:40]] == [f"title {i}" for i in range(40)]
+    assert out[-1]["ok"] is False
+
+
+def test_extractive_mode_picks_central_sentences_in_order():
+    pytest.importorskip("numpy")
+    text = (
+        "The cache stores responses on disk.\n"
+        "Unrelated banana smoothie recipe with mango.\n"
+        "Stale cache responses are revalidated on disk.\n"
+        "The disk cache evicts old responses.\n"
+    )
+    out = summarize_text(text, 2, mode="extractive").splitlines()
+    assert len(out) == 2
+    assert all("cache" in s for s in out)
+    assert out == sorted(out, key=text.index)
+
+
+def test_extractive_mode_falls_back_to_short_sentences():
+    pytest.importorskip("numpy")
+    text = "One sentence here. Another sentence there! Third one? Yes."
+    out = summarize_text(text, 2, mode="extractive").splitlines()
+    assert len(out) == 2
+    assert out == sorted(out, key=text.index)
+
+
+def test_extractive_blocks_agree_with_one_pass():
+    pytest.importorskip("numpy")
+    from master_ai.runtime.extractive import summarize_lines
+
+    lines = [f"filler line number {i} about gardening tools" for i in range(30)]
+    lines += [f"cache disk responses entry {i} stale cache" for i in range(5)]
+    assert summarize_lines(lines, 3, block_sentences=4) == summarize_lines(lines, 3)
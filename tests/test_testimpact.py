@@ -0,0 +1,62 @@
+from master_ai.runtime.testimpact import IMPACT_ENV, ImpactDB, line_hashes, run_impacted
+
+
+def _project(root):
+    (root / "pkg").mkdir()
+    (root / "pkg" / "__init__.py").write_text("")
+    (root / "pkg" / "calc.py").write_text(
+        "SCALE = 1\n\n\ndef add(x, y):\n    return x + y\n\n\ndef mul(x, y):\n    return x * y\n"
+    )
+    (root / "tests").mkdir()
+    (root / "tests" / "test_calc.py").write_text(
+        "from pkg.calc import add, mul\n\n\n"
+        "def test_add():\n    assert add(1, 2) == 3\n\n\n"
+        "def test_mul():\n    assert mul(2, 3) == 6\n"
+    )
+    (root / "conftest.py").write_text(
+        "import pathlib, sys\nsys.path.insert(0, str(pathlib.Path(__file__).parent))\n"
+    )
+
+
+def _edit(path, old, new):
+    path.write_text(path.read_text().replace(old, new))
+
+
+def test_runs_only_affected_tests_failures_first(tmp_path, monkeypatch):
+    monkeypatch.delenv(IMPACT_ENV, raising=False)
+    _project(tmp_path)
+    calc = tmp_path / "pkg" / "calc.py"
+
+    first = run_impacted(tmp_path)
+    assert (first.returncode, first.mode) == (0, "full")
+    assert run_impacted(tmp_path).mode == "none"
+
+    _edit(calc, "return x * y", "return x * y + 1")
+    broken = run_impacted(tmp_path)
+    assert (broken.returncode, broken.args) == (1, ["tests/test_calc.py::test_mul"])
+
+    _edit(calc, "return x + y", "return y + x")  # mul still failing: it goes first
+    both = run_impacted(tmp_path)
+    assert both.args == ["tests/test_calc.py::test_mul", "tests/test_calc.py::test_add"]
+
+    _edit(calc, "SCALE = 1", "SCALE = 2")  # module level: every test of the file
+    _edit(calc, "return x * y + 1", "return x * y")
+    fixed = run_impacted(tmp_path)
+    assert fixed.returncode == 0 and len(fixed.args) == 2
+
+    (tmp_path / "tests" / "test_new.py").write_text("def test_new():\n    pass\n")
+    assert run_impacted(tmp_path).args == ["tests/test_new.py"]
+    db = ImpactDB(tmp_path / ".testimpact" / "impact.sqlite3")
+    assert set(db.tests()) == {
+        "tests/test_calc.py::test_add",
+        "tests/test_calc.py::test_mul",
+        "tests/test_new.py::test_new",
+    }
+    db.close()
+
+
+def test_line_hashes_see_edits_next_to_a_line():
+    before = line_hashes(["def f():", "    return 1", ""])
+    after = line_hashes(["def f():", "    x = 0", "    return 1", ""])
+    assert before[1] in after  # "return 1" still followed by ""
+    assert before[0] not in after  # "def f():" now followed by the inserted line
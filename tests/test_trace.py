@@ -0,0 +1,34 @@
+import json
+import threading
+
+from master_ai.runtime import trace
+
+
+@trace.traced("work")
+def _work():
+    with trace.span("inner", n=1):
+        pass
+
+
+def test_spans_written_as_chrome_trace(tmp_path):
+    assert trace.span("off") is trace.span("also off")  # shared no-op when disabled
+    trace.start(tmp_path / "trace.json")
+    try:
+        with trace.span("outer"):
+            _work()
+            t = threading.Thread(target=_work, name="worker")
+            t.start()
+            t.join()
+            trace.instant("mark")
+    finally:
+        path = trace.stop()
+    assert not trace.enabled()
+
+    events = json.loads(path.read_text())["traceEvents"]
+    spans = {(e["name"], e["tid"]): e for e in events if e["ph"] == "X"}
+    assert sorted({name for name, _ in spans}) == ["inner", "outer", "work"]
+    outer = next(e for (n, _), e in spans.items() if n == "outer")
+    for e in spans.values():
+        assert outer["ts"] <= e["ts"] and e["ts"] + e["dur"] <= outer["ts"] + outer["dur"]
+    assert any(e["ph"] == "M" and e["args"]["name"] == "worker" for e in events)
+    assert any(e["ph"] == "i" and e["name"] == "mark" for e in events)
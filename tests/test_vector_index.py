@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ai_helpers.chat_store import ChatStore  # noqa: E402
+from ai_helpers.vector_index import HashingEmbedder, VectorIndex  # noqa: E402
+
+
+def test_hashing_embedder_is_deterministic_and_unit_length():
+    emb = HashingEmbedder(64)
+    a, b = emb.embed(["deploy the docker image", "deploy the docker image"])
+    assert np.array_equal(a, b) and abs(float(np.linalg.norm(a)) - 1) < 1e-5
+    assert not emb.embed([""]).any()
+
+
+def test_sync_indexes_sources_incrementally_and_search_ranks(tmp_path):
+    (tmp_path / "skills.json").write_text(json.dumps({"lessons": ["Pin numpy below 3"]}))
+    plans = tmp_path / "plans"
+    plans.mkdir()
+    (plans / "plan_1.txt").write_text("1. Build the docker image\n\n2. Push it to the registry")
+    store = ChatStore(tmp_path / "chats" / "s1")
+    store.append({"role": "user", "content": "how do I rotate the gmail oauth token?"})
+    ix = VectorIndex(tmp_path / "ix", HashingEmbedder(128))
+
+    def sync():
+        return ix.sync(tmp_path / "skills.json", plans, [tmp_path / "chats"])
+
+    assert sync() == 4 and sync() == 0
+    store.append({"role": "assistant", "content": "delete token.pickle and re-run the oauth setup"})
+    assert sync() == 1 and len(ix) == 5
+
+    hits = ix.search("rotate the oauth token", k=2)
+    assert [h.source for h in hits] == ["chat", "chat"]
+    assert hits[0].score >= hits[1].score > 0
+    assert ix.search("docker image", k=1, sources=["plan"])[0].id == "plan:plan_1.txt:0"
+    assert ix.search("docker image", k=3, sources=["lesson"])[0].text == "Pin numpy below 3"
+
+
+def test_chat_ids_survive_compaction(tmp_path):
+    store = ChatStore(tmp_path / "chats" / "s1", segment_bytes=200)
+    for i in range(12):
+        store.append({"role": "user", "content": f"message number {i} about the deploy"})
+    ix = VectorIndex(tmp_path / "ix", HashingEmbedder(64))
+
+    def sync():
+        return ix.sync(tmp_path / "skills.json", tmp_path / "plans", [tmp_path / "chats"])
+
+    assert sync() == 12
+    assert store.compact(keep_segments=1, max_messages=4) > 0
+    store.append({"role": "user", "content": "a new question about the gmail token"})
+    assert sync() == 1 and sync() == 0
+    hit = ix.search("new question gmail token", k=1)[0]
+    assert hit.id == f"chat:{store.root}:12" and "gmail" in hit.text
+
+
+def test_ivf_search_matches_brute_force_on_clear_neighbours(tmp_path):
+    ix = VectorIndex(tmp_path / "ix", HashingEmbedder(64))
+    topics = ["docker build push", "gmail oauth token", "pytest fixtures", "sqlite wal mode"]
+    ix.add((f"{t}-{i}", "note", f"{t} note {i}") for t in topics for i in range(50))
+    brute = ix.search("sqlite wal mode note", k=5)
+    ix.build_ivf(nlist=8)
+    ivf = ix.search("sqlite wal mode note", k=5, nprobe=2)
+    assert {h.id for h in ivf} == {h.id for h in brute}
+    ix.add([("late", "note", "added after the partition")])  # scanned until the next build
+    assert ix.search("added after the partition", k=1, nprobe=1)[0].id == "late"
@@ -1,8 +1,9 @@
 # ui/monitor.py
 from __future__ import annotations
 
-import json
+import sys
 import time
+from collections import deque
 from pathlib import Path
 from typing import Any
 
@@ -10,6 +11,14 @@ import streamlit as st
 
 # ---------- Config ----------
 ROOT = Path.cwd()
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from master_ai.runtime.catalog import RunCatalog  # noqa: E402
+from master_ai.runtime.compress import compressed_path, raw_size, read_from  # noqa: E402
+from master_ai.runtime.events import read_events_from  # noqa: E402
+from master_ai.runtime.eventstream import events_url, subscribe  # noqa: E402
+
 RUNS_ROOT = ROOT / "artifacts" / "runs"
 RUNS_ROOT.mkdir(parents=True, exist_ok=True)
 
@@ -17,36 +26,33 @@ PAGE_TITLE = "Master-AI — Run Monitor"
 SIDEBAR_REFRESH_DEFAULT = 2  # seconds
 RECENT_EVENTS_LIMIT = 12
 STEP_LOG_MAX_BYTES = 64 * 1024  # 64 KB
+RUN_LIST_LIMIT = 200
 
 
 # ---------- Helpers ----------
-def list_runs(root: Path = RUNS_ROOT) -> list[Path]:
-    runs = [p for p in root.iterdir() if p.is_dir()]
-    runs.sort()
-    return runs
-
-
-def read_events(run_dir: Path) -> tuple[list[dict[str, Any]], float]:
-    ev_path = run_dir / "events.jsonl"
-    events: list[dict[str, Any]] = []
-    if not ev_path.exists():
-        return events, 0.0
-    with ev_path.open() as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                events.append(json.loads(line))
-            except Exception:
-                # Keep going if a partially-written line appears
-                continue
-    mtime = ev_path.stat().st_mtime
-    return events, mtime
-
-
-def extract_info(events: list[dict[str, Any]]) -> dict[str, Any]:
-    info: dict[str, Any] = {
+@st.cache_resource
+def run_catalog() -> RunCatalog:
+    return RunCatalog(RUNS_ROOT)
+
+
+def list_runs(
+    root: Path = RUNS_ROOT, status: str | None = None, limit: int = RUN_LIST_LIMIT
+) -> list[Path]:
+    """Newest `limit` runs (oldest first) from the run catalog; falls back to a dir scan."""
+    try:
+        cat = run_catalog()
+        if cat.count() == 0 and any(p.is_dir() for p in root.iterdir()):
+            cat.rebuild()  # first use on an existing runs tree
+        rows = cat.query(status=status, limit=limit)
+        return [root / r["run_id"] for r in reversed(rows)]
+    except Exception:
+        runs = [p for p in root.iterdir() if p.is_dir()]
+        runs.sort()
+        return runs
+
+
+def new_info() -> dict[str, Any]:
+    return {
         "run_id": None,
         "goal": None,
         "safe": None,
@@ -59,6 +65,10 @@ def extract_info(events: list[dict[str, Any]]) -> dict[str, Any]:
         "step_log_path": None,
         "last_thought": None,
     }
+
+
+def update_info(info: dict[str, Any], events: list[dict[str, Any]]) -> dict[str, Any]:
+    """Fold newly appended events into an existing info dict (in place)."""
     for ev in events:
         kind = ev.get("kind")
         data = ev.get("data", {})
@@ -83,35 +93,197 @@ def extract_info(events: list[dict[str, Any]]) -> dict[str, Any]:
     return info
 
 
+def extract_info(events: list[dict[str, Any]]) -> dict[str, Any]:
+    return update_info(new_info(), events)
+
+
+def run_state(run_dir: Path) -> dict[str, Any]:
+    """
+    Per-run derived state cached in the session: a byte cursor into
+    events.jsonl, the folded info dict and a bounded deque of recent events.
+    Each rerun only parses the bytes appended since the previous one.
+    """
+    states = st.session_state.setdefault("run_states", {})
+    ev_path = run_dir / "events.jsonl"
+    # None: the run was compacted by gc (events.jsonl.gz), read it once
+    size = ev_path.stat().st_size if ev_path.exists() else None
+    state = states.get(str(run_dir))
+    if state is None or (size is not None and size < state["offset"]):  # new run, or truncated
+        state = {
+            "offset": 0,
+            "info": new_info(),
+            "recent": deque(maxlen=RECENT_EVENTS_LIMIT),
+            "sealed": False,
+        }
+        states[str(run_dir)] = state
+    if (size is None and not state["sealed"]) or (size is not None and size > state["offset"]):
+        new, state["offset"] = read_events_from(ev_path, state["offset"])
+        update_info(state["info"], new)
+        state["recent"].extend(new)
+        state["sealed"] = size is None
+    state["mtime"] = ev_path.stat().st_mtime if ev_path.exists() else 0.0
+    return state
+
+
 def tail_file(path: Path, max_bytes: int = STEP_LOG_MAX_BYTES) -> str:
+    """
+    Incremental tail of a growing log: keeps a per-file cursor and the last
+    `max_bytes` in session state, and only reads bytes appended since the
+    previous rerun (seeking past anything older than the window).
+    """
     if not path.exists():
-        return ""
-    # Simple tail: read the end of file up to max_bytes
+        packed = compressed_path(path)
+        if packed is None:
+            return ""
+        # Compacted run: decode just the last window of the compressed log.
+        data = b"".join(read_from(packed, max(0, raw_size(packed) - max_bytes)))
+        return data.decode(errors="replace")
+    tails = st.session_state.setdefault("log_tails", {})
     size = path.stat().st_size
-    with path.open("rb") as f:
-        if size > max_bytes:
-            f.seek(size - max_bytes)
-            chunk = f.read()
-            # try to avoid half-char/line issues
-            text = chunk.decode(errors="replace")
+    t = tails.get(str(path))
+    if t is None or size < t["offset"]:  # new file, or truncated/rotated
+        t = tails[str(path)] = {"offset": 0, "buf": b""}
+    if size > t["offset"]:
+        start = max(t["offset"], size - max_bytes)
+        with path.open("rb") as f:
+            f.seek(start)
+            chunk = f.read(size - start)
+        buf = (t["buf"] if start == t["offset"] else b"") + chunk
+        if len(buf) > max_bytes:
+            buf = buf[-max_bytes:]
             # Drop partial first line
-            text = text.splitlines(True)
-            if text and not text[0].endswith(("\n", "\r")):
-                text = text[1:]
-            return "".join(text)
-        return f.read().decode(errors="replace")
+            nl = buf.find(b"\n")
+            buf = buf[nl + 1 :] if nl >= 0 else buf
+        t["buf"], t["offset"] = buf, size
+    return t["buf"].decode(errors="replace")
 
 
-def download_byteslabel(data: bytes, file_name: str, label: str):
+def download_file(path: Path, label: str, key: str | None = None):
+    """Download button that reads the file only when clicked, not on every rerun."""
     st.download_button(
         label=label,
-        data=data,
-        file_name=file_name,
+        data=path.read_bytes,
+        file_name=path.name,
         mime="application/octet-stream",
         use_container_width=False,
+        key=key,
     )
 
 
+def render_header(ph, info: dict[str, Any]) -> None:
+    with ph.container():
+        cols = st.columns(5)
+        cols[0].metric("Run ID", info["run_id"] or "—")
+        safe = info["safe"]
+        cols[1].metric("Safe mode", "ON" if safe else "OFF" if safe is not None else "—")
+        cols[2].metric("Started", info["started"] or "—")
+        cols[3].metric("Finished", info["finished"] or "—")
+        cols[4].metric("Goal", info["goal"] or "—")
+
+
+def render_status(ph, info: dict[str, Any]) -> None:
+    status_text = (
+        f"Run finished: {info['result']}"
+        if info["result"]
+        else "Run in progress…"
+        if info["total"]
+        else "Waiting for steps…"
+    )
+    with ph.container():
+        if info["result"] == "OK":
+            st.success(status_text)
+        elif info["result"]:
+            st.warning(status_text)
+        else:
+            st.info(status_text)
+        progress = min(1.0, info["current"] / max(1, info["total"])) if info["total"] else 0.0
+        st.progress(progress)
+        st.caption(f"🤖 ETA: {info['eta'] or 'n/a'}")
+        if info["last_thought"]:
+            with st.expander("Agent thought (latest)", expanded=False):
+                st.write(info["last_thought"])
+
+
+def _step_log(info: dict[str, Any]) -> Path | None:
+    log_path = Path(info["step_log_path"]) if info.get("step_log_path") else None
+    if log_path and not log_path.exists() and compressed_path(log_path) is None:
+        return None  # gone (a compacted run keeps it as .gz)
+    return log_path
+
+
+def render_step_log(ph, info: dict[str, Any]) -> None:
+    """The tail of the step log; cheap to repeat (tail_file reads only new bytes)."""
+    log_path = _step_log(info)
+    if log_path:
+        ph.code(tail_file(log_path) or "(log is empty)", language="bash")
+    else:
+        ph.caption("No step log yet.")
+
+
+def render_step_log_download(ph, info: dict[str, Any]) -> str | None:
+    """Download button for the current step log, keyed by it; returns info's path."""
+    log_path = _step_log(info)
+    if not log_path:
+        ph.empty()
+        return info["step_log_path"]
+    dl = log_path if log_path.exists() else compressed_path(log_path)
+    with ph.container():
+        download_file(dl, "Download step log", key=f"dl_log:{log_path}")
+    return info["step_log_path"]
+
+
+def render_recent(ph, recent) -> None:
+    with ph.container():
+        show = list(recent)[::-1]  # newest first
+        if not show:
+            st.caption("No events yet.")
+        for ev in show:
+            st.json(ev, expanded=False)
+
+
+def apply_live_event(ev: dict[str, Any], state: dict[str, Any], ph: dict[str, Any]) -> None:
+    """Fold one streamed event into `state` and re-render only what it touches."""
+    info = state["info"]
+    update_info(info, [ev])
+    state["recent"].append(ev)
+    kind = ev.get("kind")
+    if kind in ("run_started", "run_finished"):
+        render_header(ph["header"], info)
+    if kind in ("run_started", "plan_ready", "progress", "thought", "run_finished"):
+        render_status(ph["status"], info)
+    if kind in ("log", "action_done"):
+        render_step_log(ph["log"], info)
+        if info["step_log_path"] != state.get("log_download"):  # a new step's log
+            state["log_download"] = render_step_log_download(ph["log_download"], info)
+    render_recent(ph["recent"], state["recent"])
+
+
+def follow_live(url: str, run_dir: Path, state: dict[str, Any], ph: dict[str, Any]) -> bool:
+    """
+    Push mode: subscribe to the run's event stream from our byte cursor and
+    patch the placeholders as events arrive. Returns True once the run
+    finishes, False if the stream is unavailable or drops (the caller falls
+    back to polling). A widget interaction reruns the script and ends the loop.
+    """
+    try:
+        stream = subscribe(
+            url,
+            run_dir.name,
+            state["offset"],
+            reconnect=False,
+            heartbeat=1.0,
+            on_idle=lambda: st.session_state.get("run_select"),  # rerun/stop yield point
+        )
+        for offset, ev in stream:
+            state["offset"] = offset
+            apply_live_event(ev, state, ph)
+            if ev.get("kind") == "run_finished":
+                return True
+    except (OSError, RuntimeError):
+        pass
+    return False
+
+
 def events_mtime(run_dir: Path) -> float:
     p = run_dir / "events.jsonl"
     return p.stat().st_mtime if p.exists() else 0.0
@@ -121,20 +293,26 @@ def events_mtime(run_dir: Path) -> float:
 st.set_page_config(page_title=PAGE_TITLE, layout="wide")
 st.title(PAGE_TITLE)
 
+stream_url = events_url()
+
 # Sidebar
 with st.sidebar:
-    st.subheader("Auto-refresh interval (seconds)")
-    refresh_sec = st.slider(
-        "seconds", min_value=0, max_value=10, value=SIDEBAR_REFRESH_DEFAULT, step=1
-    )
+    if stream_url:
+        st.caption(f"Live events: {stream_url}")
+        refresh_sec = 0
+    else:
+        st.subheader("Auto-refresh interval (seconds)")
+        refresh_sec = st.slider(
+            "seconds", min_value=0, max_value=10, value=SIDEBAR_REFRESH_DEFAULT, step=1
+        )
     if st.button("Refresh now"):
         st.rerun()
 
-    runs = list_runs()
+    status_filter = st.selectbox("Status", ["all", "OK", "FAILED", "ABORTED", "RUNNING"])
+    runs = list_runs(status=None if status_filter == "all" else status_filter)
     st.subheader("Run directory")
     if runs:
         # Default to the most recent run
-        latest_name = runs[-1].name
         default_idx = len(runs) - 1
         sel = st.selectbox(
             "Pick a run", [p.name for p in runs], index=default_idx, key="run_select"
@@ -144,9 +322,9 @@ with st.sidebar:
         st.info("No runs found under artifacts/runs")
         run_dir = RUNS_ROOT / "(none)"
 
-# Read events + derive info
-events, mtime = read_events(run_dir)
-info = extract_info(events)
+# Parse only newly appended events; derived info is cached per run
+state = run_state(run_dir)
+info, mtime = state["info"], state["mtime"]
 
 # Persist mtime/next refresh to minimize full-page re-renders
 if "last_events_mtime" not in st.session_state:
@@ -154,39 +332,10 @@ if "last_events_mtime" not in st.session_state:
 if "next_refresh" not in st.session_state:
     st.session_state["next_refresh"] = 0.0
 
-# Header metrics
-cols = st.columns(5)
-cols[0].metric("Run ID", info["run_id"] or "—")
-cols[1].metric("Safe mode", "ON" if info["safe"] else "OFF" if info["safe"] is not None else "—")
-cols[2].metric("Started", info["started"] or "—")
-cols[3].metric("Finished", info["finished"] or "—")
-cols[4].metric("Goal", info["goal"] or "—")
-
-# Status banner
-status_text = (
-    f"Run finished: {info['result']}"
-    if info["result"]
-    else "Run in progress…"
-    if info["total"]
-    else "Waiting for steps…"
-)
-if info["result"] == "OK":
-    st.success(status_text)
-elif info["result"]:
-    st.warning(status_text)
-else:
-    st.info(status_text)
-
-# Progress + ETA
-progress = min(1.0, info["current"] / max(1, info["total"])) if info["total"] else 0.0
-st.progress(progress)
-eta_text = info["eta"] or "n/a"
-st.caption(f"🤖 ETA: {eta_text}")
-
-# Thought (last reasoning message)
-if info["last_thought"]:
-    with st.expander("Agent thought (latest)", expanded=False):
-        st.write(info["last_thought"])
+# Each section renders into its own placeholder so live mode can patch it alone
+ph = {"header": st.empty(), "status": st.empty()}
+render_header(ph["header"], info)
+render_status(ph["status"], info)
 
 st.divider()
 
@@ -195,37 +344,36 @@ left, right = st.columns([2, 1])
 # Live step log
 with left:
     st.subheader("Live step log")
-    log_path = Path(info["step_log_path"]) if info.get("step_log_path") else None
-    if log_path and log_path.exists():
-        txt = tail_file(log_path)
-        st.code(txt or "(log is empty)", language="bash")
-        download_byteslabel(
-            data=log_path.read_bytes(),
-            file_name=log_path.name,
-            label="Download step log",
-        )
-    else:
-        st.caption("No step log yet.")
+    ph["log"] = st.empty()
+    ph["log_download"] = st.empty()
+    render_step_log(ph["log"], info)
+    state["log_download"] = render_step_log_download(ph["log_download"], info)
 
 # Recent events
 with right:
     st.subheader("Recent events")
-    show = events[-RECENT_EVENTS_LIMIT:][::-1]  # newest first
-    if not show:
-        st.caption("No events yet.")
-    else:
-        for ev in show:
-            st.json(ev, expanded=False)
+    ph["recent"] = st.empty()
+    render_recent(ph["recent"], state["recent"])
 
 # Raw events download
 ev_file = run_dir / "events.jsonl"
-if ev_file.exists():
-    download_byteslabel(
-        data=ev_file.read_bytes(), file_name=ev_file.name, label="Download events.jsonl"
-    )
-
-# ---------- Smart auto-rerun ----------
-# Rerun if file changed OR timer elapsed
+ev_file = ev_file if ev_file.exists() else compressed_path(ev_file)
+if ev_file:
+    download_file(ev_file, label=f"Download {ev_file.name}")
+trace_file = run_dir / "trace.json"
+if trace_file.exists():
+    download_file(trace_file, label="Download trace.json")
+    st.caption("Open the trace in https://ui.perfetto.dev or chrome://tracing.")
+
+# ---------- Live updates ----------
+if stream_url and run_dir.is_dir() and not info["result"]:
+    # Push: events arrive over SSE and patch the placeholders above in place.
+    if follow_live(stream_url, run_dir, state, ph):
+        st.stop()
+    refresh_sec = refresh_sec or SIDEBAR_REFRESH_DEFAULT
+    mtime = events_mtime(run_dir)
+
+# Poll: rerun if file changed OR timer elapsed
 now = time.time()
 changed = mtime > st.session_state["last_events_mtime"]
 time_ok = refresh_sec and (now >= st.session_state["next_refresh"])
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import shlex
 import subprocess
+import sys
 import time
 from pathlib import Path
 
@@ -11,19 +12,24 @@ import streamlit as st
 ROOT = Path.cwd()
 RUNS_ROOT = ROOT / "artifacts" / "runs"
 RUNS_ROOT.mkdir(parents=True, exist_ok=True)
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from master_ai.runtime.catalog import RunCatalog  # noqa: E402
 
 st.set_page_config(page_title="Master-AI Studio", layout="wide")
 st.title("🧠 Master-AI Studio")
 
 
 # ---------- helpers ----------
+@st.cache_resource
+def run_catalog() -> RunCatalog:
+    return RunCatalog(RUNS_ROOT)
+
+
 def newest_run_dir() -> Path | None:
-    if not RUNS_ROOT.exists():
-        return None
-    runs = [p for p in RUNS_ROOT.iterdir() if p.is_dir()]
-    if not runs:
-        return None
-    return sorted(runs)[-1]
+    latest = run_catalog().latest()
+    return RUNS_ROOT / latest["run_id"] if latest else None
 
 
 def run_cli(goal: str, unsafe: bool) -> tuple[int, str]:
@@ -70,12 +76,12 @@ run_unsafe = col2.button("⚠ Run (unsafe)")
 
 # Report last known newest run so user can inspect before launching
 with st.expander("Last runs", expanded=False):
-    runs = sorted([p for p in RUNS_ROOT.iterdir() if p.is_dir()])[-10:]
+    runs = run_catalog().query(limit=10)
     if runs:
-        for p in runs[::-1]:
-            st.write(p.name)
+        for r in runs:
+            st.write(f"`{r['run_id']}` · {r['status']} · {r['goal'] or ''}")
     else:
-        st.caption("(no runs yet)")
+        st.caption("(no runs yet — `python -m master_ai runs --rebuild` indexes older runs)")
 
 # Execute
 if run_safe or run_unsafe: